@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''Throughput and memory benchmark of the conan reference parsers
+
+Run from the root of the repository:
+    python -m benchmarks.conan_reference_benchmark --count 100000
+'''
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+import typing
+from conan_repo_actions.conan_reference import ConanReference, CONAN_REF_REGEX_IN_CONANFILE, \
+    CONAN_VERSION_REGEX_IN_SOURCE
+
+PACKAGES = ['zlib', 'bzip2', 'openssl', 'libpng', 'libjpeg', 'freetype', 'expat', 'libcurl', 'boost', 'sqlite3',
+            'libxml2', 'pcre', 'libiconv', 'gtest', 'protobuf', 'lzma', 'zstd', 'libffi', 'glib', 'harfbuzz']
+USERS = ['bincrafters', 'conan', 'user']
+CHANNELS = ['stable', 'testing']
+
+CONANFILE_TEMPLATE = '''# -*- coding: utf-8 -*-
+
+from conans import ConanFile, CMake, tools
+import os
+
+
+class {cls}Conan(ConanFile):
+    name = "{name}"
+    version = "{version}"
+    description = "Synthetic recipe"
+    # Based on "{comment_ref}"
+    url = "https://github.com/bincrafters/conan-{name}"
+    settings = "os", "arch", "compiler", "build_type"
+    options = {{"shared": [True, False]}}
+    default_options = {{"shared": False}}
+    requires = {requires}
+    build_requires = "cmake_installer/3.14.5@conan/stable"
+
+    def requirements(self):
+        if self.options.shared:
+            self.requires("{optional_ref}")
+
+    def build(self):
+        cmake = CMake(self)
+        cmake.configure()
+        cmake.build()
+'''
+
+
+def random_reference(rng: random.Random) -> str:
+    return '{}/{}.{}.{}@{}/{}'.format(rng.choice(PACKAGES), rng.randint(0, 3), rng.randint(0, 20), rng.randint(0, 9),
+                                      rng.choice(USERS), rng.choice(CHANNELS))
+
+
+def generate_corpus(count: int, seed: int) -> typing.List[str]:
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        requires = ', '.join('"{}"'.format(random_reference(rng)) for _ in range(rng.randint(0, 5)))
+        corpus.append(CONANFILE_TEMPLATE.format(
+            cls='Lib{}'.format(i),
+            name='lib{}'.format(i),
+            version='{}.{}'.format(rng.randint(0, 9), rng.randint(0, 99)),
+            comment_ref=random_reference(rng),
+            optional_ref=random_reference(rng),
+            requires='({}, )'.format(requires) if requires else '()',
+        ))
+    return corpus
+
+
+def measure(description: str, fn: typing.Callable[[], typing.Any], nb_bytes: int) -> typing.Any:
+    gc.collect()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print('{:<45} {:8.3f} s {:10.1f} MB/s'.format(description, elapsed, nb_bytes / elapsed / 1e6))
+    return result
+
+
+def measure_memory(description: str, fn: typing.Callable[[], typing.Any]) -> typing.Any:
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('{:<45} {:8.1f} MB retained {:8.1f} MB peak'.format(description, current / 1e6, peak / 1e6))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the conan reference parsers')
+    parser.add_argument('--count', type=int, default=100000, help='number of synthetic conanfiles')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the corpus generator')
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.count, args.seed)
+    nb_bytes = sum(len(text) for text in corpus)
+    print('corpus: {} conanfiles, {:.1f} MB'.format(len(corpus), nb_bytes / 1e6))
+
+    nb_matches = measure('CONAN_REF_REGEX_IN_CONANFILE.finditer',
+                         lambda: sum(1 for text in corpus for _ in CONAN_REF_REGEX_IN_CONANFILE.finditer(text)),
+                         nb_bytes)
+    measure('CONAN_VERSION_REGEX_IN_SOURCE.search',
+            lambda: sum(1 for text in corpus if CONAN_VERSION_REGEX_IN_SOURCE.search(text)), nb_bytes)
+    measure('ConanReference.from_conanfile',
+            lambda: sum(len(ConanReference.from_conanfile(text)) for text in corpus), nb_bytes)
+    measure('ConanReference.iter_from_conanfile',
+            lambda: sum(1 for text in corpus for _ in ConanReference.iter_from_conanfile(text)), nb_bytes)
+    refs = measure('ConanReference.from_refstr (round trip)',
+                   lambda: list(ConanReference.from_refstr(ref.reference)
+                                for text in corpus for ref in ConanReference.iter_from_conanfile(text)), nb_bytes)
+    measure('set of references', lambda: len(set(refs)), nb_bytes)
+    print('references: {} ({} unique)'.format(nb_matches, len(set(refs))))
+
+    del refs
+    measure_memory('hold all references',
+                   lambda: list(ref for text in corpus for ref in ConanReference.iter_from_conanfile(text)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''Benchmark of the branch analysis of default_branch
+
+Run from the root of the repository:
+    python -m benchmarks.default_branch_benchmark --repos 2000 --branches 40 --big-branches 5000
+'''
+
+import argparse
+import gc
+import random
+import time
+import typing
+from conan_repo_actions.default_branch import check_default_branch, ConanRepo, _version_from_string
+
+CHANNELS = ['stable', 'testing', 'testing', 'stable', 'release']
+UNKNOWN_BRANCHES = ['master', 'develop', 'feature/new-option', 'fix-windows']
+
+
+def random_version(rng: random.Random) -> str:
+    r = rng.random()
+    if r < .05:
+        return 'r20{:02d}{}'.format(rng.randint(10, 19), rng.choice(['', 'a', 'b']))
+    if r < .1:
+        return '{}.{}.{}rc{}'.format(rng.randint(0, 5), rng.randint(0, 20), rng.randint(0, 9), rng.randint(1, 3))
+    return '{}.{}.{}'.format(rng.randint(0, 5), rng.randint(0, 20), rng.randint(0, 9))
+
+
+def generate_branches(rng: random.Random, count: int) -> typing.Tuple[typing.List[str], str]:
+    branches = list('{}/{}'.format(rng.choice(CHANNELS), random_version(rng)) for _ in range(count))
+    branches.extend(rng.sample(UNKNOWN_BRANCHES, rng.randint(0, len(UNKNOWN_BRANCHES))))
+    return branches, rng.choice(branches)
+
+
+def measure(description: str, fn: typing.Callable[[], typing.Any], nb_branches: int) -> typing.Any:
+    gc.collect()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print('{:<45} {:8.3f} s {:10.0f} branches/s'.format(description, elapsed, nb_branches / elapsed))
+    return result
+
+
+def benchmark(description: str, repos: typing.List[typing.Tuple[typing.List[str], str]]):
+    nb_branches = sum(len(branches) for branches, _ in repos)
+    print('{}: {} repos, {} branches'.format(description, len(repos), nb_branches))
+    _version_from_string.cache_clear()
+    conan_repos = measure('ConanRepo.from_branch_names (cold)',
+                          lambda: list(ConanRepo.from_branch_names(b, d) for b, d in repos), nb_branches)
+    measure('ConanRepo.from_branch_names (warm)',
+            lambda: list(ConanRepo.from_branch_names(b, d) for b, d in repos), nb_branches)
+    measure('check_default_branch',
+            lambda: list(check_default_branch('owner/repo', archived=False, repo=r) for r in conan_repos),
+            nb_branches)
+    measure('sort all branches by suggestion key',
+            lambda: list(sorted((b for r in conan_repos for b in r.branches), key=lambda b: b.sort_key)),
+            nb_branches)
+    print('version cache: {}'.format(_version_from_string.cache_info()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the branch analysis of default_branch')
+    parser.add_argument('--repos', type=int, default=2000, help='number of repos of the synthetic org')
+    parser.add_argument('--branches', type=int, default=40, help='number of branches per repo of the org')
+    parser.add_argument('--big-branches', dest='big_branches', type=int, default=5000,
+                        help='number of branches of the synthetic big repos')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generator')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    benchmark('org', list(generate_branches(rng, rng.randint(1, 2 * args.branches)) for _ in range(args.repos)))
+    benchmark('big repos', list(generate_branches(rng, args.big_branches) for _ in range(10)))
+
+
+if __name__ == '__main__':
+    main()
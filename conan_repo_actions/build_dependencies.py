@@ -2,12 +2,23 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import asyncio
+from github import Github
+from github.Repository import Repository
 from pathlib import Path
-import yaml
-from .fetch_dependencies import repo_branch_dependencies
+from .fetch_dependencies import repo_branch_dependencies, repo_branches_dependencies_graphql, \
+    conanfiles_dependencies, CONANFILE_NAMES
 from .conventions_apply import argparse_add_which_branch_option, calculate_repo_branch, \
-    calculate_branch, GithubRepoBranch
-from .util import Configuration
+    calculate_branch, calculate_conan_repo_branch, GithubRepoBranch
+from .conan_reference import ConanReference
+from .conanfile_ast import ConanfileAstExtractor
+from .default_branch import conan_repos_graphql, ConanRepo, WhichBranch
+from .dependency_store import DependencyDirectory, DependencyRecord, DependencyStore
+from .github_graphql import GithubGraphQL
+from .metadata import snapshot_repositories, UnknownRepositoriesError
+from .concurrency import map_concurrent
+from .util import Configuration, GithubUser, argparse_add_jobs_option, argparse_add_snapshot_options
+import typing
 
 
 def main():
@@ -15,60 +26,270 @@ def main():
     parser.add_argument('--owner_login', type=str, required=True, help='owner of the repo to clone')
     parser.add_argument('--interactive', action='store_true', help='interactive')
     argparse_add_which_branch_option(parser)
-    parser.add_argument('--output', '-o', type=Path, required=True,
-                        help='directory where to store the dependency information')
+    argparse_add_jobs_option(parser)
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help='do not use the local cache of conanfiles')
+    parser.add_argument('--graphql', action='store_true',
+                        help='fetch the conanfiles of many repos per request using the GraphQL api')
+    parser.add_argument('--batch_size', type=int, default=25,
+                        help='number of repos per GraphQL request (default=25)')
+    parser.add_argument('--ast', action='store_true',
+                        help='parse the conanfiles instead of searching them for references')
+    output_group = parser.add_mutually_exclusive_group(required=True)
+    output_group.add_argument('--output', '-o', type=Path,
+                              help='directory where to store the dependency information')
+    output_group.add_argument('--store', type=Path,
+                              help='sqlite database where to store the dependency information')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='use the asyncio github client (--jobs is the number of connections)')
+    argparse_add_snapshot_options(parser)
+    parser.add_argument('--update', action='store_true',
+                        help='refresh existing dependency information of repos whose branch head has moved')
     parser.add_argument('repo_names', type=str, nargs=argparse.ZERO_OR_MORE,
                         help='names of the repo+branch. Format: REPO[:BRANCH]')
 
     args = parser.parse_args()
 
-    output: Path = args.output
-    if not output.is_dir():
-        output.mkdir(parents=True)
+    if args.store is not None:
+        store = DependencyStore(args.store)
+    else:
+        store = DependencyDirectory(args.output)
+
+    with store:
+        if args.use_async:
+            asyncio.run(build_dependencies_async(args, store))
+        else:
+            try:
+                build_dependencies(args, store)
+            except UnknownRepositoriesError as e:
+                parser.error(str(e))
 
+
+def build_dependencies(args: argparse.Namespace, store: typing.Union[DependencyDirectory, DependencyStore]):
     c = Configuration()
     g = c.get_github()
 
-    user_from = g.get_user(args.owner_login)
+    if args.snapshot or args.refresh:
+        repo_branches_all = repo_branches_snapshot(c, g, args)
+    else:
+        repo_branches_all = repo_branches_online(c, g.get_user(args.owner_login), args)
+
+    repo_branches = []
+    for repo_branch in repo_branches_all:
+        if repo_branch.branch is None:
+            print('Skipping repo:', repo_branch.repo.name, '(no branch found according to specs)')
+            continue
+        repo_branches.append(repo_branch)
+
+    if args.update:
+        repo_branches = repo_branches_outdated(c.get_github_graphql(), repo_branches, store)
+    else:
+        repo_branches = list(repo_branch for repo_branch in repo_branches if repo_branch.repo.name not in store)
+
+    cache = c.get_blob_cache() if args.use_cache else None
+    extractor = ConanfileAstExtractor(cache=cache) if args.ast else None
+
+    if args.graphql:
+        all_dependencies = repo_branches_dependencies_graphql(c.get_github_graphql(), repo_branches,
+                                                              batch_size=args.batch_size, extractor=extractor)
+    else:
+        all_dependencies = map_concurrent(lambda rb: repo_branch_dependencies(rb, cache=cache, extractor=extractor),
+                                          repo_branches, jobs=args.jobs)
+
+    for repo_branch, dependencies in zip(repo_branches, all_dependencies):
+        if dependencies is None:
+            print('Unable to read branch "{}" of {}: keeping its previous record'.format(
+                repo_branch.branch, repo_branch.repo.name))
+            continue
+        deps, version = dependencies
+        store_dependencies(store, name=repo_branch.repo.name, branch=repo_branch.branch, commit=repo_branch.commit,
+                           deps=deps, version=version)
+
+
+def repo_branches_snapshot(c: Configuration, g: Github, args: argparse.Namespace) -> typing.List[GithubRepoBranch]:
+    ''' Resolve the repos and branches from the local metadata snapshot, including the head commits '''
+    repo_names = args.repo_names
+    names = list(repo_name.partition(':')[0] for repo_name in repo_names) if repo_names else None
+    branches = list(repo_name.partition(':')[2] or None for repo_name in repo_names) if repo_names else None
+    with c.get_metadata_store() as metadata_store:
+        stats = c.get_metadata_refresher(metadata_store, jobs=args.jobs).refresh_owner(args.owner_login,
+                                                                                       full=args.refresh)
+        print('Snapshot of {} repos: {} requests ({} not modified)'.format(
+            stats.repos, stats.requests, stats.not_modified))
+        repos = snapshot_repositories(g, metadata_store, args.owner_login, names)
+        repos_heads = list(metadata_store.branches(repo.full_name) for repo in repos)
 
     repo_branches = []
+    for repo_i, (repo, heads) in enumerate(zip(repos, repos_heads)):
+        repo_branch = GithubRepoBranch(repo=repo)
+        repo_branch.branch = branches[repo_i] if branches else None
+        if repo_branch.branch is None:
+            repo_branch.branch = calculate_branch(repo=repo, branch_dest=args.branch_dest,
+                                                  conan_repo=ConanRepo.from_branch_names(heads, repo.default_branch))
+        repo_branch.commit = heads.get(repo_branch.branch)
+        repo_branches.append(repo_branch)
+    return repo_branches
 
+
+def repo_branches_online(c: Configuration, user_from: GithubUser,
+                         args: argparse.Namespace) -> typing.List[GithubRepoBranch]:
     repo_names = args.repo_names
+
+    conan_repos = dict()
+    if args.graphql and isinstance(args.branch_dest, WhichBranch) and args.branch_dest != WhichBranch.DEFAULT:
+        names = list(repo_name.partition(':')[0] for repo_name in repo_names) if repo_names else None
+        conan_repos = conan_repos_graphql(c.get_github_graphql(), args.owner_login, names)
+
     if not repo_names:
-        repos = user_from.get_repos()
-        for repo in repos:
+        def resolve_repo_branch(repo: Repository) -> GithubRepoBranch:
             repo_branch = GithubRepoBranch(repo=repo)
-            repo_branch.branch = calculate_branch(repo=repo_branch.repo, branch_dest=args.branch_dest)
-            if repo_branch.branch is None:
-                print('Skipping repo:', repo.name, '(no branch found according to specs)')
-                continue
-            repo_branches.append(repo_branch)
+            repo_branch.branch = calculate_branch(repo=repo_branch.repo, branch_dest=args.branch_dest,
+                                                  conan_repo=conan_repos.get(repo.name))
+            return repo_branch
+
+        repo_branches_all = map_concurrent(resolve_repo_branch, user_from.get_repos(), jobs=args.jobs)
     else:
-        for repo_name in args.repo_names:
+        def resolve_repo_branch(repo_name: str) -> GithubRepoBranch:
             repo_branch = calculate_repo_branch(user=user_from, repo_branch_name=repo_name)
             if repo_branch.branch is None:
-                repo_branch.branch = calculate_branch(repo=repo_branch.repo, branch_dest=args.branch_dest)
-            if repo_branch.branch is None:
-                print('Skipping repo:', repo_branch.repo.name, '(no branch found according to specs)')
+                repo_branch.branch = calculate_branch(repo=repo_branch.repo, branch_dest=args.branch_dest,
+                                                      conan_repo=conan_repos.get(repo_branch.repo.name))
+            return repo_branch
+
+        repo_branches_all = map_concurrent(resolve_repo_branch, repo_names, jobs=args.jobs)
+
+    return repo_branches_all
+
+
+async def build_dependencies_async(args: argparse.Namespace,
+                                   store: typing.Union[DependencyDirectory, DependencyStore]):
+    from .github_async import AsyncGithubException
+    c = Configuration()
+    cache = c.get_blob_cache() if args.use_cache else None
+    extractor = ConanfileAstExtractor(cache=cache) if args.ast else None
+
+    async with c.get_github_async(limit=args.jobs if args.jobs > 1 else None) as g:
+        async def get_repo_branch(repo_name: str) -> typing.Tuple[typing.Dict[str, typing.Any], typing.Optional[str]]:
+            repo_str, _, branch = repo_name.partition(':')
+            repo = await g.get_repo('{}/{}'.format(args.owner_login, repo_str))
+            return repo, branch or None
+
+        if args.repo_names:
+            repos_branches = await asyncio.gather(*(get_repo_branch(repo_name) for repo_name in args.repo_names))
+        else:
+            repos_branches = list((repo, None, ) for repo in await g.list_repos(args.owner_login))
+
+        async def resolve_branch(repo: typing.Dict[str, typing.Any], branch: typing.Optional[str]) -> \
+                typing.Optional[str]:
+            if branch is not None:
+                return branch
+            if args.branch_dest == WhichBranch.DEFAULT:
+                return repo['default_branch']
+            if not isinstance(args.branch_dest, WhichBranch):
+                return args.branch_dest
+            branches = await g.list_branches(repo['full_name'])
+            conan_repo = ConanRepo.from_branch_names((b['name'] for b in branches), repo['default_branch'])
+            return calculate_conan_repo_branch(conan_repo, args.branch_dest)
+
+        branches = await asyncio.gather(*(resolve_branch(repo, branch) for repo, branch in repos_branches))
+
+        repo_branches = []
+        for (repo, _), branch in zip(repos_branches, branches):
+            if branch is None:
+                print('Skipping repo:', repo['name'], '(no branch found according to specs)')
+                continue
+            if not args.update and repo['name'] in store:
+                continue
+            repo_branches.append((repo, branch, ))
+
+        async def get_head(repo: typing.Dict[str, typing.Any], branch: str) -> typing.Optional[str]:
+            try:
+                return (await g.get_branch(repo['full_name'], branch))['commit']['sha']
+            except AsyncGithubException:
+                return None
+
+        commits = await asyncio.gather(*(get_head(repo, branch) for repo, branch in repo_branches))
+
+        outdated = []
+        for (repo, branch), commit in zip(repo_branches, commits):
+            if commit is None:
+                print('Skipping repo:', repo['name'], '(unable to get head of branch "{}")'.format(branch))
                 continue
-            repo_branches.append(repo_branch)
+            if args.update:
+                record = store.get(repo['name'])
+                if record is not None and record.branch == branch and record.commit == commit:
+                    continue
+            outdated.append((repo, branch, commit, ))
 
+        async def get_dependencies(repo: typing.Dict[str, typing.Any], commit: str) -> \
+                typing.Optional[typing.Tuple[typing.List[ConanReference], typing.Optional[str]]]:
+            contents = await asyncio.gather(*(g.get_contents(repo['full_name'], file, ref=commit)
+                                              for file in CONANFILE_NAMES), return_exceptions=True)
+            errors = list(content for content in contents if isinstance(content, Exception))
+            if errors:
+                print('Unable to read conanfiles of {}: {}'.format(repo['full_name'], errors[0]))
+                return None
+            files = ((sha, data.decode(), ) for sha, data in filter(None, contents))
+            return conanfiles_dependencies(files, extractor=extractor)
+
+        all_dependencies = await asyncio.gather(*(get_dependencies(repo, commit) for repo, _, commit in outdated))
+
+    for (repo, branch, commit), dependencies in zip(outdated, all_dependencies):
+        if dependencies is None:
+            print('Unable to read branch "{}" of {}: keeping its previous record'.format(branch, repo['name']))
+            continue
+        deps, version = dependencies
+        store_dependencies(store, name=repo['name'], branch=branch, commit=commit, deps=deps, version=version)
+
+
+def store_dependencies(store: typing.Union[DependencyDirectory, DependencyStore], name: str, branch: str,
+                       commit: typing.Optional[str], deps: typing.List[ConanReference], version: typing.Optional[str]):
+    if commit is None and name in store:
+        # The head of the branch could not be resolved: the previous record is better than an unknown version
+        print('Unable to get head of branch "{}" of {}: keeping its previous record'.format(branch, name))
+        return
+    if version is None:
+        print('Unable to get version of {}'.format(name))
+        version = 'unknown'
+
+    store.put(DependencyRecord(
+        name=name,
+        version=version,
+        branch=branch,
+        commit=commit,
+        dependencies=deps,
+    ))
+
+
+def repo_branches_outdated(gql: GithubGraphQL, repo_branches: typing.Iterable[GithubRepoBranch],
+                           store: typing.Union[DependencyDirectory, DependencyStore]) -> typing.List[GithubRepoBranch]:
+    ''' Return the repos whose dependency information is missing or computed from another branch or commit
+
+    The current heads of the branches without known commit are fetched in bulk and stored in the GithubRepoBranch objects.
+    Repos with a record whose head cannot be resolved are not outdated: their previous record is kept.
+    '''
+    repo_branches = list(repo_branches)
+    by_owner = dict()
     for repo_branch in repo_branches:
-        filename = output / (repo_branch.repo.name + '.yaml')
-        if filename.exists():
+        if repo_branch.commit is not None:
             continue
+        by_owner.setdefault(repo_branch.repo.owner.login, []).append(repo_branch)
+    for owner, owner_repo_branches in by_owner.items():
+        heads = gql.repositories_heads(owner, ((rb.repo.name, rb.branch, ) for rb in owner_repo_branches))
+        for repo_branch, head in zip(owner_repo_branches, heads):
+            repo_branch.commit = head.commit
 
-        deps, version = repo_branch_dependencies(repo_branch)
-        if version is None:
-            print('Unable to get version of {}'.format(repo_branch.repo.name))
-            version = 'unknown'
-
-        data = {
-            'name': repo_branch.repo.name,
-            'version': version,
-            'dependencies': list(d.reference for d in deps),
-        }
-        yaml.safe_dump(data, open(filename, 'w'))
+    outdated = []
+    for repo_branch in repo_branches:
+        record = store.get(repo_branch.repo.name)
+        if record is not None and repo_branch.commit is None:
+            print('Unable to get head of branch "{}" of {}: keeping its previous record'.format(
+                repo_branch.branch, repo_branch.repo.name))
+            continue
+        if record is not None and record.branch == repo_branch.branch and record.commit == repo_branch.commit:
+            continue
+        outdated.append(repo_branch)
+    return outdated
 
 
 if __name__ == '__main__':
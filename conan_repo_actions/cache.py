@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+import os
+from pathlib import Path
+import threading
+import typing
+import uuid
+import yaml
+
+DEFAULT_CACHE_MAX_SIZE = 256 * 1024 * 1024
+# Fraction of max_size the cache is shrunk to when it grows too large, so the costly eviction scan is rare
+EVICTION_LOW_WATERMARK = .9
+
+
+class BlobCache(object):
+    ''' Persistent content-addressed cache of git objects
+
+    Blobs are stored by their blob sha, so they never go stale.
+    For every commit, the blob shas of the files of interest are stored too.
+    A missing file is recorded as None, so 404's are negatively cached per commit.
+    The least recently used entries are evicted when the size of the cache exceeds max_size.
+    '''
+
+    BLOBS = 'blobs'
+    COMMITS = 'commits'
+
+    def __init__(self, path: Path, max_size: int=DEFAULT_CACHE_MAX_SIZE):
+        self._path = path
+        self._max_size = max_size
+        self._size = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    def get_blob(self, sha: str) -> typing.Optional[bytes]:
+        return self._read(self.BLOBS, sha)
+
+    def put_blob(self, sha: str, data: bytes) -> None:
+        self._write(self.BLOBS, sha, data)
+
+    def get_data(self, kind: str, key: str) -> typing.Optional[bytes]:
+        ''' Get data derived from immutable objects (e.g. the result of parsing a blob) '''
+        return self._read(kind, key)
+
+    def put_data(self, kind: str, key: str, data: bytes) -> None:
+        self._write(kind, key, data)
+
+    def get_commit_files(self, sha: str) -> typing.Optional[typing.Dict[str, typing.Optional[str]]]:
+        data = self._read(self.COMMITS, sha)
+        if data is None:
+            return None
+        return yaml.safe_load(data.decode())
+
+    def put_commit_files(self, sha: str, files: typing.Mapping[str, typing.Optional[str]]) -> None:
+        self._write(self.COMMITS, sha, yaml.safe_dump(dict(files)).encode())
+
+    def size(self) -> int:
+        with self._lock:
+            return self._calculate_size()
+
+    def clear(self) -> None:
+        with self._lock:
+            for entry in self._entries():
+                entry.unlink()
+            self._size = 0
+
+    def _entry_path(self, kind: str, sha: str) -> Path:
+        return self._path / kind / sha[:2] / sha
+
+    def _entries(self) -> typing.Iterator[Path]:
+        if not self._path.is_dir():
+            return
+        for kind_path in self._path.iterdir():
+            if not kind_path.is_dir():
+                continue
+            for entry in kind_path.glob('*/*'):
+                if entry.suffix != '.tmp' and entry.is_file():
+                    yield entry
+
+    def _calculate_size(self) -> int:
+        if self._size is None:
+            self._size = sum(entry.stat().st_size for entry in self._entries())
+        return self._size
+
+    def _read(self, kind: str, sha: str) -> typing.Optional[bytes]:
+        entry = self._entry_path(kind, sha)
+        try:
+            data = entry.read_bytes()
+            os.utime(str(entry))
+        except FileNotFoundError:
+            return None
+        return data
+
+    def _write(self, kind: str, sha: str, data: bytes) -> None:
+        entry = self._entry_path(kind, sha)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_name('{}.{}.tmp'.format(entry.name, uuid.uuid4().hex))
+        tmp.write_bytes(data)
+        with self._lock:
+            size = self._calculate_size()
+            try:
+                size -= entry.stat().st_size
+            except FileNotFoundError:
+                pass
+            os.replace(str(tmp), str(entry))
+            self._size = size + len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        if self._size <= self._max_size:
+            return
+        entries = []
+        for entry in self._entries():
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry, ))
+        entries.sort(key=lambda e: e[0])
+        target_size = self._max_size * EVICTION_LOW_WATERMARK
+        for _, size, entry in entries:
+            if self._size <= target_size:
+                break
+            try:
+                entry.unlink()
+            except FileNotFoundError:
+                continue
+            self._size -= size
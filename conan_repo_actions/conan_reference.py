@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+import re
+import sys
+import typing
+
+# {, } and % have been added to the regex to catch string operations
+CONAN_NAME_REGEX_CHAR_STR = '[a-zA-Z0-9_.+{}%\-]'
+CONAN_VERSION_REGEX_CHAR_STR = CONAN_NAME_REGEX_CHAR_STR
+CONAN_USER_REGEX_CHAR_STR = CONAN_NAME_REGEX_CHAR_STR
+CONAN_CHANNEL_REGEX_CHAR_STR = CONAN_NAME_REGEX_CHAR_STR
+CONAN_REF_REGEX_STR = "(?P<ref>(?P<name>{name}+)/(?P<version>{version}+)@(?P<user>{user}+)/(?P<channel>{channel}+))".format(
+    name=CONAN_NAME_REGEX_CHAR_STR,
+    version=CONAN_VERSION_REGEX_CHAR_STR,
+    user=CONAN_USER_REGEX_CHAR_STR,
+    channel=CONAN_CHANNEL_REGEX_CHAR_STR
+)
+CONAN_REF_REGEX = re.compile(CONAN_REF_REGEX_STR)
+
+CONAN_REF_REGEX_IN_CONANFILE_STR = '[\'"]{ref}[\'"]'.format(ref=CONAN_REF_REGEX_STR)
+CONAN_REF_REGEX_IN_CONANFILE = re.compile(CONAN_REF_REGEX_IN_CONANFILE_STR)
+
+CONAN_VERSION_REGEX_IN_SOURCE_STR = 'version\s+=\s+[\'"](?P<version>{}+)[\'"]'.format(CONAN_VERSION_REGEX_CHAR_STR)
+CONAN_VERSION_REGEX_IN_SOURCE = re.compile(CONAN_VERSION_REGEX_IN_SOURCE_STR)
+
+
+class ConanReference(object):
+    ''' Immutable conan reference (name/version@user/channel)
+
+    name, user and channel are interned because they repeat a lot across recipes.
+    '''
+
+    __slots__ = ('_name', '_version', '_user', '_channel', '_reference', '_hash', )
+
+    def __init__(self, name: str, version: str, user: str, channel: str):
+        object.__setattr__(self, '_name', sys.intern(name))
+        object.__setattr__(self, '_version', version)
+        object.__setattr__(self, '_user', sys.intern(user))
+        object.__setattr__(self, '_channel', sys.intern(channel))
+        object.__setattr__(self, '_reference', None)
+        object.__setattr__(self, '_hash', None)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def version(self) -> str:
+        return self._version
+
+    @property
+    def user(self) -> str:
+        return self._user
+
+    @property
+    def channel(self) -> str:
+        return self._channel
+
+    @property
+    def reference(self) -> str:
+        reference = self._reference
+        if reference is None:
+            reference = '{}/{}@{}/{}'.format(self._name, self._version, self._user, self._channel)
+            object.__setattr__(self, '_reference', reference)
+        return reference
+
+    @classmethod
+    def from_regex_match(cls, match: typing.Match) -> 'ConanReference':
+        if match is None:
+            raise ValueError
+        return cls(name=match['name'], version=match['version'], user=match['user'], channel=match['channel'])
+
+    @classmethod
+    def iter_from_conanfile(cls, text: str) -> typing.Iterator['ConanReference']:
+        for m in CONAN_REF_REGEX_IN_CONANFILE.finditer(text):
+            yield cls.from_regex_match(m)
+
+    @classmethod
+    def from_conanfile(cls, text: str) -> typing.List['ConanReference']:
+        return list(cls.iter_from_conanfile(text))
+
+    @classmethod
+    def from_refstr(cls, refstr: str) -> 'ConanReference':
+        return cls.from_regex_match(CONAN_REF_REGEX.search(refstr))
+
+    def _key(self) -> typing.Tuple[str, str, str, str]:
+        return self._name, self._version, self._user, self._channel
+
+    def __eq__(self, other) -> bool:
+        if type(self) != type(other):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __ne__(self, other) -> bool:
+        if type(self) != type(other):
+            return NotImplemented
+        return self._key() != other._key()
+
+    def __lt__(self, other: 'ConanReference') -> bool:
+        if type(self) != type(other):
+            return NotImplemented
+        return self._key() < other._key()
+
+    def __hash__(self) -> int:
+        h = self._hash
+        if h is None:
+            h = hash(self._key())
+            object.__setattr__(self, '_hash', h)
+        return h
+
+    def __setattr__(self, key, value):
+        raise AttributeError('{} is immutable'.format(type(self).__name__))
+
+    def __delattr__(self, key):
+        raise AttributeError('{} is immutable'.format(type(self).__name__))
+
+    def __reduce__(self):
+        return type(self), self._key()
+
+    def __str__(self) -> str:
+        return self.reference
+
+    def __repr__(self):
+        return '<{}:{}>'.format(type(self).__name__, self.reference)
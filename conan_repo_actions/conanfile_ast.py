@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+
+import ast
+from collections import namedtuple
+import threading
+import typing
+import yaml
+from .cache import BlobCache
+from .conan_reference import ConanReference, CONAN_REF_REGEX
+
+# Increase when the extraction changes, so results cached on disk are not reused
+AST_EXTRACTOR_VERSION = 1
+
+ConanfileInfo = namedtuple('ConanfileInfo', ('name', 'version', 'requires', 'build_requires', ))
+
+_REQUIRES_KINDS = ('requires', 'build_requires', )
+
+
+class _Unresolved(Exception):
+    pass
+
+
+class _Evaluator(object):
+    ''' Evaluate simple string expressions, without executing any code '''
+
+    def __init__(self, name_scopes: typing.Sequence[typing.Mapping[str, ast.AST]],
+                 attribute_scopes: typing.Sequence[typing.Mapping[str, ast.AST]]):
+        self._name_scopes = name_scopes
+        self._attribute_scopes = attribute_scopes
+        self._depth = 0
+
+    def evaluate(self, node: ast.AST) -> typing.Any:
+        self._depth += 1
+        try:
+            if self._depth > 32:
+                raise _Unresolved()
+            return self._evaluate(node)
+        finally:
+            self._depth -= 1
+
+    def _lookup(self, scopes: typing.Sequence[typing.Mapping[str, ast.AST]], name: str) -> typing.Any:
+        for scope in scopes:
+            if name in scope:
+                return self.evaluate(scope[name])
+        raise _Unresolved()
+
+    def _evaluate(self, node: ast.AST) -> typing.Any:
+        if isinstance(node, ast.Constant) and isinstance(node.value, (str, int, float, bool, type(None), )):
+            return node.value
+        if isinstance(node, (ast.Tuple, ast.List, )):
+            return tuple(self.evaluate(elt) for elt in node.elts)
+        if isinstance(node, ast.Name):
+            return self._lookup(self._name_scopes, node.id)
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == 'self':
+            return self._lookup(self._attribute_scopes, node.attr)
+        if isinstance(node, ast.JoinedStr):
+            return ''.join(str(self.evaluate(value)) for value in node.values)
+        if isinstance(node, ast.FormattedValue):
+            if node.conversion not in (-1, None) or node.format_spec is not None:
+                raise _Unresolved()
+            return self.evaluate(node.value)
+        if isinstance(node, ast.BinOp):
+            left = self.evaluate(node.left)
+            if isinstance(node.op, ast.Add):
+                right = self.evaluate(node.right)
+                if isinstance(left, str) and isinstance(right, str):
+                    return left + right
+            elif isinstance(node.op, ast.Mod) and isinstance(left, str):
+                right = self.evaluate(node.right)
+                try:
+                    return left % right
+                except (TypeError, ValueError):
+                    raise _Unresolved()
+            raise _Unresolved()
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'format':
+            fmt = self.evaluate(node.func.value)
+            if not isinstance(fmt, str) or any(isinstance(arg, ast.Starred) for arg in node.args) \
+                    or any(keyword.arg is None for keyword in node.keywords):
+                raise _Unresolved()
+            args = list(self.evaluate(arg) for arg in node.args)
+            kwargs = dict((keyword.arg, self.evaluate(keyword.value), ) for keyword in node.keywords)
+            try:
+                return fmt.format(*args, **kwargs)
+            except (IndexError, KeyError, ValueError, AttributeError):
+                raise _Unresolved()
+        raise _Unresolved()
+
+
+def _assignments(body: typing.Iterable[ast.stmt]) -> typing.Dict[str, ast.AST]:
+    result = dict()
+    for stmt in body:
+        if isinstance(stmt, ast.Assign):
+            for target in stmt.targets:
+                if isinstance(target, ast.Name):
+                    result[target.id] = stmt.value
+        elif isinstance(stmt, ast.AnnAssign) and isinstance(stmt.target, ast.Name) and stmt.value is not None:
+            result[stmt.target.id] = stmt.value
+    return result
+
+
+def _function_assignments(function: ast.FunctionDef) -> typing.Dict[str, ast.AST]:
+    result = dict()
+    for node in ast.walk(function):
+        if isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    result[target.id] = node.value
+    return result
+
+
+def _requirement_refs(value: typing.Any) -> typing.Iterator[str]:
+    ''' Conan accepts a reference, a (reference, "private") tuple, or a tuple/list of those '''
+    if isinstance(value, str):
+        for ref in value.split(','):
+            ref = ref.strip()
+            if ref:
+                yield ref
+    elif isinstance(value, tuple):
+        if len(value) == 2 and isinstance(value[0], str) and value[1] in ('private', 'override', ):
+            yield value[0]
+        else:
+            for item in value:
+                for ref in _requirement_refs(item):
+                    yield ref
+
+
+def _requires_call_kind(call: ast.Call) -> typing.Optional[str]:
+    ''' self.requires(...), self.requires.add(...), self.build_requires(...) or self.build_requires.add(...) '''
+    func = call.func
+    if isinstance(func, ast.Attribute) and func.attr == 'add':
+        func = func.value
+    if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == 'self':
+        if func.attr in _REQUIRES_KINDS:
+            return func.attr
+    return None
+
+
+def conanfile_ast_info(text: str) -> ConanfileInfo:
+    ''' Extract name, version and requirements of a conanfile by parsing it, without executing it
+
+    Only the information of this file is used: attributes inherited from classes in other files are unknown.
+    References that cannot be resolved statically are skipped.
+    '''
+    try:
+        module = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return ConanfileInfo(name=None, version=None, requires=[], build_requires=[])
+
+    module_scope = _assignments(module.body)
+    classes = dict((node.name, node) for node in module.body if isinstance(node, ast.ClassDef))
+
+    def class_scopes(cls: ast.ClassDef, seen: typing.Set[str]) -> typing.List[typing.Dict[str, ast.AST]]:
+        scopes = [_assignments(cls.body), ]
+        for base in cls.bases:
+            if isinstance(base, ast.Name) and base.id in classes and base.id not in seen:
+                seen.add(base.id)
+                scopes.extend(class_scopes(classes[base.id], seen))
+        return scopes
+
+    name = None
+    version = None
+    requires = []
+    build_requires = []
+
+    def add_refs(kind: str, value: typing.Any):
+        for refstr in _requirement_refs(value):
+            if CONAN_REF_REGEX.fullmatch(refstr):
+                (requires if kind == 'requires' else build_requires).append(refstr)
+
+    for cls in classes.values():
+        scopes = class_scopes(cls, {cls.name, })
+        evaluator = _Evaluator(scopes + [module_scope, ], scopes)
+        own_scope = scopes[0]
+
+        for attribute in ('name', 'version', ):
+            if attribute not in own_scope:
+                continue
+            try:
+                value = evaluator.evaluate(own_scope[attribute])
+            except _Unresolved:
+                continue
+            if not isinstance(value, str):
+                continue
+            if attribute == 'name':
+                name = value
+            else:
+                version = value
+
+        for kind in ('requires', 'build_requires', ):
+            if kind in own_scope:
+                try:
+                    add_refs(kind, evaluator.evaluate(own_scope[kind]))
+                except _Unresolved:
+                    pass
+
+        for function in cls.body:
+            if not isinstance(function, ast.FunctionDef):
+                continue
+            function_evaluator = _Evaluator([_function_assignments(function), module_scope, ], scopes)
+            calls = sorted((node for node in ast.walk(function) if isinstance(node, ast.Call)),
+                           key=lambda node: (node.lineno, node.col_offset, ))
+            for node in calls:
+                kind = _requires_call_kind(node)
+                if kind is None or not node.args:
+                    continue
+                try:
+                    add_refs(kind, function_evaluator.evaluate(node.args[0]))
+                except _Unresolved:
+                    pass
+
+    return ConanfileInfo(name=name, version=version, requires=requires, build_requires=build_requires)
+
+
+class ConanfileAstExtractor(object):
+    ''' Extract the information of conanfiles, memoized by blob sha in memory and in an optional BlobCache '''
+
+    AST_KIND = 'ast'
+
+    def __init__(self, cache: typing.Optional[BlobCache]=None):
+        self._cache = cache
+        self._memo = dict()
+        self._lock = threading.Lock()
+
+    def info(self, text: str, blob_sha: typing.Optional[str]=None) -> ConanfileInfo:
+        if blob_sha is None:
+            return conanfile_ast_info(text)
+        with self._lock:
+            info = self._memo.get(blob_sha)
+        if info is not None:
+            return info
+        key = '{}-{}'.format(blob_sha, AST_EXTRACTOR_VERSION)
+        data = None if self._cache is None else self._cache.get_data(self.AST_KIND, key)
+        if data is not None:
+            info = ConanfileInfo(**yaml.safe_load(data.decode()))
+        else:
+            info = conanfile_ast_info(text)
+            if self._cache is not None:
+                self._cache.put_data(self.AST_KIND, key, yaml.safe_dump(dict(info._asdict())).encode())
+        with self._lock:
+            self._memo[blob_sha] = info
+        return info
+
+    def dependencies(self, files: typing.Iterable[typing.Tuple[typing.Optional[str], str]]) -> \
+            typing.Tuple[typing.List[ConanReference], typing.Optional[str]]:
+        ''' Dependencies and version of a recipe consisting of (blob sha, text) files '''
+        deps = []
+        version = None
+        recipe_version = None
+        for blob_sha, text in files:
+            info = self.info(text, blob_sha=blob_sha)
+            deps.extend(ConanReference.from_refstr(ref) for ref in info.requires)
+            deps.extend(ConanReference.from_refstr(ref) for ref in info.build_requires)
+            if info.version is not None:
+                version = info.version
+                if info.name is not None and recipe_version is None:
+                    recipe_version = info.version
+        return deps, recipe_version if recipe_version is not None else version
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+
+import concurrent.futures
+import typing
+
+T = typing.TypeVar('T')
+R = typing.TypeVar('R')
+
+
+def map_concurrent(fn: typing.Callable[[T], R], items: typing.Iterable[T], jobs: int=1) -> typing.List[R]:
+    ''' Apply fn on every item using a bounded pool of worker threads
+
+    :param fn: function to call for every item
+    :param items: items to process
+    :param jobs: maximum number of concurrent calls (<= 1 means serial)
+    :return: list of results, in the same order as items
+    '''
+    items = list(items)
+    if jobs <= 1 or len(items) <= 1:
+        return list(fn(item) for item in items)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(jobs, len(items))) as executor:
+        return list(executor.map(fn, items))
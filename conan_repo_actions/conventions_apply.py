@@ -14,6 +14,9 @@ from conan_repo_actions.base import ActionBase, ActionInterrupted
 from conan_repo_actions.default_branch import WhichBranch
 from conan_repo_actions.util import Configuration, chargv, chdir, GithubUser, input_ask_question_yn
 from conan_repo_actions.fork_create import fork_create, ForkCreateAction
+from conan_repo_actions.git_mirror import clone_options_partial, clone_repository, CloneOptions, fetch_remote, \
+    FULL_CLONE, GitMirrorCache
+from conan_repo_actions.permissions import shared_permission_cache
 from conan_repo_actions.default_branch import ConanRepo
 from pathlib import Path
 import shutil
@@ -25,6 +28,8 @@ def main():
     parser.add_argument('--owner_login', type=str, required=True, help='owner of the repo to clone')
     parser.add_argument('--keep_clone', action='store_true', help='do not remove already checked out repos')
     parser.add_argument('--git_wd', type=Path, default=None, help='path where to clone the repos to')
+    argparse_add_mirror_option(parser)
+    argparse_add_clone_options(parser)
     parser.add_argument('--interactive', action='store_true', help='interactive')
     parser.add_argument('--channel_suffix', default=generate_default_channel_suffix(),
                         help='suffix to append to the channel')
@@ -46,7 +51,9 @@ def main():
                                         user_to=user_to,
                                         git_wd=c.git_wd, channel_suffix=args.channel_suffix,
                                         run_conventions=args.apply_conventions, run_readme=args.apply_readme,
-                                        keep_clone=args.keep_clone, interactive=args.interactive)
+                                        keep_clone=args.keep_clone, interactive=args.interactive,
+                                        mirrors=c.get_git_mirror_cache() if args.use_mirror else None,
+                                        clone_options=clone_options_from_args(parser, args))
 
     if push_data is not None:
         print('Pushed changes to branch "{}" of "{}"'.format(push_data.branch_to, push_data.repo_to.full_name))
@@ -54,6 +61,29 @@ def main():
         print('Scripts did not change anything')
 
 
+def argparse_add_mirror_option(parser: argparse.ArgumentParser):
+    parser.add_argument('--no-mirror', dest='use_mirror', action='store_false',
+                        help='clone from github, instead of from the local mirrors of the repos in git_wd')
+
+
+def argparse_add_clone_options(parser: argparse.ArgumentParser):
+    group = parser.add_argument_group('Clone')
+    group.add_argument('--depth', type=int, default=None, help='clone only this number of commits of history')
+    group.add_argument('--single-branch', dest='single_branch', action='store_true',
+                       help='clone only the branch the scripts run on')
+    group.add_argument('--blobless', action='store_true',
+                       help='partial clone: download the file contents only when checked out')
+    group.add_argument('--sparse', action='store_true',
+                       help='check out only the files in the root of the repo and the recipe and CI directories')
+
+
+def clone_options_from_args(parser: argparse.ArgumentParser, args: argparse.Namespace) -> CloneOptions:
+    if args.use_mirror and (args.depth or args.blobless):
+        parser.error('--depth and --blobless need --no-mirror: a clone from a mirror has all objects already')
+    return CloneOptions(depth=args.depth, single_branch=args.single_branch, blobless=args.blobless,
+                        sparse=args.sparse)
+
+
 def argparse_add_what_conventions(parser: argparse.ArgumentParser):
     group = parser.add_argument_group()
     group.add_argument('--do-not-apply-readme', dest='apply_readme', action='store_false',
@@ -88,23 +118,33 @@ def calculate_repo_branch(user: GithubUser, repo_branch_name: str) -> 'GithubRep
     return GithubRepoBranch(repo, branch)
 
 
-def calculate_branch(repo: Repository, branch_dest: typing.Union[WhichBranch, str]) -> typing.Optional[str]:
+def calculate_branch(repo: Repository, branch_dest: typing.Union[WhichBranch, str],
+                     conan_repo: typing.Optional[ConanRepo]=None) -> typing.Optional[str]:
     if branch_dest == WhichBranch.DEFAULT:
         return repo.default_branch
+    elif isinstance(branch_dest, WhichBranch):
+        if conan_repo is None:
+            conan_repo = ConanRepo.from_repo(repo)
+        return calculate_conan_repo_branch(conan_repo, branch_dest)
+    else:
+        return branch_dest
+
+
+def calculate_conan_repo_branch(conan_repo: ConanRepo,
+                                branch_dest: typing.Union[WhichBranch, str]) -> typing.Optional[str]:
+    if branch_dest == WhichBranch.DEFAULT:
+        return conan_repo.default_branch.name
     elif branch_dest == WhichBranch.LATEST:
-        conan_repo = ConanRepo.from_repo(repo)
         most_recent_version = conan_repo.most_recent_version()
         if most_recent_version is None:
             return
         return next(conan_repo.get_branches_by_version(most_recent_version)).name
     elif branch_dest == WhichBranch.LATEST_STABLE:
-        conan_repo = ConanRepo.from_repo(repo)
         most_recent_branch = conan_repo.most_recent_branch_by_channel('stable')
         if most_recent_branch is None:
             return
         return most_recent_branch.name
     elif branch_dest == WhichBranch.LATEST_TESTING:
-        conan_repo = ConanRepo.from_repo(repo)
         most_recent_branch = conan_repo.most_recent_branch_by_channel('testing')
         if most_recent_branch is None:
             return
@@ -176,19 +216,24 @@ def apply_scripts_and_push(repo_name: str, from_branch: str,
 
 
 class GithubRepoBranch(object):
-    def __init__(self, repo: typing.Optional[Repository]=None, branch: typing.Optional[str]=None):
+    def __init__(self, repo: typing.Optional[Repository]=None, branch: typing.Optional[str]=None,
+                 commit: typing.Optional[str]=None):
         self.repo = repo
         self.branch = branch
+        self.commit = commit
 
 
 def apply_scripts_and_push2(repobranch_from: GithubRepoBranch, user_to: AuthenticatedUser,
                             git_wd: Path, channel_suffix: str,
                             run_conventions: bool=True, run_readme: bool=True,
-                            keep_clone: bool=False, interactive: bool=False) -> typing.Optional[ConventionsApplyResult]:
+                            keep_clone: bool=False, interactive: bool=False,
+                            mirrors: typing.Optional[GitMirrorCache]=None,
+                            clone_options: CloneOptions=FULL_CLONE) -> typing.Optional[ConventionsApplyResult]:
     apply_action = ConventionsApplyAction(repobranch_from=repobranch_from, user_to=user_to,
                                           wd=git_wd, channel_suffix=channel_suffix,
                                           run_conventions=run_conventions, run_readme=run_readme,
-                                          keep_clone=keep_clone, interactive=interactive)
+                                          keep_clone=keep_clone, interactive=interactive, mirrors=mirrors,
+                                          clone_options=clone_options)
 
     apply_action.check()
     print(apply_action.description())
@@ -202,10 +247,16 @@ def apply_scripts_and_push2(repobranch_from: GithubRepoBranch, user_to: Authenti
 class ConventionsApplyAction(ActionBase):
     def __init__(self, repobranch_from: GithubRepoBranch, user_to: AuthenticatedUser,
                  wd: Path, channel_suffix: str=None, run_conventions: bool=True, run_readme: bool=True,
-                 which_branch: typing.Union[WhichBranch, str]=WhichBranch.DEFAULT, keep_clone: bool=False,  interactive: bool=False):
+                 which_branch: typing.Union[WhichBranch, str]=WhichBranch.DEFAULT, keep_clone: bool=False,  interactive: bool=False,
+                 mirrors: typing.Optional[GitMirrorCache]=None, clone_options: CloneOptions=FULL_CLONE,
+                 conan_repo: typing.Optional[ConanRepo]=None):
+        '''
+        :param conan_repo: branches of repo_from (e.g. loaded in bulk), else they are listed when needed
+        '''
         super().__init__()
 
         self._repo_branch_from = repobranch_from
+        self._conan_repo = conan_repo
 
         self._repo_to = None
         self._branch_to = None
@@ -218,6 +269,8 @@ class ConventionsApplyAction(ActionBase):
         self._which_branch = which_branch
 
         self._keep_clone = keep_clone
+        self._mirrors = mirrors
+        self._clone_options = clone_options
         self._interactive = interactive
 
         self._work_done = None
@@ -229,7 +282,8 @@ class ConventionsApplyAction(ActionBase):
         if self._repo_branch_from.repo is None:
             raise ActionInterrupted()
         if self._repo_branch_from.branch is None:
-            self._repo_branch_from.branch = calculate_branch(self._repo_branch_from.repo, self._which_branch)
+            self._repo_branch_from.branch = calculate_branch(self._repo_branch_from.repo, self._which_branch,
+                                                             conan_repo=self._conan_repo)
         if self._repo_branch_from.branch is None:
             raise ActionInterrupted('Unknown branch')
         if not any((self._run_conventions, self._run_readme, )):
@@ -240,9 +294,13 @@ class ConventionsApplyAction(ActionBase):
         fork_action.action()
 
         self._repo_to = fork_action.repo_to
+        if not shared_permission_cache().can_push(self._repo_to):
+            raise ActionInterrupted('No write access to "{}"'.format(self._repo_to.full_name))
 
         clone_action = RepoCloneAction(repo_from=self._repo_branch_from.repo, repo_to=self._repo_to,
-                                       wd=self._wd, keep_clone=self._keep_clone, branch=self._repo_branch_from.branch)
+                                       wd=self._wd, keep_clone=self._keep_clone, branch=self._repo_branch_from.branch,
+                                       conan_repo=self._conan_repo, mirrors=self._mirrors,
+                                       clone_options=self._clone_options)
         clone_action.action()
 
         repo = git.Repo(clone_action.repo_wd)
@@ -251,7 +309,8 @@ class ConventionsApplyAction(ActionBase):
 
         def commit_changes(repo, message):
             nonlocal updated
-            repo.git.add(all=True)
+            # In a sparse checkout, new files outside the sparse directories must be added too
+            repo.git.add(all=True, sparse=self._clone_options.sparse)
             if repo.is_dirty():
                 repo.index.commit(message=message)
                 updated = True
@@ -329,7 +388,9 @@ class ConventionsApplyAction(ActionBase):
 
 class RepoCloneAction(ActionBase):
     def __init__(self, repo_from: Repository, repo_to: Repository, wd: Path, keep_clone: bool=False,
-                 name_from: str='origin', name_to: str='user', branch: typing.Union[str, WhichBranch]=WhichBranch.DEFAULT):
+                 name_from: str='origin', name_to: str='user', branch: typing.Union[str, WhichBranch]=WhichBranch.DEFAULT,
+                 conan_repo: typing.Optional[ConanRepo]=None, mirrors: typing.Optional[GitMirrorCache]=None,
+                 clone_options: CloneOptions=FULL_CLONE):
         super().__init__()
         self._repo_from = repo_from
         self._repo_to = repo_to
@@ -338,6 +399,8 @@ class RepoCloneAction(ActionBase):
         self._repo_wd = wd / repo_from.name
 
         self._keep_clone = keep_clone
+        self._mirrors = mirrors
+        self._clone_options = clone_options
 
         self._name_from = name_from
         self._name_to = name_to
@@ -345,7 +408,9 @@ class RepoCloneAction(ActionBase):
         if isinstance(branch, str):
             self._branch = branch
         else:
-            self._branch = ConanRepo.from_repo(self._repo_from).select_branch(branch).name
+            if conan_repo is None:
+                conan_repo = ConanRepo.from_repo(self._repo_from)
+            self._branch = conan_repo.select_branch(branch).name
 
     def run_check(self):
         assert self._wd.is_dir()
@@ -356,10 +421,15 @@ class RepoCloneAction(ActionBase):
                 shutil.rmtree(self._repo_wd)
 
         if not self._repo_wd.exists():
-            r = git.Repo.clone_from(url=self._repo_from.clone_url, to_path=self._repo_wd)
+            r = clone_repository(url=self._repo_from.clone_url, to_path=self._repo_wd, branch=self._branch,
+                                 options=self._clone_options, mirrors=self._mirrors)
             r.remote('origin').rename(self._name_from)
             r.git.remote(['add', self._name_to, self._repo_to.ssh_url])
-            r.remote(self._name_to).update()
+            if clone_options_partial(self._clone_options):
+                # Do not download the whole history of the fork into a partial clone
+                fetch_remote(r, self._name_to, branch=self._branch, options=self._clone_options)
+            else:
+                r.remote(self._name_to).update()
 
         r = git.Repo(self._repo_wd)
         r.git.checkout('{}/{}'.format(self._name_from, self._branch), B=self._branch, force=True, track=True)
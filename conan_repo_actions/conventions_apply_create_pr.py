@@ -8,10 +8,13 @@ from github.Repository import Repository
 from github.Issue import Issue
 from github.PullRequest import PullRequest
 from .base import ActionInterrupted, ActionBase
-from .conventions_apply import GithubRepoBranch, apply_scripts_and_push, argparse_add_which_branch_option,\
-    argparse_add_what_conventions, calculate_repo_branch, generate_default_channel_suffix, WhichBranch, \
+from .conventions_apply import GithubRepoBranch, apply_scripts_and_push, argparse_add_clone_options, \
+    argparse_add_mirror_option, argparse_add_which_branch_option, argparse_add_what_conventions, \
+    clone_options_from_args, calculate_repo_branch, generate_default_channel_suffix, WhichBranch, \
     ConventionsApplyAction
+from .default_branch import conan_repos_graphql, ConanRepo
 from .fork_create import ForkCreateAction
+from .git_mirror import CloneOptions, FULL_CLONE, GitMirrorCache
 from .util import input_ask_question_yn, editor_interactive
 from conan_repo_actions.util import Configuration
 from pathlib import Path
@@ -23,12 +26,16 @@ def main():
     parser.add_argument('--owner_login', type=str, required=True, help='owner of the repo to clone')
     parser.add_argument('--keep_clone', action='store_true', help='do not remove already checked out repos')
     parser.add_argument('--git_wd', type=Path, default=None, help='path where to clone the repos to')
+    argparse_add_mirror_option(parser)
+    argparse_add_clone_options(parser)
     parser.add_argument('--interactive', action='store_true', help='interactive')
     parser.add_argument('--channel_suffix', type=str, default=generate_default_channel_suffix(),
                         help='suffix to append to the channel')
     parser.add_argument('--repo_issue', required=True, help='repo where to post the summary to (format: [USER:]REPO)')
     parser.add_argument('--message', '-m', type=str, default=None, help='extra text message')
     parser.add_argument('--test', action='store_true', help='Create pr and issue to own forked repos')
+    parser.add_argument('--graphql', action='store_true',
+                        help='load the branches of all repos in a few requests using the GraphQL api')
     argparse_add_which_branch_option(parser)
     argparse_add_what_conventions(parser)
     parser.add_argument('repos', type=str, nargs=argparse.ONE_OR_MORE,
@@ -53,11 +60,18 @@ def main():
             print('Unknown repo: {}'.format(repo_name))
             raise
 
+    conan_repos = None
+    if args.graphql and isinstance(args.branch_dest, WhichBranch) and args.branch_dest != WhichBranch.DEFAULT:
+        conan_repos = conan_repos_graphql(c.get_github_graphql(), args.owner_login,
+                                          list(repobranch_from.repo.name for repobranch_from in repobranches_from))
+
     action = ConventionsCreatePullAction(repobranches_from=repobranches_from, repo_issue=repo_issue, user_to=user_to,
                                          wd=c.git_wd, which_branch=args.branch_dest, channel_suffix=args.channel_suffix,
                                          extra_message=args.message,
                                          run_conventions=args.apply_conventions, run_readme=args.apply_readme,
-                                         test=args.test, interactive=args.interactive)
+                                         test=args.test, interactive=args.interactive,
+                                         mirrors=c.get_git_mirror_cache() if args.use_mirror else None,
+                                         clone_options=clone_options_from_args(parser, args), conan_repos=conan_repos)
     action.check()
     action.action()
 
@@ -81,7 +95,12 @@ class ConventionsCreatePullAction(ActionBase):
     def __init__(self, user_to: AuthenticatedUser, repobranches_from: typing.Iterable[GithubRepoBranch],
                  repo_issue: Repository, wd: Path, which_branch: WhichBranch=WhichBranch.DEFAULT, channel_suffix: str=None,
                  extra_message: typing.Optional[str]=None, run_conventions: bool = True, run_readme: bool = True,
-                 test: bool=False, interactive: bool=False):
+                 test: bool=False, interactive: bool=False, mirrors: typing.Optional[GitMirrorCache]=None,
+                 clone_options: CloneOptions=FULL_CLONE,
+                 conan_repos: typing.Optional[typing.Mapping[str, ConanRepo]]=None):
+        '''
+        :param conan_repos: branches of the repos (e.g. loaded in bulk), keyed by repo name
+        '''
         super().__init__(interactive=interactive)
         self._user_to = user_to
 
@@ -92,6 +111,9 @@ class ConventionsCreatePullAction(ActionBase):
         self._channel_suffix = channel_suffix
 
         self._wd = wd
+        self._mirrors = mirrors
+        self._clone_options = clone_options
+        self._conan_repos = conan_repos or dict()
         self._interactive = interactive
 
         self._which_branch = which_branch
@@ -114,7 +136,9 @@ class ConventionsCreatePullAction(ActionBase):
                 actions.append(ConventionsApplyAction(repobranch_from=repobranch_from, user_to=self._user_to,
                                                       channel_suffix=self._channel_suffix, wd=self._wd,
                                                       run_conventions=self._run_conventions, run_readme=self._run_readme,
-                                                      which_branch=self._which_branch, interactive=self._interactive))
+                                                      which_branch=self._which_branch, interactive=self._interactive,
+                                                      mirrors=self._mirrors, clone_options=self._clone_options,
+                                                      conan_repo=self._conan_repos.get(repobranch_from.repo.name)))
             self._conventions_actions = actions
 
         for convention_action in self._conventions_actions:
@@ -2,15 +2,35 @@
 # -*- coding: utf-8 -*-
 
 import argparse
-from collections import OrderedDict
+import asyncio
+from collections import namedtuple, OrderedDict
+import datetime
 import enum
+import functools
 from github.Branch import Branch
 from github.Repository import Repository
+import hashlib
+import threading
 from conan_repo_actions.base import ActionInterrupted, ActionBase
-from conan_repo_actions.util import Configuration, GithubUser, input_ask_question_yn, input_ask_question_options
+from conan_repo_actions.cache import BlobCache
+from conan_repo_actions.github_graphql import GithubGraphQL, RepoRefs
+from conan_repo_actions.metadata import snapshot_repositories, UnknownRepositoriesError
+from conan_repo_actions.permissions import shared_permission_cache
+from conan_repo_actions.concurrency import map_concurrent
+from conan_repo_actions.util import Configuration, GithubUser, argparse_add_jobs_option, \
+    argparse_add_snapshot_options, github_error_is_transient, \
+    input_ask_question_yn, input_ask_question_options, retry_call
 from packaging.version import Version, InvalidVersion
 import re
+import sys
 import typing
+import yaml
+
+# Maximum number of parsed versions kept in memory. Version strings repeat a lot across repos of an owner.
+VERSION_CACHE_SIZE = 4096
+
+# Version of the rules of check_default_branch: bump it when they change, so stored audits are evaluated again
+AUDIT_VERSION = 2
 
 
 def main():
@@ -19,28 +39,93 @@ def main():
                         help='names of repo to check (skip if check all)')
     parser.add_argument('--owner_login', type=str, required=True,
                         help='owner of the repo to clone')
-    parser.add_argument('--fix', action='store_true',
-                        help='fix the default branch')
+    fix_group = parser.add_mutually_exclusive_group()
+    fix_group.add_argument('--fix', action='store_true',
+                           help='fix the default branch, asking what to do')
+    fix_group.add_argument('--policy', action='store_true',
+                           help='fix the default branch without asking: switch to the newest non-prerelease branch, '
+                                'preferring the testing channel')
+    parser.add_argument('--dry-run', dest='dry_run', action='store_true',
+                        help='only print the changes planned by --policy')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='number of attempts of every change of --policy (default=3)')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='use the asyncio github client')
+    argparse_add_jobs_option(parser)
+    parser.add_argument('--graphql', action='store_true',
+                        help='fetch the branches of all repos in bulk using the GraphQL api')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help='evaluate all repos again, ignoring the audits of previous runs')
+    parser.add_argument('--trust-pushed-at', dest='trust_pushed_at', action='store_true',
+                        help='replay the audits of repos not pushed to since a previous run without listing their '
+                             'branches. Misses branches renamed or deleted through the web interface or the api. '
+                             'Without --graphql or --snapshot, this saves one request per repo')
+    argparse_add_snapshot_options(parser)
 
     args = parser.parse_args()
     if not args.repo_names:
         args.repo_names = None
 
     c = Configuration()
+    audit_cache = DefaultBranchAuditCache(c.get_blob_cache(), trust_pushed_at=args.trust_pushed_at) \
+        if args.use_cache else None
+
+    if args.use_async:
+        if args.policy:
+            parser.error('--policy is not supported with --async')
+        if args.jobs != 1 or args.graphql or args.snapshot or args.refresh:
+            parser.error('--jobs, --graphql, --snapshot and --refresh are not supported with --async')
+        asyncio.run(default_branch_check_async(owner_login=args.owner_login, repos=args.repo_names, fix=args.fix,
+                                               audit_cache=audit_cache))
+        return
+
     g = c.get_github()
 
     user_owner = g.get_user(args.owner_login)
 
-    default_branch_check(user=user_owner, fix=args.fix, repos=args.repo_names)
+    repos = args.repo_names
+    branches = None
+    if args.snapshot or args.refresh:
+        with c.get_metadata_store() as store:
+            stats = c.get_metadata_refresher(store, jobs=args.jobs).refresh_owner(args.owner_login, full=args.refresh)
+            print('Snapshot of {} repos: {} requests ({} not modified)'.format(
+                stats.repos, stats.requests, stats.not_modified))
+            try:
+                repos = snapshot_repositories(g, store, args.owner_login, args.repo_names)
+            except UnknownRepositoriesError as e:
+                parser.error(str(e))
+            branches = dict((repo.name, list(store.branches(repo.full_name)), ) for repo in repos)
+    elif args.graphql:
+        branches = dict((repo_refs.name, list(repo_refs.branches), )
+                        for repo_refs in c.get_github_graphql().repositories_refs(args.owner_login, args.repo_names))
+
+    default_branch_check(user=user_owner, fix=args.fix, repos=repos, jobs=args.jobs,
+                         branches=branches, policy=args.policy, dry_run=args.dry_run, retries=args.retries,
+                         audit_cache=audit_cache)
+
+
+def conan_repos_graphql(gql: GithubGraphQL, owner: str, names: typing.Optional[typing.Iterable[str]]=None) -> \
+        typing.Dict[str, 'ConanRepo']:
+    ''' ConanRepo of the repos of owner (or only the repos in names), keyed by repo name '''
+    return dict((repo_refs.name, ConanRepo.from_repo_refs(repo_refs), )
+                for repo_refs in gql.repositories_refs(owner, names))
 
 
 def default_branch_check(user: typing.Optional[GithubUser],
            repos: typing.Optional[typing.List[typing.Union[str, Repository]]]=None,
-           fix: bool=False):
+           fix: bool=False, jobs: int=1, branches: typing.Optional[typing.Mapping[str, typing.Sequence[str]]]=None,
+           policy: bool=False, dry_run: bool=False, retries: int=3,
+           audit_cache: typing.Optional['DefaultBranchAuditCache']=None):
 
     action_default = DefaultBranchAction(user=user,
                                          repos=repos,
-                                         fix=fix)
+                                         fix=fix,
+                                         jobs=jobs,
+                                         branches=branches,
+                                         policy=policy,
+                                         dry_run=dry_run,
+                                         retries=retries,
+                                         audit_cache=audit_cache)
     action_default.check()
     print(action_default.description())
     action_default.run_action()
@@ -49,35 +134,88 @@ def default_branch_check(user: typing.Optional[GithubUser],
 class DefaultBranchAction(ActionBase):
     def __init__(self, user: typing.Optional[GithubUser],
                  repos: typing.Optional[typing.List[typing.Union[str, Repository]]]=None,
-                 fix: bool=False):
+                 fix: bool=False, jobs: int=1,
+                 branches: typing.Optional[typing.Mapping[str, typing.Sequence[str]]]=None,
+                 policy: bool=False, dry_run: bool=False, retries: int=3,
+                 audit_cache: typing.Optional['DefaultBranchAuditCache']=None):
+        '''
+        :param branches: branch names of repos, keyed by repo name. The branches of other repos are listed.
+        :param audit_cache: replay the checks of repos whose branches did not change since a previous run
+        '''
         super().__init__()
         self._user = user
         self._repos = repos
 
         self._fix = fix
+        self._jobs = jobs
+        self._branches = branches or dict()
+        self._audit_cache = audit_cache
+
+        self._policy = policy
+        self._dry_run = dry_run
+        self._retries = retries
 
     def run_check(self):
-        repos = []
         if self._repos is not None:
-            for repo in self._repos:
-                if isinstance(repo, str):
-                    repos.append(self._user.get_repo(repo))
-                else:
-                    repos.append(repo)
+            repos = map_concurrent(lambda repo: self._user.get_repo(repo) if isinstance(repo, str) else repo,
+                                   self._repos, jobs=self._jobs)
         else:
             if self._user is None:
                 raise ActionInterrupted('Need user')
             repos = list(self._user.get_repos())
 
-        if self._fix:
-            for repo in repos:
-                if not repo.has_in_collaborators(self._user.login):
-                    raise ActionInterrupted('Cannot fix "{}": {} is not a collaborator'.format(repo.full_name, self._user.login))
+        if self._fix or (self._policy and not self._dry_run):
+            # The permissions are part of the repo listing: no request per repo
+            admins = map_concurrent(shared_permission_cache().is_admin, repos, jobs=self._jobs)
+            for repo, admin in zip(repos, admins):
+                if not admin:
+                    raise ActionInterrupted('Cannot fix "{}": no admin permission'.format(repo.full_name))
         self._repos = repos
 
     def run_action(self):
-        for repo in self._repos:
-            self._repo_check_default_branch(repo)
+        # Analyze all repos concurrently first, so the analysis never waits on the questions of --fix
+        checks = map_concurrent(self._repo_analyze_default_branch, self._repos, jobs=self._jobs)
+        if self._audit_cache is not None:
+            print('{} repos evaluated, {} replayed from previous audits'.format(
+                self._audit_cache.evaluated, self._audit_cache.replayed))
+        if self._policy:
+            self._apply_policy(checks)
+            return
+        for repo, check in zip(self._repos, checks):
+            self._repo_check_default_branch(repo, check)
+
+    def _apply_policy(self, checks: typing.Sequence['DefaultBranchCheck']):
+        plan = []
+        for repo, check in zip(self._repos, checks):
+            print_default_branch_check(check)
+            new_default_branch_name = policy_default_branch(check)
+            if new_default_branch_name is not None:
+                plan.append((repo, check, new_default_branch_name, ))
+
+        print('Planned changes of the default branch: {}'.format(len(plan)))
+        for _, check, new_default_branch_name in plan:
+            print('- {}: "{}" -> "{}"'.format(check.full_name, check.default_branch, new_default_branch_name))
+        if self._dry_run or not plan:
+            return
+
+        def apply(item: typing.Tuple[Repository, DefaultBranchCheck, str]) -> typing.Optional[Exception]:
+            repo, _, new_default_branch_name = item
+            try:
+                retry_call(lambda: repo.edit(default_branch=new_default_branch_name), attempts=self._retries,
+                           retry_on=github_error_is_transient)
+            except Exception as e:
+                return e
+            return None
+
+        errors = map_concurrent(apply, plan, jobs=self._jobs)
+        for (_, check, new_default_branch_name), error in zip(plan, errors):
+            if error is None:
+                print('{}: default branch changed to "{}"'.format(check.full_name, new_default_branch_name))
+            else:
+                print('Failed to change the default branch of "{}": {}'.format(check.full_name, error),
+                      file=sys.stderr)
+        nb_errors = sum(1 for error in errors if error is not None)
+        print('{} default branches changed, {} failed'.format(len(plan) - nb_errors, nb_errors))
 
     def run_description(self):
         return 'Check default branch of {nb} repos'.format(
@@ -87,98 +225,321 @@ class DefaultBranchAction(ActionBase):
     def run_sub_actions(self) -> typing.Iterable[ActionBase]:
         return ()
 
-    def _repo_check_default_branch(self, github_repo: Repository):
+    def _repo_analyze_default_branch(self, github_repo: Repository) -> 'DefaultBranchCheck':
         if github_repo.archived:
-            print("{}: archived".format(github_repo.full_name))
-            return
-
-        repo = ConanRepo.from_repo(github_repo)
+            return check_default_branch(github_repo.full_name, archived=True, repo=None)
+        branch_names = self._branches.get(github_repo.name)
+        pushed_at = None
+        if branch_names is None:
+            # Without known branches, the time of the last push may tell that they did not change (trust_pushed_at)
+            pushed_at = _github_time(github_repo.pushed_at)
+            if self._audit_cache is not None and pushed_at is not None:
+                check = self._audit_cache.replay_listing(github_repo.full_name, pushed_at, github_repo.default_branch)
+                if check is not None:
+                    return check
+            branch_names = list(branch.name for branch in github_repo.get_branches())
+        if self._audit_cache is not None:
+            return self._audit_cache.check(github_repo.full_name, branch_names, github_repo.default_branch,
+                                           pushed_at=pushed_at)
+        conan_repo = ConanRepo.from_branch_names(branch_names, github_repo.default_branch)
+        return check_default_branch(github_repo.full_name, archived=False, repo=conan_repo)
+
+    def _repo_check_default_branch(self, github_repo: Repository, check: typing.Optional['DefaultBranchCheck']=None):
+        if check is None:
+            check = self._repo_analyze_default_branch(github_repo)
+        print_default_branch_check(check)
+
+        if self._fix and not check.archived:
+            new_default_branch_name = ask_new_default_branch(check)
+            if new_default_branch_name is not None:
+                print('Changing default branch to {} ...'.format(new_default_branch_name))
+                github_repo.edit(default_branch=new_default_branch_name)
+                print('... done'.format(new_default_branch_name))
+
+
+# repo is None when the check is replayed from a DefaultBranchAuditCache
+DefaultBranchCheck = namedtuple('DefaultBranchCheck', ('full_name', 'archived', 'repo', 'default_branch', 'messages',
+                                                       'suggestions', 'change_suggested', 'policy_target', ))
+
+
+def check_default_branch(full_name: str, archived: bool, repo: typing.Optional['ConanRepo']) -> DefaultBranchCheck:
+    if archived:
+        return DefaultBranchCheck(full_name=full_name, archived=True, repo=repo, default_branch=None, messages=[],
+                                  suggestions=[], change_suggested=False, policy_target=None)
+
+    messages = []
+    if not repo.contains_conan_branches():
+        messages.append('no versions found')
+
+    if repo.contains_unknown_branches():
+        messages.append('non-conan branches found ({})'.format(list(b.name for b in repo.unknown_branches)))
+
+    change_default_branch = False
+    default_branch_suggestions = list(repo.suggested_branches) + list(repo.unknown_branches)
+
+    if not repo.default_branch.good():
+        messages.append('default branch has not the channel/branch format'.format())
+        # e.g. master: move to a release branch, if there is one
+        change_default_branch = _policy_target(repo) is not None
+    else:
+        if repo.default_branch.channel != 'testing':
+            messages.append('default channel is not testing'.format())
+            change_default_branch = True
+
+        if repo.default_branch.version is None:
+            messages.append('cannot decode default branch version')
+        else:
+            for c in ('stable', 'testing',):
+                if repo.get_branch_by_version_channel(repo.default_branch.version, c) is None:
+                    messages.append('default branch has no "{}" channel equivalent'.format(c))
 
-        messages = []
-        if not repo.contains_conan_branches():
-            messages.append('no versions found')
+            if repo.default_branch.version.is_prerelease:
+                messages.append('version of default branch is a prerelease')
 
-        if repo.contains_unknown_branches():
-            messages.append('non-conan branches found ({})'.format(list(b.name for b in repo.unknown_branches)))
+            most_recent_stable_version_overall = repo.most_recent_release_version()
 
-        change_default_branch = False
-        default_branch_suggestions = list(sorted(repo.branches, key=_BranchRepoSuggestionKey)) + list(
-            repo.unknown_branches)
+            most_recent_branch_testing = repo.most_recent_branch_by_channel('testing')  # most_recent_repo_by_channel('testing')
+            most_recent_version = repo.most_recent_version()
 
-        if not repo.default_branch.good():
-            messages.append('default branch has not the channel/branch format'.format())
-        else:
-            if repo.default_branch.channel != 'testing':
-                messages.append('default channel is not testing'.format())
+            if repo.default_branch.version != most_recent_stable_version_overall:
+                messages.append('default branch is not on most recent (non-prerelease) version')
                 change_default_branch = True
 
-            if repo.default_branch.version is None:
-                messages.append('cannot decode default branch version')
+            if not most_recent_branch_testing:
+                messages.append('no testing branch present')
             else:
-                for c in ('stable', 'testing',):
-                    try:
-                        next(b for b in repo.get_branches_by_version(repo.default_branch.version) if b.channel == c)
-                    except StopIteration:
-                        messages.append('default branch has no "{}" channel equivalent'.format(c))
-
-                if repo.default_branch.version.is_prerelease:
-                    messages.append('version of default branch is a prerelease')
-
-                assert max(repo.versions) == repo.most_recent_version()
-
-                most_recent_stable_version_overall = repo.version_most_recent_filter(
-                    lambda b: not b.version.is_prerelease)
-
-                most_recent_branch_testing = repo.most_recent_branch_by_channel('testing')  # most_recent_repo_by_channel('testing')
-                most_recent_version = repo.most_recent_version()
-
-                if repo.default_branch.version != most_recent_stable_version_overall:
-                    messages.append('default branch is not on most recent (non-prerelease) version')
-                    change_default_branch = True
-
-                if not most_recent_branch_testing:
-                    messages.append('no testing branch present')
-                else:
-                    if most_recent_branch_testing.version != most_recent_version:
-                        messages.append('most recent version has no testing channel branch')
-
-        if change_default_branch:
-            messages.append('suggestions={}'.format(list(b.name for b in default_branch_suggestions)))
-
-        if messages:
-            print('{} (default="{}"): {}'.format(github_repo.full_name, repo.default_branch.name, '; '.join(messages)))
-
-        if self._fix:
-            if default_branch_suggestions:
-                if len(default_branch_suggestions) == 1:
-                    print('Only one branch available -> do nothing')
-                else:
-                    options = ['- do nothing -', ] + list(b.name for b in default_branch_suggestions)
-                    answer = input_ask_question_options('Change default branch to?', options, default=0)
-                    apply_fixes = answer != 0
-                    new_default_branch_name = options[answer]
-                    if apply_fixes:
-                        new_default_branch_name = options[answer]
-                        confirmation_question = 'Change the default branch of "{}" from "{}" to "{}"?'.format(
-                            github_repo.full_name, repo.default_branch.name, new_default_branch_name)
-                        apply_fixes = input_ask_question_yn(confirmation_question, default=False)
-                    if apply_fixes:
-                        print('Changing default branch to {} ...'.format(new_default_branch_name))
-                        github_repo.edit(default_branch=new_default_branch_name)
-                        print('... done'.format(new_default_branch_name))
-                    else:
-                        print('Do nothing')
+                if most_recent_branch_testing.version != most_recent_version:
+                    messages.append('most recent version has no testing channel branch')
+
+    if change_default_branch:
+        messages.append('suggestions={}'.format(list(b.name for b in default_branch_suggestions)))
+
+    return DefaultBranchCheck(full_name=full_name, archived=False, repo=repo, default_branch=repo.default_branch.name,
+                              messages=messages, suggestions=default_branch_suggestions,
+                              change_suggested=change_default_branch,
+                              policy_target=_policy_target(repo) if change_default_branch else None)
+
+
+def _policy_target(repo: 'ConanRepo') -> typing.Optional[str]:
+    version = repo.most_recent_release_version()
+    if version is None:
+        return None
+    target = repo.get_branch_by_version_channel(version, 'testing') or \
+        next(b for b in repo.suggested_branches if b.version == version)
+    if target.name == repo.default_branch.name:
+        return None
+    return target.name
+
+
+def policy_default_branch(check: DefaultBranchCheck) -> typing.Optional[str]:
+    ''' New default branch chosen without asking, or None to keep the current one
+
+    Only repos for which the check suggests a change are changed.
+    The target is a branch of the most recent non-prerelease version: its testing branch,
+    else its first branch in suggestion order.
+    '''
+    if check.archived:
+        return None
+    return check.policy_target
+
+
+def _github_time(value: typing.Optional[datetime.datetime]) -> typing.Optional[str]:
+    ''' Time in the format of the json data of the github api (e.g. 2019-08-01T12:00:00Z) '''
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc)
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def default_branch_listing_fingerprint(full_name: str, pushed_at: str, default_branch: str) -> str:
+    ''' Fingerprint of a repo as listed by the github api: its full name, default branch and time of the last push.
+
+    Unlike default_branch_fingerprint, this does not cover every change of the branches:
+    a branch renamed or deleted through the web interface or the api may not change pushed_at.
+    '''
+    h = hashlib.sha1()
+    h.update('{}\n{}\n{}\n{}\n'.format(AUDIT_VERSION, full_name.lower(), pushed_at, default_branch).encode())
+    return h.hexdigest()
+
+
+def default_branch_fingerprint(branch_names: typing.Iterable[str], default_branch: str) -> str:
+    ''' Fingerprint of everything check_default_branch depends on: the branch names and the default branch '''
+    h = hashlib.sha1()
+    h.update('{}\n{}\n'.format(AUDIT_VERSION, default_branch).encode())
+    for name in sorted(set(branch_names)):
+        h.update(name.encode())
+        h.update(b'\n')
+    return h.hexdigest()
+
+
+class DefaultBranchAuditCache(object):
+    ''' Checks of default branches, stored in a BlobCache by fingerprint of the branches of the repo
+
+    A repo whose branches and default branch did not change since a previous run gets the stored check back,
+    without analyzing its branches again.
+    With trust_pushed_at, the checks are also stored by fingerprint of the repo listing (see replay_listing),
+    so a repo that was not pushed to since a previous run does not need its branches listed at all.
+    This can replay stale checks of repos whose branches were renamed or deleted without a push.
+    '''
+
+    AUDIT_KIND = 'default_branch_audit'
+
+    def __init__(self, cache: BlobCache, trust_pushed_at: bool=False):
+        self._cache = cache
+        self._trust_pushed_at = trust_pushed_at
+        self._lock = threading.Lock()
+        self.evaluated = 0
+        self.replayed = 0
+
+    def replay_listing(self, full_name: str, pushed_at: str, default_branch: str) -> \
+            typing.Optional[DefaultBranchCheck]:
+        ''' Stored check of a repo that was not pushed to since it was checked, else None.
+        Always None without trust_pushed_at. '''
+        if not self._trust_pushed_at:
+            return None
+        check = self._replay(default_branch_listing_fingerprint(full_name, pushed_at, default_branch),
+                             full_name, default_branch)
+        if check is not None:
+            with self._lock:
+                self.replayed += 1
+        return check
+
+    def check(self, full_name: str, branch_names: typing.Iterable[str], default_branch: str,
+              pushed_at: typing.Optional[str]=None) -> DefaultBranchCheck:
+        '''
+        :param pushed_at: time of the last push of the repo as listed: with trust_pushed_at,
+                          also store the check for replay_listing
+        '''
+        branch_names = list(branch_names)
+        key = default_branch_fingerprint(branch_names, default_branch)
+        check = self._replay(key, full_name, default_branch)
+        if check is not None:
+            with self._lock:
+                self.replayed += 1
+        else:
+            check = check_default_branch(full_name, archived=False,
+                                         repo=ConanRepo.from_branch_names(branch_names, default_branch))
+            self._store(key, check)
+            with self._lock:
+                self.evaluated += 1
+        if self._trust_pushed_at and pushed_at is not None:
+            self._store(default_branch_listing_fingerprint(full_name, pushed_at, default_branch), check)
+        return check
+
+    def _replay(self, key: str, full_name: str, default_branch: str) -> typing.Optional[DefaultBranchCheck]:
+        data = self._cache.get_data(self.AUDIT_KIND, key)
+        if data is None:
+            return None
+        audit = yaml.safe_load(data.decode())
+        return DefaultBranchCheck(full_name=full_name, archived=False, repo=None, default_branch=default_branch,
+                                  messages=audit['messages'],
+                                  suggestions=list(ConanRepoBranch(name) for name in audit['suggestions']),
+                                  change_suggested=audit['change_suggested'],
+                                  policy_target=audit['policy_target'])
+
+    def _store(self, key: str, check: DefaultBranchCheck) -> None:
+        audit = {
+            'messages': list(check.messages),
+            'suggestions': list(b.name for b in check.suggestions),
+            'change_suggested': check.change_suggested,
+            'policy_target': check.policy_target,
+        }
+        self._cache.put_data(self.AUDIT_KIND, key, yaml.safe_dump(audit).encode())
+
+
+def print_default_branch_check(check: DefaultBranchCheck):
+    if check.archived:
+        print("{}: archived".format(check.full_name))
+    elif check.messages:
+        print('{} (default="{}"): {}'.format(check.full_name, check.default_branch, '; '.join(check.messages)))
+
+
+def ask_new_default_branch(check: DefaultBranchCheck) -> typing.Optional[str]:
+    default_branch_suggestions = check.suggestions
+    if default_branch_suggestions:
+        if len(default_branch_suggestions) == 1:
+            print('Only one branch available -> do nothing')
+        else:
+            options = ['- do nothing -', ] + list(b.name for b in default_branch_suggestions)
+            answer = input_ask_question_options('Change default branch to?', options, default=0)
+            apply_fixes = answer != 0
+            new_default_branch_name = options[answer]
+            if apply_fixes:
+                new_default_branch_name = options[answer]
+                confirmation_question = 'Change the default branch of "{}" from "{}" to "{}"?'.format(
+                    check.full_name, check.default_branch, new_default_branch_name)
+                apply_fixes = input_ask_question_yn(confirmation_question, default=False)
+            if apply_fixes:
+                return new_default_branch_name
+            else:
+                print('Do nothing')
+    return None
+
+
+async def default_branch_check_async(owner_login: str, repos: typing.Optional[typing.List[str]]=None,
+                                     fix: bool=False, limit: typing.Optional[int]=None,
+                                     audit_cache: typing.Optional[DefaultBranchAuditCache]=None):
+    c = Configuration()
+    async with c.get_github_async(limit=limit) as g:
+        if repos is not None:
+            github_repos = await asyncio.gather(*(g.get_repo('{}/{}'.format(owner_login, repo)) for repo in repos))
+        else:
+            github_repos = await g.list_repos(owner_login)
+
+        permissions = shared_permission_cache()
+        permissions.add_repos_data(github_repos)
+        if fix:
+            for github_repo in github_repos:
+                if not permissions.get_by_name(github_repo['full_name']).admin:
+                    raise ActionInterrupted('Cannot fix "{}": no admin permission'.format(github_repo['full_name']))
+
+        print('Check default branch of {nb} repos'.format(nb=len(github_repos)))
+
+        async def check(github_repo: typing.Dict[str, typing.Any]) -> DefaultBranchCheck:
+            if github_repo['archived']:
+                return check_default_branch(github_repo['full_name'], archived=True, repo=None)
+            pushed_at = github_repo.get('pushed_at')
+            if audit_cache is not None and pushed_at is not None:
+                replayed = audit_cache.replay_listing(github_repo['full_name'], pushed_at,
+                                                      github_repo['default_branch'])
+                if replayed is not None:
+                    return replayed
+            branches = await g.list_branches(github_repo['full_name'])
+            branch_names = list(b['name'] for b in branches)
+            if audit_cache is not None:
+                return audit_cache.check(github_repo['full_name'], branch_names, github_repo['default_branch'],
+                                         pushed_at=pushed_at)
+            repo = ConanRepo.from_branch_names(branch_names, github_repo['default_branch'])
+            return check_default_branch(github_repo['full_name'], archived=False, repo=repo)
+
+        checks = await asyncio.gather(*(check(github_repo) for github_repo in github_repos))
+
+        for check in checks:
+            print_default_branch_check(check)
+            if fix and not check.archived:
+                new_default_branch_name = ask_new_default_branch(check)
+                if new_default_branch_name is not None:
+                    print('Changing default branch to {} ...'.format(new_default_branch_name))
+                    await g.edit_repo(check.full_name, default_branch=new_default_branch_name)
+                    print('... done')
 
 
 class ConanRepoBranch(object):
+    __slots__ = ('_name', '_channel', '_version_str', '_version', '_sort_key', )
+
     def __init__(self, name: str):
         self._name = name
         _channel_str_version = _channel_version_str_from_branch(self._name)
-        # self._channel_version_from_branch(self._name)
         if _channel_str_version is None:
             self._channel, self._version_str = None, None
         else:
             self._channel, self._version_str = _channel_str_version
+        self._version = None if self._version_str is None else _version_from_string(self._version_str)
+        if self._version is None:
+            self._sort_key = None
+        else:
+            self._sort_key = (self._version, _CHANNEL_SUGGESTION_RANK.get(self._channel, 0), self._channel, )
 
     @property
     def name(self) -> str:
@@ -197,9 +558,12 @@ class ConanRepoBranch(object):
 
     @property
     def version(self) -> typing.Optional[Version]:
-        if self._version_str is None:
-            return None
-        return _version_from_string(self._version_str)
+        return self._version
+
+    @property
+    def sort_key(self) -> typing.Optional[typing.Tuple[Version, int, str]]:
+        ''' Key of the suggestion order: sort descending for most recent version first, then testing, then stable '''
+        return self._sort_key
 
     def __repr__(self) -> str:
         return '<{}:{}>'.format(type(self).__name__, self._name)
@@ -226,6 +590,25 @@ class ConanRepo(object):
         self._versionmap = OrderedDict(sorted(versionmap.items(), key=lambda v_b: v_b[0], reverse=True))
         self._unknown_branches = list(unknown)
         self._default_branch = default_branch
+        self._suggested_branches = tuple(sorted(self.branches, key=lambda b: b.sort_key, reverse=True))
+
+        # Indexes, so selecting a branch does not need to scan all branches
+        self._versions = tuple(self._versionmap.keys())
+        channel_index = dict()
+        version_channel_index = dict()
+        for version, branches in self._versionmap.items():
+            for branch in branches:
+                channel_index.setdefault(branch.channel, []).append(branch)
+                version_channel_index.setdefault((version, branch.channel, ), branch)
+        self._channel_index = dict((channel, tuple(branches), ) for channel, branches in channel_index.items())
+        self._version_channel_index = version_channel_index
+        self._most_recent_release_version = next((v for v in self._versions if not v.is_prerelease), None)
+        self._latest_branch = None
+        if self._versions:
+            most_recent_version = self._versions[0]
+            self._latest_branch = version_channel_index.get((most_recent_version, 'testing', )) or \
+                version_channel_index.get((most_recent_version, 'stable', )) or \
+                self._versionmap[most_recent_version][0]
 
     @property
     def default_branch(self) -> ConanRepoBranch:
@@ -241,6 +624,11 @@ class ConanRepo(object):
             for branch in branches:
                 yield branch
 
+    @property
+    def suggested_branches(self) -> typing.Sequence[ConanRepoBranch]:
+        ''' Branches with a version, ordered by preference as default branch '''
+        return self._suggested_branches
+
     @property
     def unknown_branches(self) -> typing.Iterable[ConanRepoBranch]:
         return iter(self._unknown_branches)
@@ -255,27 +643,24 @@ class ConanRepo(object):
         for branch in self._versionmap.get(version, []):
             yield branch
 
+    def get_branch_by_version_channel(self, version: Version, channel: str) -> typing.Optional[ConanRepoBranch]:
+        return self._version_channel_index.get((version, channel, ))
+
     def get_branches_by_channel(self, channel: typing.Optional[str]) -> typing.Iterable[ConanRepoBranch]:
-        for _, branches in self._versionmap.items():
-            for branch in branches:
-                if channel is None:
-                    yield branch
-                else:
-                    if channel == branch.channel:
-                        yield branch
+        if channel is None:
+            return self.branches
+        return iter(self._channel_index.get(channel, ()))
 
     def most_recent_branch_by_channel(self, channel: str) -> typing.Optional[ConanRepoBranch]:
-        branches = list(self.get_branches_by_channel(channel))
-        try:
-            return branches[0]
-        except IndexError:
-            return None
+        branches = self._channel_index.get(channel)
+        return branches[0] if branches else None
 
     def most_recent_version(self) -> typing.Optional[Version]:
-        try:
-            return list(self._versionmap.keys())[0]
-        except IndexError:
-            return None
+        return self._versions[0] if self._versions else None
+
+    def most_recent_release_version(self) -> typing.Optional[Version]:
+        ''' Most recent version that is not a prerelease '''
+        return self._most_recent_release_version
 
     def branches_filter(self, fn: typing.Callable[[ConanRepoBranch], bool]) -> typing.Iterator[ConanRepoBranch]:
         return filter(fn, self.branches)
@@ -290,37 +675,32 @@ class ConanRepo(object):
     def from_repo(cls, repo: Repository) -> 'ConanRepo':
         return cls.from_branches(repo.get_branches(), repo.default_branch)
 
+    @classmethod
+    def from_repo_refs(cls, repo_refs: RepoRefs) -> 'ConanRepo':
+        return cls.from_branch_names(repo_refs.branches, repo_refs.default_branch)
+
     @classmethod
     def from_branches(cls, branches: typing.Iterable[Branch], default: str) -> 'ConanRepo':
+        return cls.from_branch_names((branch.name for branch in branches), default)
+
+    @classmethod
+    def from_branch_names(cls, branch_names: typing.Iterable[str], default: str) -> 'ConanRepo':
         result = dict()
         unknown = list()
-        for branch in branches:
-            channel_version = _channel_version_from_branch(branch.name)
-            if channel_version is None:
-                unknown.append(ConanRepoBranch(branch.name))
-                continue
-            channel, version = channel_version
-            if version is None:
-                unknown.append(ConanRepoBranch(branch.name))
+        for branch_name in branch_names:
+            branch = ConanRepoBranch(branch_name)
+            if branch.version is None:
+                unknown.append(branch)
             else:
-                result.setdefault(version, [])
-                result[version].append(ConanRepoBranch(branch.name))
+                result.setdefault(branch.version, [])
+                result[branch.version].append(branch)
         return cls(versionmap=result, unknown=unknown, default_branch=ConanRepoBranch(default))
 
     def select_branch(self, branch: WhichBranch) -> typing.Optional[ConanRepoBranch]:
         if branch == WhichBranch.DEFAULT:
             return self.default_branch
         elif branch == WhichBranch.LATEST:
-            most_recent_version = self.most_recent_version()
-            for branch in self._versionmap[most_recent_version]:
-                if branch.channel == 'testing':
-                    return branch
-            for branch in self._versionmap[most_recent_version]:
-                if branch.channel == 'stable':
-                    return branch
-            for branch in self._versionmap[most_recent_version]:
-                return branch
-            return None
+            return self._latest_branch
         elif branch == WhichBranch.LATEST_STABLE:
             return self.most_recent_branch_by_channel('stable')
         elif branch == WhichBranch.LATEST_TESTING:
@@ -329,52 +709,11 @@ class ConanRepo(object):
             raise ValueError(branch)
 
 
-class _BranchRepoSuggestionKey:
-    @classmethod
-    def _cmp_version_channel(cls, first: ConanRepoBranch, second: ConanRepoBranch) -> int:
-        if first.version == second.version:
-            return cls._cmp_channel(first, second)
-        if first.version > second.version:
-            return -1
-        else:
-            return 1
-
-    @classmethod
-    def _cmp_channel(cls, first: ConanRepoBranch, second: ConanRepoBranch) -> int:
-        if first.channel == second.channel:
-            return 0
-        if first.channel == 'testing':
-            return -1
-        if second.channel == 'testing':
-            return 1
-        if first.channel == 'stable':
-            return -1
-        if second.channel == 'stable':
-            return 0
-        if first.channel > second.channel:
-            return -1
-        return 1
-
-    def __init__(self, obj):
-        self.obj = obj
-
-    def __lt__(self, other):
-        return self._cmp_version_channel(self.obj, other.obj) < 0
-
-    def __gt__(self, other):
-        return self._cmp_version_channel(self.obj, other.obj) > 0
-
-    def __eq__(self, other):
-        return self._cmp_version_channel(self.obj, other.obj) == 0
-
-    def __le__(self, other):
-        return self._cmp_version_channel(self.obj, other.obj) <= 0
-
-    def __ge__(self, other):
-        return self._cmp_version_channel(self.obj, other.obj) >= 0
-
-    def __ne__(self, other):
-        return self._cmp_version_channel(self.obj, other.obj) != 0
+# Preference of channels for the default branch, within a version
+_CHANNEL_SUGGESTION_RANK = {
+    'testing': 2,
+    'stable': 1,
+}
 
 
 def _channel_version_str_from_branch(branch: str) -> typing.Optional[typing.Tuple[str, str]]:
@@ -385,15 +724,7 @@ def _channel_version_str_from_branch(branch: str) -> typing.Optional[typing.Tupl
         return None
 
 
-def _channel_version_from_branch(branch: str) -> typing.Optional[typing.Tuple[str, typing.Optional[Version]]]:
-    b_v = _channel_version_str_from_branch(branch)
-    if b_v is None:
-        return None
-    b, v_str = b_v
-    v = _version_from_string(v_str)
-    return b, v
-
-
+@functools.lru_cache(maxsize=VERSION_CACHE_SIZE)
 def _version_from_string(v_str: str) -> typing.Optional[Version]:
     try:
         return Version(v_str)
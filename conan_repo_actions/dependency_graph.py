@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+import typing
+from .dependency_store import DependencyRecord
+
+RECIPE_REPO_PREFIX = 'conan-'
+
+
+def recipe_package_name(repo_name: str) -> str:
+    ''' Name of the conan package built by a recipe repository (e.g. "conan-zlib" -> "zlib") '''
+    if repo_name.startswith(RECIPE_REPO_PREFIX):
+        return repo_name[len(RECIPE_REPO_PREFIX):]
+    return repo_name
+
+
+class DependencyGraph(object):
+    ''' Dependency graph between conan packages
+
+    Packages are interned to integer ids, the edges are stored as compact adjacency arrays in both directions.
+    The strongly connected components (cycles) and the build levels are computed once, at construction.
+    '''
+
+    def __init__(self, edges: typing.Iterable[typing.Tuple[str, str]], names: typing.Iterable[str]=()):
+        '''
+        :param edges: (dependent, dependency) pairs
+        :param names: extra packages, without dependencies
+        '''
+        self._names = []
+        self._ids = dict()
+        pairs = set()
+        for name in names:
+            self._intern(name)
+        for dependent, dependency in edges:
+            pairs.add((self._intern(dependent), self._intern(dependency), ))
+
+        self._dep_offsets, self._deps = self._adjacency(len(self._names), pairs)
+        self._rdep_offsets, self._rdeps = self._adjacency(len(self._names), ((b, a, ) for a, b in pairs))
+
+        self._components, self._component_of = self._strongly_connected_components()
+        self._component_deps = self._condensation()
+        self._levels = self._calculate_levels()
+
+        self._bump_waves_cache = dict()
+
+    @classmethod
+    def from_records(cls, records: typing.Iterable[DependencyRecord],
+                     package_name: typing.Callable[[str], str]=recipe_package_name) -> 'DependencyGraph':
+        names = []
+        edges = []
+        for record in records:
+            name = package_name(record.name)
+            names.append(name)
+            for dependency in record.dependencies:
+                edges.append((name, dependency.name, ))
+        return cls(edges=edges, names=names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ids
+
+    @property
+    def names(self) -> typing.List[str]:
+        return list(self._names)
+
+    def dependencies(self, name: str) -> typing.List[str]:
+        return self._to_names(self._neighbours(self._dep_offsets, self._deps, self._ids[name]))
+
+    def dependents(self, name: str) -> typing.List[str]:
+        return self._to_names(self._neighbours(self._rdep_offsets, self._rdeps, self._ids[name]))
+
+    def transitive_dependencies(self, name: str) -> typing.List[str]:
+        return self._to_names(self._reachable(self._dep_offsets, self._deps, self._ids[name]))
+
+    def transitive_dependents(self, name: str) -> typing.List[str]:
+        ''' All packages that must be rebuilt when name changes '''
+        return self._to_names(self._reachable(self._rdep_offsets, self._rdeps, self._ids[name]))
+
+    def level(self, name: str) -> int:
+        ''' Length of the longest dependency chain below name (0 = no dependencies) '''
+        return self._levels[self._component_of[self._ids[name]]]
+
+    def levels(self) -> typing.List[typing.List[str]]:
+        ''' Build waves of all packages: every package only depends on packages of earlier waves (or its cycle) '''
+        waves = []
+        for component, level in enumerate(self._levels):
+            while len(waves) <= level:
+                waves.append([])
+            waves[level].extend(self._names[i] for i in self._components[component])
+        return list(sorted(wave) for wave in waves)
+
+    def bump_waves(self, name: str) -> typing.List[typing.List[str]]:
+        ''' Waves of packages to rebuild after a bump of name
+
+        Wave 0 contains name (and the packages in a cycle with it).
+        The packages of a wave can be rebuilt in parallel once all previous waves have been rebuilt.
+        '''
+        root = self._component_of[self._ids[name]]
+        try:
+            waves = self._bump_waves_cache[root]
+        except KeyError:
+            waves = self._calculate_bump_waves(root)
+            self._bump_waves_cache[root] = waves
+        return list(list(wave) for wave in waves)
+
+    def critical_path_length(self, name: str) -> int:
+        ''' Number of sequential rebuild waves needed after a bump of name '''
+        return len(self.bump_waves(name)) - 1
+
+    def cycles(self) -> typing.List[typing.List[str]]:
+        result = []
+        for component in self._components:
+            if len(component) > 1 or component[0] in self._neighbours(self._dep_offsets, self._deps, component[0]):
+                result.append(sorted(self._names[i] for i in component))
+        return sorted(result)
+
+    def _intern(self, name: str) -> int:
+        try:
+            return self._ids[name]
+        except KeyError:
+            i = len(self._names)
+            self._ids[name] = i
+            self._names.append(name)
+            return i
+
+    def _to_names(self, ids: typing.Iterable[int]) -> typing.List[str]:
+        return sorted(self._names[i] for i in ids)
+
+    @staticmethod
+    def _adjacency(nb: int, pairs: typing.Iterable[typing.Tuple[int, int]]) -> typing.Tuple[array, array]:
+        ''' Compressed sparse row representation: neighbours of i are targets[offsets[i]:offsets[i+1]] '''
+        pairs = sorted(pairs)
+        offsets = array('l', [0] * (nb + 1))
+        for source, _ in pairs:
+            offsets[source + 1] += 1
+        for i in range(nb):
+            offsets[i + 1] += offsets[i]
+        targets = array('l', (target for _, target in pairs))
+        return offsets, targets
+
+    @staticmethod
+    def _neighbours(offsets: array, targets: array, i: int) -> array:
+        return targets[offsets[i]:offsets[i + 1]]
+
+    def _reachable(self, offsets: array, targets: array, start: int) -> typing.Set[int]:
+        seen = {start, }
+        todo = [start, ]
+        while todo:
+            i = todo.pop()
+            for j in self._neighbours(offsets, targets, i):
+                if j not in seen:
+                    seen.add(j)
+                    todo.append(j)
+        seen.discard(start)
+        return seen
+
+    def _strongly_connected_components(self) -> typing.Tuple[typing.List[typing.List[int]], array]:
+        ''' Iterative Tarjan. Components are emitted after all the components they depend on. '''
+        nb = len(self._names)
+        index = array('l', [-1] * nb)
+        lowlink = array('l', [0] * nb)
+        on_stack = bytearray(nb)
+        stack = []
+        components = []
+        component_of = array('l', [-1] * nb)
+        counter = 0
+        for root in range(nb):
+            if index[root] != -1:
+                continue
+            work = [(root, self._dep_offsets[root], )]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            while work:
+                i, edge = work[-1]
+                if edge < self._dep_offsets[i + 1]:
+                    work[-1] = (i, edge + 1, )
+                    j = self._deps[edge]
+                    if index[j] == -1:
+                        index[j] = lowlink[j] = counter
+                        counter += 1
+                        stack.append(j)
+                        on_stack[j] = 1
+                        work.append((j, self._dep_offsets[j], ))
+                    elif on_stack[j]:
+                        lowlink[i] = min(lowlink[i], index[j])
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[i])
+                if lowlink[i] == index[i]:
+                    component = []
+                    while True:
+                        j = stack.pop()
+                        on_stack[j] = 0
+                        component_of[j] = len(components)
+                        component.append(j)
+                        if j == i:
+                            break
+                    components.append(component)
+        return components, component_of
+
+    def _condensation(self) -> typing.List[typing.Tuple[int, ...]]:
+        result = []
+        for component_i, component in enumerate(self._components):
+            deps = set()
+            for i in component:
+                for j in self._neighbours(self._dep_offsets, self._deps, i):
+                    c = self._component_of[j]
+                    if c != component_i:
+                        deps.add(c)
+            result.append(tuple(sorted(deps)))
+        return result
+
+    def _calculate_levels(self) -> array:
+        levels = array('l', [0] * len(self._components))
+        for component_i, deps in enumerate(self._component_deps):
+            if deps:
+                levels[component_i] = 1 + max(levels[c] for c in deps)
+        return levels
+
+    def _calculate_bump_waves(self, root: int) -> typing.List[typing.List[str]]:
+        affected = {root, }
+        todo = [root, ]
+        while todo:
+            c = todo.pop()
+            for i in self._components[c]:
+                for j in self._neighbours(self._rdep_offsets, self._rdeps, i):
+                    cj = self._component_of[j]
+                    if cj not in affected:
+                        affected.add(cj)
+                        todo.append(cj)
+        wave_of = {root: 0, }
+        waves = [[]]
+        for c in sorted(affected):
+            if c != root:
+                wave_of[c] = 1 + max(wave_of[d] for d in self._component_deps[c] if d in affected)
+            while len(waves) <= wave_of[c]:
+                waves.append([])
+            waves[wave_of[c]].extend(self._names[i] for i in self._components[c])
+        return list(sorted(wave) for wave in waves)
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple
+from packaging.version import InvalidVersion, Version
+from pathlib import Path
+import sqlite3
+import typing
+import yaml
+from .conan_reference import ConanReference
+
+DependencyRecord = namedtuple('DependencyRecord', ('name', 'version', 'branch', 'commit', 'dependencies', ))
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS recipes (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    version TEXT,
+    branch TEXT,
+    commit_sha TEXT
+);
+CREATE TABLE IF NOT EXISTS packages (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS refs (
+    id INTEGER PRIMARY KEY,
+    package_id INTEGER NOT NULL REFERENCES packages(id),
+    version TEXT NOT NULL,
+    user TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    UNIQUE (package_id, version, user, channel)
+);
+CREATE TABLE IF NOT EXISTS edges (
+    recipe_id INTEGER NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    ref_id INTEGER NOT NULL REFERENCES refs(id),
+    PRIMARY KEY (recipe_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS edges_ref ON edges (ref_id, recipe_id);
+'''
+
+
+def _version_sort_key(version: str) -> typing.Tuple:
+    ''' Sort versions by their meaning (1.2.8 < 1.2.11), versions that cannot be parsed last by their text '''
+    try:
+        return 0, Version(version), version
+    except InvalidVersion:
+        return 1, version
+
+
+def dependency_record_from_dict(data: typing.Mapping[str, typing.Any]) -> DependencyRecord:
+    return DependencyRecord(
+        name=data['name'],
+        version=data.get('version'),
+        branch=data.get('branch'),
+        commit=data.get('commit'),
+        dependencies=list(ConanReference.from_refstr(d) for d in data.get('dependencies', ())),
+    )
+
+
+def dependency_record_to_dict(record: DependencyRecord) -> typing.Dict[str, typing.Any]:
+    return {
+        'name': record.name,
+        'version': record.version,
+        'branch': record.branch,
+        'commit': record.commit,
+        'dependencies': list(d.reference for d in record.dependencies),
+    }
+
+
+class DependencyDirectory(object):
+    ''' Directory with the dependencies of every recipe in a separate yaml file '''
+
+    def __init__(self, path: Path):
+        self._path = path
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> 'DependencyDirectory':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def put(self, record: DependencyRecord) -> None:
+        self._path.mkdir(parents=True, exist_ok=True)
+        with self._filename(record.name).open('w') as f:
+            yaml.safe_dump(dependency_record_to_dict(record), f)
+
+    def get(self, name: str) -> typing.Optional[DependencyRecord]:
+        filename = self._filename(name)
+        if not filename.exists():
+            return None
+        return self._load(filename)
+
+    def __contains__(self, name: str) -> bool:
+        return self._filename(name).exists()
+
+    def records(self) -> typing.Iterator[DependencyRecord]:
+        if not self._path.is_dir():
+            return
+        for f in sorted(self._path.iterdir()):
+            if f.suffix != '.yaml':
+                continue
+            yield self._load(f)
+
+    def _filename(self, name: str) -> Path:
+        return self._path / (name + '.yaml')
+
+    @classmethod
+    def _load(cls, filename: Path) -> DependencyRecord:
+        with filename.open() as f:
+            data = yaml.safe_load(f)
+        data.setdefault('name', filename.stem)
+        return dependency_record_from_dict(data)
+
+
+class DependencyStore(object):
+    ''' Indexed store of the dependencies of recipes, backed by a sqlite database
+
+    A recipe is a repository, identified by its name.
+    Its dependencies are stored as edges to conan references, so reverse lookups use an index.
+    '''
+
+    def __init__(self, path: typing.Union[Path, str]):
+        self._db = sqlite3.connect(str(path))
+        self._db.execute('PRAGMA foreign_keys = ON')
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> 'DependencyStore':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def put(self, record: DependencyRecord) -> None:
+        with self._db:
+            self._db.execute('DELETE FROM recipes WHERE name = ?', (record.name, ))
+            cursor = self._db.execute('INSERT INTO recipes (name, version, branch, commit_sha) VALUES (?, ?, ?, ?)',
+                                      (record.name, record.version, record.branch, record.commit, ))
+            recipe_id = cursor.lastrowid
+            self._db.executemany('INSERT INTO edges (recipe_id, position, ref_id) VALUES (?, ?, ?)',
+                                 ((recipe_id, position, self._ref_id(ref), )
+                                  for position, ref in enumerate(record.dependencies)))
+
+    def get(self, name: str) -> typing.Optional[DependencyRecord]:
+        row = self._db.execute('SELECT id, name, version, branch, commit_sha FROM recipes WHERE name = ?',
+                               (name, )).fetchone()
+        if row is None:
+            return None
+        return self._record_from_row(row)
+
+    def __contains__(self, name: str) -> bool:
+        return self._db.execute('SELECT 1 FROM recipes WHERE name = ?', (name, )).fetchone() is not None
+
+    def records(self) -> typing.Iterator[DependencyRecord]:
+        rows = self._db.execute('SELECT id, name, version, branch, commit_sha FROM recipes ORDER BY name').fetchall()
+        for row in rows:
+            yield self._record_from_row(row)
+
+    def dependents(self, pattern: str) -> typing.List[str]:
+        ''' Names of the recipes requiring a reference matching pattern
+
+        :param pattern: NAME[/VERSION[@USER[/CHANNEL]]]. Every part can be a glob, e.g. "zlib/1.2.11@*/*"
+        '''
+        conditions, values = self._pattern_conditions(pattern)
+        rows = self._db.execute(
+            'SELECT DISTINCT recipes.name FROM packages '
+            'JOIN refs ON refs.package_id = packages.id '
+            'JOIN edges ON edges.ref_id = refs.id '
+            'JOIN recipes ON recipes.id = edges.recipe_id '
+            'WHERE {} ORDER BY recipes.name'.format(' AND '.join(conditions)), values)
+        return list(row[0] for row in rows)
+
+    def versions(self, name: str) -> typing.List[str]:
+        ''' Versions of the package name that are required by any recipe '''
+        rows = self._db.execute(
+            'SELECT DISTINCT refs.version FROM packages '
+            'JOIN refs ON refs.package_id = packages.id '
+            'WHERE packages.name = ? '
+            'AND EXISTS (SELECT 1 FROM edges WHERE edges.ref_id = refs.id)', (name, ))
+        return sorted((row[0] for row in rows), key=_version_sort_key)
+
+    def packages(self) -> typing.Dict[str, typing.Dict[str, typing.List[str]]]:
+        ''' Mapping of package name -> version -> names of the requiring recipes '''
+        result = dict()
+        rows = self._db.execute(
+            'SELECT packages.name, refs.version, recipes.name FROM edges '
+            'JOIN refs ON refs.id = edges.ref_id '
+            'JOIN packages ON packages.id = refs.package_id '
+            'JOIN recipes ON recipes.id = edges.recipe_id '
+            'ORDER BY recipes.name, edges.position')
+        for package, version, recipe in rows:
+            result.setdefault(package, dict()).setdefault(version, []).append(recipe)
+        return result
+
+    def import_yaml(self, directory: Path) -> int:
+        nb = 0
+        for record in DependencyDirectory(directory).records():
+            self.put(record)
+            nb += 1
+        return nb
+
+    def export_yaml(self, directory: Path) -> int:
+        nb = 0
+        yaml_directory = DependencyDirectory(directory)
+        for record in self.records():
+            yaml_directory.put(record)
+            nb += 1
+        return nb
+
+    def _ref_id(self, ref: ConanReference) -> int:
+        self._db.execute('INSERT OR IGNORE INTO packages (name) VALUES (?)', (ref.name, ))
+        package_id = self._db.execute('SELECT id FROM packages WHERE name = ?', (ref.name, )).fetchone()[0]
+        self._db.execute('INSERT OR IGNORE INTO refs (package_id, version, user, channel) VALUES (?, ?, ?, ?)',
+                         (package_id, ref.version, ref.user, ref.channel, ))
+        return self._db.execute('SELECT id FROM refs WHERE package_id = ? AND version = ? AND user = ? AND channel = ?',
+                                (package_id, ref.version, ref.user, ref.channel, )).fetchone()[0]
+
+    def _record_from_row(self, row: typing.Tuple) -> DependencyRecord:
+        recipe_id, name, version, branch, commit = row
+        refs = self._db.execute(
+            'SELECT packages.name, refs.version, refs.user, refs.channel FROM edges '
+            'JOIN refs ON refs.id = edges.ref_id '
+            'JOIN packages ON packages.id = refs.package_id '
+            'WHERE edges.recipe_id = ? ORDER BY edges.position', (recipe_id, ))
+        dependencies = list(ConanReference(name=n, version=v, user=u, channel=c) for n, v, u, c in refs)
+        return DependencyRecord(name=name, version=version, branch=branch, commit=commit, dependencies=dependencies)
+
+    @classmethod
+    def _pattern_conditions(cls, pattern: str) -> typing.Tuple[typing.List[str], typing.List[str]]:
+        name_version, _, user_channel = pattern.partition('@')
+        name, _, version = name_version.partition('/')
+        user, _, channel = user_channel.partition('/')
+        conditions = []
+        values = []
+        for column, value in (('packages.name', name), ('refs.version', version),
+                              ('refs.user', user), ('refs.channel', channel), ):
+            if not value or value == '*':
+                continue
+            if any(c in value for c in '*?['):
+                conditions.append('{} GLOB ?'.format(column))
+            else:
+                conditions.append('{} = ?'.format(column))
+            values.append(value)
+        if not conditions:
+            conditions.append('1')
+        return conditions, values
@@ -2,12 +2,17 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import base64
 import github
 import github.ContentFile
-import re
+import sys
 import typing
 from .conventions_apply import argparse_add_which_branch_option, calculate_repo_branch, \
     calculate_branch, GithubRepoBranch
+from .cache import BlobCache
+from .conanfile_ast import ConanfileAstExtractor
+from .conan_reference import ConanReference, CONAN_VERSION_REGEX_IN_SOURCE
+from .github_graphql import GithubGraphQL
 from .util import Configuration
 
 
@@ -16,6 +21,10 @@ def main():
     parser.add_argument('--owner_login', type=str, required=True, help='owner of the repo to clone')
     parser.add_argument('--interactive', action='store_true', help='interactive')
     argparse_add_which_branch_option(parser)
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help='do not use the local cache of conanfiles')
+    parser.add_argument('--ast', action='store_true',
+                        help='parse the conanfiles instead of searching them for references')
     parser.add_argument('repo_name', type=str, help='name of the repo+branch. Format: REPO[:BRANCH]')
 
     args = parser.parse_args()
@@ -29,71 +38,61 @@ def main():
     if repo_branch.branch is None:
         repo_branch.branch = calculate_branch(repo=repo_branch.repo, branch_dest=args.branch_dest)
 
-    deps, version = repo_branch_dependencies(repo_branch)
+    cache = c.get_blob_cache() if args.use_cache else None
+    extractor = ConanfileAstExtractor(cache=cache) if args.ast else None
+
+    dependencies = repo_branch_dependencies(repo_branch, cache=cache, extractor=extractor)
+    if dependencies is None:
+        print('Unable to read branch "{}" of {}'.format(repo_branch.branch, repo_branch.repo.full_name),
+              file=sys.stderr)
+        sys.exit(1)
+    deps, version = dependencies
     print('version:', version)
     for dep in deps:
         print(dep.reference)
 
-# {, } and % have been added to the regex to catch string operations
-CONAN_NAME_REGEX_CHAR_STR = '[a-zA-Z0-9_.+{}%\-]'
-CONAN_VERSION_REGEX_CHAR_STR = CONAN_NAME_REGEX_CHAR_STR
-CONAN_USER_REGEX_CHAR_STR = CONAN_NAME_REGEX_CHAR_STR
-CONAN_CHANNEL_REGEX_CHAR_STR = CONAN_NAME_REGEX_CHAR_STR
-CONAN_REF_REGEX_STR = "(?P<ref>(?P<name>{name}+)/(?P<version>{version}+)@(?P<user>{user}+)/(?P<channel>{channel}+))".format(
-    name=CONAN_NAME_REGEX_CHAR_STR,
-    version=CONAN_VERSION_REGEX_CHAR_STR,
-    user=CONAN_USER_REGEX_CHAR_STR,
-    channel=CONAN_CHANNEL_REGEX_CHAR_STR
-)
-CONAN_REF_REGEX = re.compile(CONAN_REF_REGEX_STR)
-
-CONAN_REF_REGEX_IN_CONANFILE_STR = '[\'"]{ref}[\'"]'.format(ref=CONAN_REF_REGEX_STR)
-CONAN_REF_REGEX_IN_CONANFILE = re.compile(CONAN_REF_REGEX_IN_CONANFILE_STR)
-
-CONAN_VERSION_REGEX_IN_SOURCE_STR = 'version\s+=\s+[\'"](?P<version>{}+)[\'"]'.format(CONAN_VERSION_REGEX_CHAR_STR)
-CONAN_VERSION_REGEX_IN_SOURCE = re.compile(CONAN_VERSION_REGEX_IN_SOURCE_STR)
 
+CONANFILE_NAMES = ('conanfile.py', 'conanfile_base.py', 'conanfile_installer.py', )
 
-class ConanReference:
-    def __init__(self, name: str, version: str, user: str, channel: str):
-        self.name = name
-        self.version = version
-        self.user = user
-        self.channel = channel
 
-    @property
-    def reference(self):
-        return '{}/{}@{}/{}'.format(self.name, self.version, self.user, self.channel)
+def repo_branch_head(repo_branch: GithubRepoBranch) -> str:
+    if repo_branch.commit is None:
+        repo_branch.commit = repo_branch.repo.get_branch(repo_branch.branch).commit.sha
+    return repo_branch.commit
 
-    @classmethod
-    def from_regex_match(cls, match: typing.Match) -> 'ConanReference':
-        if match is None:
-            raise ValueError
-        return cls(name=match['name'], version=match['version'], user=match['user'], channel=match['channel'])
 
-    @classmethod
-    def from_conanfile(cls, text: str) -> typing.List['ConanReference']:
-        return list(cls.from_regex_match(m) for m in CONAN_REF_REGEX_IN_CONANFILE.finditer(text))
+def repo_branch_dependencies(repo_branch: GithubRepoBranch, cache: typing.Optional[BlobCache]=None,
+                             extractor: typing.Optional[ConanfileAstExtractor]=None) -> \
+        typing.Optional[typing.Tuple[typing.List[ConanReference], typing.Optional[str]]]:
+    ''' Dependencies and version of the recipe of a branch, or None when the branch cannot be read
 
-    @classmethod
-    def from_refstr(cls, refstr: str) -> 'ConanReference':
-        return cls.from_regex_match(CONAN_REF_REGEX.search(refstr))
+    Only the cached variant needs the head commit of the branch: the blobs are cached by commit.
+    '''
+    try:
+        if cache is None:
+            files = list(_repo_branch_conanfiles(repo_branch))
+        else:
+            repo_branch_head(repo_branch)
+            files = list(_repo_branch_conanfiles_cached(repo_branch, cache))
+    except github.GithubException:
+        return None
+    return conanfiles_dependencies(files, extractor=extractor)
 
-    def __repr__(self):
-        return '<{}:{}>'.format(type(self).__name__, self.reference)
 
+def conanfiles_dependencies(files: typing.Iterable[typing.Tuple[typing.Optional[str], str]],
+                            extractor: typing.Optional[ConanfileAstExtractor]=None) -> \
+        typing.Tuple[typing.List[ConanReference], typing.Optional[str]]:
+    ''' Dependencies and version of a recipe consisting of (blob sha, text) files
 
-def repo_branch_dependencies(repo_branch: GithubRepoBranch) -> typing.Tuple[typing.List[ConanReference], typing.Optional[str]]:
+    By default, the references and version are matched by regular expressions.
+    When an extractor is given, the conanfiles are parsed instead.
+    '''
+    if extractor is not None:
+        return extractor.dependencies(files)
     deps = []
     version = None
-    for file in ('conanfile.py', 'conanfile_base.py', 'conanfile_installer.py', ):
-        try:
-            cf: github.ContentFile.ContentFile = repo_branch.repo.get_file_contents(path=file, ref=repo_branch.branch)
-        except github.GithubException:
-            continue
-        text = cf.decoded_content.decode()
-        refs = ConanReference.from_conanfile(text)
-        deps.extend(refs)
+    for _, text in files:
+        deps.extend(ConanReference.iter_from_conanfile(text))
 
         match = CONAN_VERSION_REGEX_IN_SOURCE.search(text)
         if match:
@@ -101,5 +100,63 @@ def repo_branch_dependencies(repo_branch: GithubRepoBranch) -> typing.Tuple[typi
     return deps, version
 
 
+def repo_branches_dependencies_graphql(gql: GithubGraphQL, repo_branches: typing.Iterable[GithubRepoBranch],
+                                       batch_size: int=25, extractor: typing.Optional[ConanfileAstExtractor]=None) -> \
+        typing.List[typing.Optional[typing.Tuple[typing.List[ConanReference], typing.Optional[str]]]]:
+    ''' Dependencies and version of the recipes of many branches (see repo_branch_dependencies)
+
+    The result of a branch that cannot be read (missing repo or branch) is None.
+    '''
+    repo_branches = list(repo_branches)
+    result = [None] * len(repo_branches)
+    by_owner = dict()
+    for repo_branch_i, repo_branch in enumerate(repo_branches):
+        by_owner.setdefault(repo_branch.repo.owner.login, []).append(repo_branch_i)
+    for owner, indices in by_owner.items():
+        all_repo_files = gql.repositories_files(
+            owner=owner,
+            repo_branches=((repo_branches[i].repo.name, repo_branches[i].branch, ) for i in indices),
+            paths=CONANFILE_NAMES, batch_size=batch_size)
+        for i, repo_files in zip(indices, all_repo_files):
+            repo_branches[i].commit = repo_files.commit
+            if repo_files.commit is None:
+                continue
+            files = ((repo_files.blobs[file], repo_files.files[file], )
+                     for file in CONANFILE_NAMES if repo_files.files[file] is not None)
+            result[i] = conanfiles_dependencies(files, extractor=extractor)
+    return result
+
+
+def _repo_branch_conanfiles(repo_branch: GithubRepoBranch) -> typing.Iterator[typing.Tuple[str, str]]:
+    ref = repo_branch.commit if repo_branch.commit is not None else repo_branch.branch
+    for file in CONANFILE_NAMES:
+        try:
+            cf: github.ContentFile.ContentFile = repo_branch.repo.get_file_contents(path=file, ref=ref)
+        except github.UnknownObjectException:
+            continue
+        yield cf.sha, cf.decoded_content.decode()
+
+
+def _repo_branch_conanfiles_cached(repo_branch: GithubRepoBranch, cache: BlobCache) -> \
+        typing.Iterator[typing.Tuple[str, str]]:
+    repo = repo_branch.repo
+    files = cache.get_commit_files(repo_branch.commit)
+    if files is None:
+        tree = repo.get_git_tree(repo_branch.commit)
+        blob_shas = dict((element.path, element.sha) for element in tree.tree if element.type == 'blob')
+        files = dict((file, blob_shas.get(file)) for file in CONANFILE_NAMES)
+        cache.put_commit_files(repo_branch.commit, files)
+    for file in CONANFILE_NAMES:
+        blob_sha = files.get(file)
+        if blob_sha is None:
+            continue
+        data = cache.get_blob(blob_sha)
+        if data is None:
+            blob = repo.get_git_blob(blob_sha)
+            data = base64.b64decode(blob.content)
+            cache.put_blob(blob_sha, data)
+        yield blob_sha, data.decode()
+
+
 if __name__ == '__main__':
     main()
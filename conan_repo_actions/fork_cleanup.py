@@ -2,12 +2,18 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import asyncio
 import github
 import github.Repository
 from conan_repo_actions import FORK_TAG
 from conan_repo_actions.base import ActionBase, ActionInterrupted
-from conan_repo_actions.util import Configuration, GithubUser, input_ask_question_yn
+from conan_repo_actions.github_graphql import ForkInfo, GithubGraphQL
+from conan_repo_actions.concurrency import map_concurrent
+from conan_repo_actions.util import Configuration, GithubUser, argparse_add_jobs_option, \
+    argparse_add_snapshot_options, github_error_is_transient, input_ask_question_yn, retry_call
 import sys
+import threading
+import time
 import typing
 
 
@@ -21,24 +27,59 @@ def main():
                            help='Name of the tag. (default="{}")'.format(FORK_TAG))
     parser.add_argument('--force', dest='interactive', action='store_false', help='interactive')
     parser.add_argument('--delete', dest='delete', action='store_true', help='Delete the forked repositories')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='use the asyncio github client')
+    argparse_add_jobs_option(parser)
+    parser.add_argument('--retries', type=int, default=3,
+                        help='number of attempts of every deletion (default=3)')
+    parser.add_argument('--graphql', action='store_true',
+                        help='resolve the parents and topics of all forks in bulk using the GraphQL api')
+    argparse_add_snapshot_options(parser)
 
     args = parser.parse_args()
 
     fork_tag = args.tag_name if args.do_tag else None
 
+    if args.use_async:
+        if args.jobs != 1 or args.retries != parser.get_default('retries') or args.graphql or args.snapshot \
+                or args.refresh:
+            parser.error('--jobs, --retries, --graphql, --snapshot and --refresh are not supported with --async')
+        asyncio.run(fork_cleanup_async(owner_login=args.owner_login, fork_tag=fork_tag, delete=args.delete,
+                                       interactive=args.interactive))
+        return
+
     c = Configuration()
     g = c.get_github()
 
     user = g.get_user()
     user_from = g.get_user(args.owner_login)
 
-    fork_cleanup(user=user, user_from=user_from, fork_tag=fork_tag, delete=args.delete, interactive=args.interactive)
+    forks = None
+    if args.snapshot or args.refresh:
+        with c.get_metadata_store() as store:
+            c.get_metadata_refresher(store, jobs=args.jobs).refresh_owner(user.login, branches=False, parents=True,
+                                                                          full=args.refresh)
+            forks = dict((repo['full_name'], ForkInfo(full_name=repo['full_name'],
+                                                      parent=store.parent(repo['full_name']),
+                                                      topics=repo.get('topics')), )
+                         for repo in store.repos(user.login) if repo.get('fork'))
+    elif args.graphql:
+        forks = forks_graphql(c.get_github_graphql())
+
+    fork_cleanup(user=user, user_from=user_from, fork_tag=fork_tag, delete=args.delete, interactive=args.interactive,
+                 forks=forks, jobs=args.jobs, retries=args.retries)
+
+
+def forks_graphql(gql: GithubGraphQL) -> typing.Dict[str, ForkInfo]:
+    ''' Parent and topics of every fork of the authenticated user, keyed by full name of the fork '''
+    return dict((fork.full_name, fork, ) for fork in gql.viewer_forks())
 
 
 def fork_cleanup(user: GithubUser, user_from: GithubUser, fork_tag: typing.Optional[str]=FORK_TAG,
-                 delete: bool=False, interactive: bool=False):
+                 delete: bool=False, interactive: bool=False,
+                 forks: typing.Optional[typing.Mapping[str, ForkInfo]]=None, jobs: int=1, retries: int=3):
     cleanup_action = ForkCleanupAction(user=user, user_from=user_from, fork_tag=fork_tag,
-                                       delete=delete, interactive=interactive)
+                                       delete=delete, interactive=interactive, forks=forks, jobs=jobs,
+                                       retries=retries)
     cleanup_action.check()
 
     print(cleanup_action.description())
@@ -46,9 +87,67 @@ def fork_cleanup(user: GithubUser, user_from: GithubUser, fork_tag: typing.Optio
     cleanup_action.action()
 
 
+async def fork_cleanup_async(owner_login: str, fork_tag: typing.Optional[str]=FORK_TAG,
+                             delete: bool=False, interactive: bool=False, limit: typing.Optional[int]=None):
+    from conan_repo_actions.github_async import AsyncGithubException
+    c = Configuration()
+    async with c.get_github_async(limit=limit) as g:
+        user = await g.get_authenticated_user()
+        if user['login'].lower() == owner_login.lower():
+            print('Cannot have forks of repos of myself', file=sys.stderr)
+            raise ActionInterrupted()
+
+        # Only my own forks are listed: the listing of the repo does not contain its parent
+        my_forks = list(repo for repo in await g.list_authenticated_user_repos() if repo['fork'])
+        my_forks_data = await asyncio.gather(*(g.get_repo(repo['full_name']) for repo in my_forks))
+        candidates = list((repo_to['parent']['full_name'], repo_to, ) for repo_to in my_forks_data
+                          if repo_to.get('parent') and
+                          repo_to['parent']['owner']['login'].lower() == owner_login.lower())
+
+        if fork_tag:
+            # The topics are part of the repo data: only request them when they are missing
+            async def get_topics(repo_to: typing.Dict[str, typing.Any]) -> typing.List[str]:
+                if repo_to.get('topics') is not None:
+                    return repo_to['topics']
+                return await g.get_topics(repo_to['full_name'])
+
+            topics = await asyncio.gather(*(get_topics(repo_to) for _, repo_to in candidates))
+            forks = list(candidate for candidate, repo_topics in zip(candidates, topics) if fork_tag in repo_topics)
+        else:
+            forks = candidates
+
+        print('Handling forks with parent user "{}" and child user "{}". {} repos found. Action:"{}"'.format(
+            owner_login, user['login'], len(forks), 'delete' if delete else 'list'))
+
+        to_delete = []
+        for repo_from_name, repo_to in forks:
+            print('- {} -> {} ({})'.format(repo_from_name, repo_to['full_name'], repo_to['html_url']))
+            if delete:
+                if interactive and not input_ask_question_yn('Delete {}?'.format(
+                        repo_to['full_name']), default=False):
+                    continue
+                to_delete.append(repo_to['full_name'])
+
+        results = await asyncio.gather(*(g.delete_repo(full_name) for full_name in to_delete), return_exceptions=True)
+        nb_errors = 0
+        for full_name, result in zip(to_delete, results):
+            if isinstance(result, AsyncGithubException):
+                print('Failed to delete "{}"'.format(full_name), file=sys.stderr)
+                nb_errors += 1
+            elif isinstance(result, BaseException):
+                raise result
+        if to_delete:
+            print('{} forks deleted, {} failed'.format(len(to_delete) - nb_errors, nb_errors))
+
+
 class ForkCleanupAction(ActionBase):
     def __init__(self, user: GithubUser, user_from: GithubUser, fork_tag: typing.Optional[str]=FORK_TAG,
-                 delete: bool=False, interactive: bool=False, progress: bool=True):
+                 delete: bool=False, interactive: bool=False, progress: bool=True,
+                 forks: typing.Optional[typing.Mapping[str, ForkInfo]]=None, jobs: int=1, retries: int=3):
+        '''
+        :param forks: parent and topics of forks, keyed by full name of the fork.
+                      The parents of other forks are requested, their topics are taken from the repo listing.
+        '''
         super().__init__(interactive=interactive)
         self._user = user
         self._user_from = user_from
@@ -60,40 +159,91 @@ class ForkCleanupAction(ActionBase):
 
         self._progress = progress
 
+        self._fork_infos = forks or dict()
+        self._jobs = jobs
+        self._retries = retries
+
     def run_check(self):
         if self._user_from.id == self._user.id:
             print('Cannot have forks of repos of myself', file=sys.stderr)
             raise ActionInterrupted()
         forks = []
-        for repo_from, repo_to in self._repos_forked_iter():
-            if self._fork_tag and self._fork_tag not in repo_to.get_topics():
+        for repo_from_name, repo_to in self._repos_forked_iter():
+            if self._fork_tag and self._fork_tag not in self._repo_topics(repo_to):
                 continue
-            forks.append((repo_from, repo_to, ))
+            forks.append((repo_from_name, repo_to, ))
         self._forks = forks
 
-    def _repos_forked_iter(self) -> \
-            typing.Iterable[typing.Tuple[github.Repository.Repository, github.Repository.Repository]]:
-        for repo_from in self._user_from.get_repos():
-            for repo_fork in repo_from.get_forks():
-                if self._progress:
-                    print('.', end='', file=sys.stderr, flush=True)
-                if repo_fork.owner.id == self._user.id:
-                    yield repo_from, repo_fork
+    def _repos_forked_iter(self) -> typing.Iterable[typing.Tuple[str, github.Repository.Repository]]:
+        ''' (full name of the parent, fork) of my forks of repos of user_from '''
+        my_forks = list(repo for repo in self._user.get_repos(type='owner') if repo.fork)
+        parents = map_concurrent(self._repo_parent, my_forks, jobs=self._jobs)
         if self._progress:
             print(file=sys.stderr)
+        owner_from = self._user_from.login.lower()
+        for repo_fork, parent in zip(my_forks, parents):
+            if parent is not None and parent.split('/', 1)[0].lower() == owner_from:
+                yield parent, repo_fork
+
+    def _repo_parent(self, repo: github.Repository.Repository) -> typing.Optional[str]:
+        fork_info = self._fork_infos.get(repo.full_name)
+        if fork_info is not None:
+            return fork_info.parent
+        if self._progress:
+            print('.', end='', file=sys.stderr, flush=True)
+        parent = repo.parent
+        return None if parent is None else parent.full_name
+
+    def _repo_topics(self, repo: github.Repository.Repository) -> typing.List[str]:
+        fork_info = self._fork_infos.get(repo.full_name)
+        if fork_info is not None and fork_info.topics is not None:
+            return fork_info.topics
+        # Part of the data of the repo listing: no request per repo
+        return repo.topics
 
     def run_action(self):
-        for repo_from, repo_to in self._forks:
-            print('- {} -> {} ({})'.format(repo_from.full_name, repo_to.full_name, repo_to.html_url))
+        to_delete = []
+        for repo_from_name, repo_to in self._forks:
+            print('- {} -> {} ({})'.format(repo_from_name, repo_to.full_name, repo_to.html_url))
             if self._delete:
                 if self.interactive and not input_ask_question_yn('Delete {}?'.format(
                         repo_to.full_name), default=False):
                     continue
-                try:
-                    repo_to.delete()
-                    print('"{}" deleted successfully'.format(repo_to.full_name))
-                except github.GithubException:
-                    print('Failed to delete "{}"'.format(repo_to.full_name), file=sys.stderr)
+                to_delete.append(repo_to)
+        if to_delete:
+            self._delete_forks(to_delete)
+
+    def _delete_forks(self, repos: typing.List[github.Repository.Repository]):
+        ''' Delete repos concurrently, reporting the progress on stderr and a summary at the end '''
+        lock = threading.Lock()
+        nb_done = 0
+        start = time.monotonic()
+
+        def delete(repo: github.Repository.Repository) -> typing.Optional[Exception]:
+            nonlocal nb_done
+            error = None
+            try:
+                retry_call(repo.delete, attempts=self._retries, retry_on=github_error_is_transient)
+            except Exception as e:
+                error = e
+            with lock:
+                nb_done += 1
+                if self._progress:
+                    print('\rDeleted {}/{} forks ({:.1f}/s)'.format(
+                        nb_done, len(repos), nb_done / max(time.monotonic() - start, 1e-3)),
+                        end='', file=sys.stderr, flush=True)
+            return error
+
+        errors = map_concurrent(delete, repos, jobs=self._jobs)
+        elapsed = time.monotonic() - start
+        if self._progress:
+            print(file=sys.stderr)
+        for repo, error in zip(repos, errors):
+            if error is not None:
+                print('Failed to delete "{}": {}'.format(repo.full_name, error), file=sys.stderr)
+        nb_errors = sum(1 for error in errors if error is not None)
+        print('{} forks deleted, {} failed in {:.1f}s ({:.1f} deletions/s)'.format(
+            len(repos) - nb_errors, nb_errors, elapsed, len(repos) / max(elapsed, 1e-3)))
 
     def run_description(self) -> str:
         return 'Handling forks with parent user "{}" and child user "{}". {} repos found. Action:"{}"'.format(
@@ -2,15 +2,24 @@
 # -*- coding: utf-8 -*-
 
 import argparse
-from github import Github, GithubException
+from github import Github, GithubException, UnknownObjectException
 from github.AuthenticatedUser import AuthenticatedUser
 from github.Repository import Repository
 from conan_repo_actions import FORK_PREFIX, FORK_TAG
 from conan_repo_actions.base import ActionBase, ActionInterrupted
-from conan_repo_actions.util import Configuration, GithubUser, input_ask_question_yn
+from conan_repo_actions.permissions import shared_permission_cache
+from conan_repo_actions.concurrency import map_concurrent
+from conan_repo_actions.util import Configuration, GithubUser, argparse_add_jobs_option, input_ask_question_yn
 import sys
+import time
 import typing
 
+# Seconds to wait for github to finish creating forks
+FORK_READY_TIMEOUT = 300.
+# Seconds between the first polls of the readiness of forks, doubled after every poll up to the maximum
+FORK_POLL_INTERVAL = 1.
+FORK_MAX_POLL_INTERVAL = 16.
+
 
 def main():
     parser = argparse.ArgumentParser(description='Create a fork')
@@ -25,7 +34,11 @@ def main():
                               help='prefix of the fork. (default={})'.format(FORK_PREFIX))
     prefix_group.add_argument('--no-prefix', dest='do_prefix', action='store_false', help='Don\'t prefix the fork')
 
-    parser.add_argument('repo_name', type=str, help='name of repo to clone')
+    argparse_add_jobs_option(parser)
+    parser.add_argument('--timeout', type=float, default=FORK_READY_TIMEOUT,
+                        help='seconds to wait for github to create the forks (default={})'.format(FORK_READY_TIMEOUT))
+
+    parser.add_argument('repo_names', nargs='+', help='names of the repos to fork')
 
     args = parser.parse_args()
 
@@ -35,12 +48,19 @@ def main():
     tag_name = args.tag_name if args.do_tag else None
     fork_prefix = args.fork_prefix if args.do_prefix else None
 
-    repo_from, repo_to = fork_create2(g=g, user_from_name=args.owner_login, user_to_name=None,
-                                      repo_from_name=args.repo_name, fork_tag=tag_name, fork_prefix=fork_prefix,
-                                      interactive=args.interactive)
+    if len(args.repo_names) == 1:
+        repo_from, repo_to = fork_create2(g=g, user_from_name=args.owner_login, user_to_name=None,
+                                          repo_from_name=args.repo_names[0], fork_tag=tag_name,
+                                          fork_prefix=fork_prefix, interactive=args.interactive)
+        forks = [(repo_from, repo_to, ), ]
+    else:
+        forks = fork_create_many(g=g, user_from_name=args.owner_login, user_to_name=None,
+                                 repo_from_names=args.repo_names, fork_tag=tag_name, fork_prefix=fork_prefix,
+                                 interactive=args.interactive, jobs=args.jobs, timeout=args.timeout)
 
-    print('parent:', repo_from.full_name, repo_from.clone_url, repo_from.ssh_url)
-    print('fork:', repo_to.full_name, repo_to.clone_url, repo_to.ssh_url)
+    for repo_from, repo_to in forks:
+        print('parent:', repo_from.full_name, repo_from.clone_url, repo_from.ssh_url)
+        print('fork:', repo_to.full_name, repo_to.clone_url, repo_to.ssh_url)
 
 
 def fork_create(repo_name: str, from_user: GithubUser, to_user: AuthenticatedUser):
@@ -84,6 +104,59 @@ def fork_create2(g: Github, repo_from_name: str, user_from_name: str, user_to_na
     return fork_action.repo_from, fork_action.repo_to
 
 
+def fork_create_many(g: Github, repo_from_names: typing.Iterable[str], user_from_name: str,
+                     user_to_name: typing.Optional[str]=None, fork_tag: typing.Optional[str]=FORK_TAG,
+                     fork_prefix: typing.Optional[str]=FORK_PREFIX, interactive: bool=False, jobs: int=1,
+                     timeout: float=FORK_READY_TIMEOUT) -> typing.List[typing.Tuple[Repository, Repository]]:
+    user_from = g.get_user(user_from_name)
+    if not user_to_name:
+        user_to = g.get_user()
+    else:
+        user_to = g.get_user(user_to_name)
+
+    repos_from = map_concurrent(user_from.get_repo, repo_from_names, jobs=jobs)
+    fork_actions = list(ForkCreateAction(repo_from=repo_from, user_to=user_to, fork_tag=fork_tag,
+                                         fork_prefix=fork_prefix) for repo_from in repos_from)
+    map_concurrent(lambda fork_action: fork_action.check(), fork_actions, jobs=jobs)
+
+    for fork_action in fork_actions:
+        print(fork_action.description())
+    nb_new = sum(1 for fork_action in fork_actions if fork_action.repo_to is None)
+    if nb_new and interactive and not input_ask_question_yn('Create {} forks?'.format(nb_new), default=False):
+        raise ActionInterrupted()
+
+    create_forks(fork_actions, jobs=jobs, timeout=timeout)
+
+    return list((fork_action.repo_from, fork_action.repo_to, ) for fork_action in fork_actions)
+
+
+def create_forks(fork_actions: typing.Sequence['ForkCreateAction'], jobs: int=1,
+                 timeout: float=FORK_READY_TIMEOUT) -> None:
+    ''' Create the forks of checked actions that have no fork yet
+
+    Github creates forks asynchronously. All forks are requested up front,
+    and every fork is renamed and tagged as soon as it is ready,
+    so creating many forks takes about as long as creating one.
+    '''
+    pending = list(fork_action for fork_action in fork_actions if fork_action.repo_to is None)
+    map_concurrent(lambda fork_action: fork_action.submit_fork(), pending, jobs=jobs)
+
+    deadline = time.monotonic() + timeout
+    delay = FORK_POLL_INTERVAL
+    while True:
+        ready = map_concurrent(lambda fork_action: fork_action.fork_ready(), pending, jobs=jobs)
+        map_concurrent(lambda fork_action: fork_action.finish_fork(),
+                       list(fork_action for fork_action, r in zip(pending, ready) if r), jobs=jobs)
+        pending = list(fork_action for fork_action, r in zip(pending, ready) if not r)
+        if not pending:
+            return
+        if time.monotonic() + delay > deadline:
+            raise ActionInterrupted('Forks not ready after {:.0f}s: {}'.format(
+                timeout, ', '.join(fork_action.repo_to.full_name for fork_action in pending)))
+        time.sleep(delay)
+        delay = min(2 * delay, FORK_MAX_POLL_INTERVAL)
+
+
 class ForkCreateAction(ActionBase):
     def __init__(self, repo_from: Repository, user_to: AuthenticatedUser,
                  repo_to_name: typing.Optional[str]=None,
@@ -100,26 +173,66 @@ class ForkCreateAction(ActionBase):
         self._fork_prefix = fork_prefix
 
     def run_check(self):
-        for repo_fork in self._repo_from.get_forks():
-            if repo_fork.owner.id == self._user_to.id:
-                print('Repo "{}" already forked to "{}".'.format(self._repo_from.full_name, repo_fork.full_name),
-                      file=sys.stderr)
-                self._repo_to = repo_fork
-                self._repo_to_name = repo_fork.name
-                break
+        repo_fork = self._find_fork()
+        if repo_fork is not None:
+            print('Repo "{}" already forked to "{}".'.format(self._repo_from.full_name, repo_fork.full_name),
+                  file=sys.stderr)
+            if not shared_permission_cache().can_push(repo_fork):
+                raise ActionInterrupted('No write access to fork "{}"'.format(repo_fork.full_name))
+            self._repo_to = repo_fork
+            self._repo_to_name = repo_fork.name
 
         if not self._repo_to_name:
-            if self._fork_prefix is None:
-                self._repo_to_name = self._repo_from.name
-            else:
-                self._repo_to_name = '{}-{}'.format(self._fork_prefix, self._repo_from.name)
+            self._repo_to_name = self._default_repo_to_name()
+
+    def _default_repo_to_name(self) -> str:
+        if self._fork_prefix is None:
+            return self._repo_from.name
+        return '{}-{}'.format(self._fork_prefix, self._repo_from.name)
+
+    def _find_fork(self) -> typing.Optional[Repository]:
+        ''' Find the fork of repo_from owned by user_to by probing the names a fork gets, instead of listing all forks
+
+        A fork is named like its parent by github, and renamed by this action.
+        '''
+        names = []
+        for name in (self._repo_to_name, self._default_repo_to_name(), self._repo_from.name, ):
+            if name and name.lower() not in (n.lower() for n in names):
+                names.append(name)
+        for name in names:
+            try:
+                repo = self._user_to.get_repo(name)
+            except UnknownObjectException:
+                continue
+            # The repo data of a fork contains its parent: no extra request
+            if repo.fork and repo.parent is not None and \
+                    repo.parent.full_name.lower() == self._repo_from.full_name.lower():
+                return repo
+        return None
 
     def run_action(self):
         if self._repo_to is not None:
             return
         if self.interactive and not input_ask_question_yn("Create fork '{}'?".format(self._repo_from), default=False):
             raise ActionInterrupted()
+        create_forks([self, ])
+
+    def submit_fork(self) -> None:
+        ''' Request the fork. Github returns before the fork is ready. '''
         self._repo_to = self._user_to.create_fork(self._repo_from)
+
+    def fork_ready(self) -> bool:
+        ''' Whether github has finished creating the fork: its default branch can be read '''
+        try:
+            self._repo_to.get_branch(self._repo_to.default_branch)
+        except GithubException as e:
+            if e.status in (404, 409, ):
+                return False
+            raise
+        return True
+
+    def finish_fork(self) -> None:
+        ''' Rename and tag a fork that is ready '''
         self._repo_to.edit(name=self._repo_to_name)
         if self._fork_tag:
             topics_from = self._repo_from.get_topics()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple
+import git
+from pathlib import Path
+import re
+import shutil
+import threading
+import typing
+
+_URL_SCHEME_REGEX = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.-]*://')
+
+# Directories of a recipe in a sparse checkout. All files in the root of the repo are always checked out.
+SPARSE_DIRECTORIES = ('.ci', '.github', '.travis', 'patches', 'recipes', 'test_package', )
+
+CloneOptions = namedtuple('CloneOptions', ('depth', 'single_branch', 'blobless', 'sparse', ))
+
+FULL_CLONE = CloneOptions(depth=None, single_branch=False, blobless=False, sparse=False)
+
+
+def clone_options_partial(options: CloneOptions) -> bool:
+    ''' Whether a clone with these options lacks history, branches or blobs of the remote '''
+    return bool(options.depth or options.single_branch or options.blobless)
+
+
+def clone_repository(url: str, to_path: Path, branch: typing.Optional[str]=None, options: CloneOptions=FULL_CLONE,
+                     mirrors: typing.Optional['GitMirrorCache']=None) -> git.Repo:
+    ''' Clone url to to_path
+
+    :param branch: branch to clone when options.single_branch
+    :param options: depth of the history, only one branch, no blobs until needed (blobless partial clone)
+                    and/or a sparse checkout of the recipe and CI files
+    :param mirrors: clone from the local mirror of url. All objects are borrowed from the mirror,
+                    so depth and blobless cannot be combined with it.
+    '''
+    if mirrors is not None and (options.depth or options.blobless):
+        raise ValueError('A clone from a mirror cannot be shallow or blobless')
+    kwargs = {}
+    if options.single_branch:
+        kwargs['single_branch'] = True
+        if branch is not None:
+            kwargs['branch'] = branch
+    if options.sparse:
+        kwargs['sparse'] = True
+    if mirrors is not None:
+        r = mirrors.clone(url, to_path, **kwargs)
+    else:
+        if options.depth:
+            kwargs['depth'] = options.depth
+            if not options.single_branch:
+                kwargs['no_single_branch'] = True
+        if options.blobless:
+            kwargs['filter'] = 'blob:none'
+        r = git.Repo.clone_from(url=url, to_path=str(to_path), **kwargs)
+    if options.sparse:
+        r.git.sparse_checkout('set', *SPARSE_DIRECTORIES)
+    return r
+
+
+def fetch_remote(r: git.Repo, remote: str, branch: typing.Optional[str]=None,
+                 options: CloneOptions=FULL_CLONE) -> None:
+    ''' Fetch remote into a clone, limited like the clone itself
+
+    :param branch: only branch to fetch when options.single_branch. Nothing is fetched when remote lacks it.
+    '''
+    kwargs = {}
+    if options.depth:
+        kwargs['depth'] = options.depth
+    if options.blobless:
+        kwargs['filter'] = 'blob:none'
+    refspecs = []
+    if options.single_branch and branch is not None:
+        if not r.git.ls_remote(remote, 'refs/heads/{}'.format(branch), heads=True):
+            return
+        refspecs.append('+refs/heads/{branch}:refs/remotes/{remote}/{branch}'.format(branch=branch, remote=remote))
+    r.git.fetch(remote, *refspecs, **kwargs)
+
+
+class GitMirrorCache(object):
+    ''' Persistent bare mirrors of remote repositories, shared by the clones of all runs
+
+    Updating a mirror only fetches the commits that were pushed since the previous run.
+    A clone is made from the local mirror, borrowing its objects through the git alternates mechanism
+    (git clone --shared), so it costs no network traffic and almost no disk space.
+    The remotes of the clone point to the real url, so fetching and pushing work as usual.
+    Objects of a mirror are never pruned, because clones may depend on them.
+    '''
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._locks = dict()
+        self._locks_lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def mirror_path(self, url: str) -> Path:
+        ''' Location of the mirror of url (e.g. <path>/github.com/bincrafters/conan-zlib.git) '''
+        relative = _URL_SCHEME_REGEX.sub('', url).replace('\\', '/')
+        relative = relative.split('@', 1)[-1] if '@' in relative.split('/', 1)[0] else relative
+        relative = relative.replace(':', '/')
+        parts = list(part for part in relative.split('/') if part not in ('', '.', '..', ))
+        if not parts[-1].endswith('.git'):
+            parts[-1] += '.git'
+        return self._path.joinpath(*parts)
+
+    def update(self, url: str) -> Path:
+        ''' Create or update the mirror of url, and return its path '''
+        mirror_path = self.mirror_path(url)
+        with self._lock(mirror_path):
+            if mirror_path.is_dir():
+                git.Repo(mirror_path).git.fetch('origin', prune=True)
+            else:
+                self._create(url, mirror_path)
+        return mirror_path
+
+    def clone(self, url: str, to_path: Path, update: bool=True, **kwargs) -> git.Repo:
+        ''' Clone url to to_path, borrowing the objects of the mirror of url
+
+        :param update: fetch the new commits of url into the mirror first
+        :param kwargs: extra options of git clone (e.g. single_branch=True, branch=...)
+        '''
+        mirror_path = self.update(url) if update else self.mirror_path(url)
+        r = git.Repo.clone_from(url=str(mirror_path), to_path=str(to_path), shared=True, **kwargs)
+        r.remote('origin').set_url(url)
+        return r
+
+    def _create(self, url: str, mirror_path: Path) -> None:
+        # Clone to a temporary location first, so an interrupted clone never leaves a broken mirror behind
+        tmp_path = mirror_path.with_name(mirror_path.name + '.tmp')
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        mirror_path.parent.mkdir(parents=True, exist_ok=True)
+        r = git.Repo.clone_from(url=url, to_path=str(tmp_path), bare=True)
+        with r.config_writer() as config:
+            # Only the branches and tags: the pull request refs of github would make the mirror huge
+            config.set_value('remote "origin"', 'fetch', '+refs/heads/*:refs/heads/*')
+            config.add_value('remote "origin"', 'fetch', '+refs/tags/*:refs/tags/*')
+            config.set_value('gc', 'pruneExpire', 'never')
+            config.set_value('gc', 'auto', '0')
+        r.close()
+        tmp_path.rename(mirror_path)
+
+    def _lock(self, mirror_path: Path) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(mirror_path, threading.Lock())
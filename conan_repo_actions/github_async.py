@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+import aiohttp
+import base64
+import re
+import typing
+from .ratelimit import RateLimitScheduler
+
+GITHUB_API_URL = 'https://api.github.com'
+DEFAULT_CONNECTION_LIMIT = 20
+
+_LINK_NEXT_REGEX = re.compile(r'<(?P<url>[^>]+)>;\s*rel="next"')
+
+
+class AsyncGithubException(Exception):
+    def __init__(self, status: int, data: typing.Any):
+        super().__init__(status, data)
+        self.status = status
+        self.data = data
+
+
+class AsyncGithub(object):
+    ''' Asyncio client of the github REST api for bulk operations
+
+    All requests share one pooled HTTP session, limited to `limit` concurrent connections.
+    The methods return the decoded json data of the api.
+    Use as an asynchronous context manager:
+
+        async with AsyncGithub(token) as g:
+            repos = await g.list_repos('bincrafters')
+    '''
+
+    def __init__(self, token: typing.Optional[str], base_url: str=GITHUB_API_URL,
+                 limit: int=DEFAULT_CONNECTION_LIMIT, scheduler: typing.Optional[RateLimitScheduler]=None):
+        self._token = token
+        self._scheduler = scheduler
+        self._base_url = base_url.rstrip('/')
+        self._limit = limit
+        self._session: typing.Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> 'AsyncGithub':
+        headers = {'Accept': 'application/vnd.github.v3+json', }
+        if self._token:
+            headers['Authorization'] = 'token {}'.format(self._token)
+        self._session = aiohttp.ClientSession(headers=headers,
+                                              connector=aiohttp.TCPConnector(limit=self._limit))
+        return self
+
+    async def __aexit__(self, *args):
+        await self._session.close()
+        self._session = None
+
+    async def request(self, method: str, url: str, params: typing.Optional[typing.Mapping[str, typing.Any]]=None,
+                      json: typing.Any=None, headers: typing.Optional[typing.Mapping[str, str]]=None) -> \
+            typing.Tuple[int, typing.Mapping[str, str], typing.Any]:
+        if not url.startswith('http'):
+            url = self._base_url + url
+
+        async def request():
+            async with self._session.request(method, url, params=params, json=json, headers=headers) as response:
+                if response.status == 204:
+                    data = None
+                else:
+                    data = await response.json(content_type=None)
+                return response.status, response.headers, data
+
+        if self._scheduler is None:
+            status, response_headers, data = await request()
+        else:
+            status, response_headers, data = await self._scheduler.call_async(request)
+        if status >= 400:
+            raise AsyncGithubException(status, data)
+        return status, response_headers, data
+
+    async def paginate(self, url: str, params: typing.Optional[typing.Mapping[str, typing.Any]]=None,
+                       headers: typing.Optional[typing.Mapping[str, str]]=None) -> typing.List[typing.Any]:
+        params = dict(params or {})
+        params.setdefault('per_page', 100)
+        result = []
+        next_url = url
+        while next_url is not None:
+            _, response_headers, data = await self.request('GET', next_url, params=params, headers=headers)
+            result.extend(data)
+            match = _LINK_NEXT_REGEX.search(response_headers.get('Link', ''))
+            next_url = match['url'] if match else None
+            params = None
+        return result
+
+    async def get_authenticated_user(self) -> typing.Dict[str, typing.Any]:
+        _, _, data = await self.request('GET', '/user')
+        return data
+
+    async def get_repo(self, full_name: str) -> typing.Dict[str, typing.Any]:
+        _, _, data = await self.request('GET', '/repos/{}'.format(full_name))
+        return data
+
+    async def list_repos(self, owner: str) -> typing.List[typing.Dict[str, typing.Any]]:
+        return await self.paginate('/users/{}/repos'.format(owner))
+
+    async def list_authenticated_user_repos(self, type: str='owner') -> typing.List[typing.Dict[str, typing.Any]]:
+        return await self.paginate('/user/repos', params={'type': type})
+
+    async def list_branches(self, full_name: str) -> typing.List[typing.Dict[str, typing.Any]]:
+        return await self.paginate('/repos/{}/branches'.format(full_name))
+
+    async def get_branch(self, full_name: str, branch: str) -> typing.Dict[str, typing.Any]:
+        _, _, data = await self.request('GET', '/repos/{}/branches/{}'.format(full_name, branch))
+        return data
+
+    async def get_contents(self, full_name: str, path: str, ref: typing.Optional[str]=None) -> \
+            typing.Optional[typing.Tuple[str, bytes]]:
+        ''' Return the blob sha and content of a file, or None if it does not exist '''
+        params = {'ref': ref} if ref else None
+        try:
+            _, _, data = await self.request('GET', '/repos/{}/contents/{}'.format(full_name, path), params=params)
+        except AsyncGithubException as e:
+            if e.status == 404:
+                return None
+            raise
+        return data['sha'], base64.b64decode(data['content'])
+
+    async def get_topics(self, full_name: str) -> typing.List[str]:
+        _, _, data = await self.request('GET', '/repos/{}/topics'.format(full_name),
+                                        headers={'Accept': 'application/vnd.github.mercy-preview+json'})
+        return data['names']
+
+    async def list_forks(self, full_name: str) -> typing.List[typing.Dict[str, typing.Any]]:
+        return await self.paginate('/repos/{}/forks'.format(full_name))
+
+    async def create_pull(self, full_name: str, head: str, base: str, title: str, body: str='') -> \
+            typing.Dict[str, typing.Any]:
+        _, _, data = await self.request('POST', '/repos/{}/pulls'.format(full_name),
+                                        json={'head': head, 'base': base, 'title': title, 'body': body})
+        return data
+
+    async def edit_repo(self, full_name: str, **fields) -> typing.Dict[str, typing.Any]:
+        fields.setdefault('name', full_name.split('/', 1)[1])
+        _, _, data = await self.request('PATCH', '/repos/{}'.format(full_name), json=fields)
+        return data
+
+    async def delete_repo(self, full_name: str) -> None:
+        await self.request('DELETE', '/repos/{}'.format(full_name))
+
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple, OrderedDict
+import requests
+import typing
+from .ratelimit import RateLimitScheduler
+
+GITHUB_GRAPHQL_URL = 'https://api.github.com/graphql'
+
+RepoFiles = namedtuple('RepoFiles', ('name', 'branch', 'commit', 'files', 'blobs', ))
+RepoRefs = namedtuple('RepoRefs', ('name', 'default_branch', 'archived', 'branches', ))
+ForkInfo = namedtuple('ForkInfo', ('full_name', 'parent', 'topics', ))
+
+_REFS_FRAGMENT = 'refs(refPrefix: "refs/heads/", first: 100{after}) ' \
+                 '{{ pageInfo {{ hasNextPage endCursor }} nodes {{ name target {{ oid }} }} }}'
+_REPO_REFS_FRAGMENT = 'name isArchived defaultBranchRef {{ name }} {refs}'.format(
+    refs=_REFS_FRAGMENT.format(after=''))
+
+
+class GraphQLError(Exception):
+    pass
+
+
+class GithubGraphQL(object):
+    ''' Minimal client of the github GraphQL api
+
+    Every method batches many repositories in one request by aliasing them.
+    '''
+
+    def __init__(self, token: typing.Optional[str], url: str=GITHUB_GRAPHQL_URL,
+                 session: typing.Optional[requests.Session]=None,
+                 scheduler: typing.Optional[RateLimitScheduler]=None):
+        self._url = url
+        self._scheduler = scheduler
+        self._session = session or requests.Session()
+        if token:
+            self._session.headers['Authorization'] = 'bearer {}'.format(token)
+
+    @property
+    def url(self) -> str:
+        return self._url
+
+    def query(self, query: str, variables: typing.Optional[typing.Mapping[str, typing.Any]]=None) -> \
+            typing.Dict[str, typing.Any]:
+        def post():
+            response = self._session.post(self._url, json={'query': query, 'variables': dict(variables or {})})
+            return response.status_code, response.headers, response
+
+        if self._scheduler is None:
+            _, _, response = post()
+        else:
+            _, _, response = self._scheduler.call(post)
+        response.raise_for_status()
+        result = response.json()
+        data = result.get('data')
+        if data is None:
+            raise GraphQLError(result.get('errors'))
+        return data
+
+    def repositories_files(self, owner: str, repo_branches: typing.Iterable[typing.Tuple[str, typing.Optional[str]]],
+                           paths: typing.Sequence[str], batch_size: int=25) -> typing.List[RepoFiles]:
+        ''' Fetch the head commit and the text of files of many repositories
+
+        :param owner: owner of the repositories
+        :param repo_branches: (name, branch) of the repositories. A branch of None means the default branch
+        :param paths: paths of the files to fetch
+        :param batch_size: number of repositories per request
+        :return: list of RepoFiles, in the same order as repo_branches.
+                 files and blobs map the paths to text and blob sha. Missing files have None as text
+        '''
+        repo_branches = list(repo_branches)
+        result = []
+        for batch_start in range(0, len(repo_branches), batch_size):
+            batch = repo_branches[batch_start:batch_start+batch_size]
+            result.extend(self._repositories_files_batch(owner, batch, paths))
+        return result
+
+    def repositories_heads(self, owner: str, repo_branches: typing.Iterable[typing.Tuple[str, typing.Optional[str]]],
+                           batch_size: int=100) -> typing.List[RepoFiles]:
+        ''' Fetch the head commit of many repositories (see repositories_files) '''
+        return self.repositories_files(owner=owner, repo_branches=repo_branches, paths=(), batch_size=batch_size)
+
+    def repositories_refs(self, owner: str, names: typing.Optional[typing.Iterable[str]]=None,
+                          batch_size: int=50) -> typing.List[RepoRefs]:
+        ''' Fetch the branches, with their head commit, of many repositories
+
+        :param owner: owner of the repositories
+        :param names: names of the repositories. None means all repositories of owner, sorted by name
+        :param batch_size: number of repositories per request, when names are given
+        :return: list of RepoRefs. branches maps the branch names to their head commit.
+                 Repositories that do not exist are left out
+        '''
+        if names is None:
+            repos_data = self._owner_repositories_refs(owner)
+        else:
+            names = list(names)
+            repos_data = []
+            for batch_start in range(0, len(names), batch_size):
+                batch = names[batch_start:batch_start+batch_size]
+                repos_data.extend(self._repositories_refs_batch(owner, batch))
+
+        result = []
+        for repo_data in repos_data:
+            if repo_data is None:
+                continue
+            branches = OrderedDict()
+            refs = repo_data['refs']
+            while True:
+                for node in refs['nodes']:
+                    branches[node['name']] = (node.get('target') or {}).get('oid')
+                if not refs['pageInfo']['hasNextPage']:
+                    break
+                refs = self._repository_refs_page(owner, repo_data['name'], refs['pageInfo']['endCursor'])
+            default_branch = (repo_data.get('defaultBranchRef') or {}).get('name')
+            result.append(RepoRefs(name=repo_data['name'], default_branch=default_branch,
+                                   archived=repo_data['isArchived'], branches=branches))
+        return result
+
+    def viewer_forks(self) -> typing.List[ForkInfo]:
+        ''' Forks owned by the authenticated user, with the full name of their parent (None if it was deleted)
+        and their topics '''
+        query = 'query($cursor: String) { viewer { ' \
+                'repositories(first: 100, after: $cursor, isFork: true, ownerAffiliations: [OWNER]) { ' \
+                'pageInfo { hasNextPage endCursor } nodes { nameWithOwner parent { nameWithOwner } ' \
+                'repositoryTopics(first: 100) { nodes { topic { name } } } } } } }'
+        result = []
+        cursor = None
+        while True:
+            repositories = self.query(query, {'cursor': cursor})['viewer']['repositories']
+            result.extend(ForkInfo(full_name=node['nameWithOwner'],
+                                   parent=(node['parent'] or {}).get('nameWithOwner'),
+                                   topics=list(topic['topic']['name']
+                                               for topic in node['repositoryTopics']['nodes']))
+                          for node in repositories['nodes'])
+            if not repositories['pageInfo']['hasNextPage']:
+                return result
+            cursor = repositories['pageInfo']['endCursor']
+
+    def _owner_repositories_refs(self, owner: str) -> typing.List[typing.Dict[str, typing.Any]]:
+        query = 'query($owner: String!, $cursor: String) {{ repositoryOwner(login: $owner) {{ ' \
+                'repositories(first: 100, after: $cursor, orderBy: {{field: NAME, direction: ASC}}) {{ ' \
+                'pageInfo {{ hasNextPage endCursor }} nodes {{ {repo} }} }} }} }}'.format(repo=_REPO_REFS_FRAGMENT)
+        result = []
+        cursor = None
+        while True:
+            data = self.query(query, {'owner': owner, 'cursor': cursor})
+            if data.get('repositoryOwner') is None:
+                raise GraphQLError('Unknown owner "{}"'.format(owner))
+            repositories = data['repositoryOwner']['repositories']
+            result.extend(repositories['nodes'])
+            if not repositories['pageInfo']['hasNextPage']:
+                return result
+            cursor = repositories['pageInfo']['endCursor']
+
+    def _repositories_refs_batch(self, owner: str, names: typing.List[str]) -> \
+            typing.List[typing.Optional[typing.Dict[str, typing.Any]]]:
+        variables = {'owner': owner, }
+        declarations = ['$owner: String!', ]
+        repo_fragments = []
+        for repo_i, name in enumerate(names):
+            variables['n{}'.format(repo_i)] = name
+            declarations.append('$n{}: String!'.format(repo_i))
+            repo_fragments.append('r{i}: repository(owner: $owner, name: $n{i}) {{ {repo} }}'.format(
+                i=repo_i, repo=_REPO_REFS_FRAGMENT))
+        query = 'query({declarations}) {{ {repos} }}'.format(
+            declarations=', '.join(declarations),
+            repos=' '.join(repo_fragments),
+        )
+        data = self.query(query, variables)
+        return list(data.get('r{}'.format(repo_i)) for repo_i in range(len(names)))
+
+    def _repository_refs_page(self, owner: str, name: str, cursor: str) -> typing.Dict[str, typing.Any]:
+        query = 'query($owner: String!, $name: String!, $cursor: String) {{ ' \
+                'repository(owner: $owner, name: $name) {{ {refs} }} }}'.format(
+                    refs=_REFS_FRAGMENT.format(after=', after: $cursor'))
+        data = self.query(query, {'owner': owner, 'name': name, 'cursor': cursor})
+        return data['repository']['refs']
+
+    def _repositories_files_batch(self, owner: str, repo_branches: typing.List[typing.Tuple[str, typing.Optional[str]]],
+                                  paths: typing.Sequence[str]) -> typing.List[RepoFiles]:
+        variables = {'owner': owner, }
+        declarations = ['$owner: String!', ]
+        for path_i, path in enumerate(paths):
+            variables['p{}'.format(path_i)] = path
+            declarations.append('$p{}: String!'.format(path_i))
+        files_fragment = ' '.join('f{i}: file(path: $p{i}) {{ object {{ ... on Blob {{ oid text }} }} }}'.format(i=path_i)
+                                  for path_i in range(len(paths)))
+        commit_fragment = 'target {{ ... on Commit {{ oid {files} }} }}'.format(files=files_fragment)
+
+        repo_fragments = []
+        for repo_i, (name, branch) in enumerate(repo_branches):
+            variables['n{}'.format(repo_i)] = name
+            declarations.append('$n{}: String!'.format(repo_i))
+            if branch is None:
+                ref_fragment = 'ref: defaultBranchRef {{ name {commit} }}'.format(commit=commit_fragment)
+            else:
+                variables['b{}'.format(repo_i)] = 'refs/heads/{}'.format(branch)
+                declarations.append('$b{}: String!'.format(repo_i))
+                ref_fragment = 'ref(qualifiedName: $b{i}) {{ name {commit} }}'.format(i=repo_i, commit=commit_fragment)
+            repo_fragments.append('r{i}: repository(owner: $owner, name: $n{i}) {{ {ref} }}'.format(
+                i=repo_i, ref=ref_fragment))
+
+        query = 'query({declarations}) {{ {repos} }}'.format(
+            declarations=', '.join(declarations),
+            repos=' '.join(repo_fragments),
+        )
+        data = self.query(query, variables)
+
+        result = []
+        for repo_i, (name, branch) in enumerate(repo_branches):
+            repo_data = data.get('r{}'.format(repo_i)) or {}
+            ref = repo_data.get('ref') or {}
+            target = ref.get('target') or {}
+            files = dict()
+            blobs = dict()
+            for path_i, path in enumerate(paths):
+                tree_entry = target.get('f{}'.format(path_i)) or {}
+                blob = tree_entry.get('object') or {}
+                files[path] = blob.get('text')
+                blobs[path] = blob.get('oid')
+            result.append(RepoFiles(name=name, branch=ref.get('name', branch), commit=target.get('oid'),
+                                    files=files, blobs=blobs))
+        return result
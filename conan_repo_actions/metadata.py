@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple, OrderedDict
+import github
+import github.Consts
+import github.Repository
+import json
+from pathlib import Path
+import re
+import requests
+import sqlite3
+import threading
+import typing
+from .concurrency import map_concurrent
+from .ratelimit import RateLimitScheduler
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    etag TEXT NOT NULL,
+    next_url TEXT,
+    body TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS repos (
+    full_name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    name TEXT NOT NULL,
+    pushed_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS repos_owner ON repos (owner, name);
+CREATE TABLE IF NOT EXISTS branches (
+    full_name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    sha TEXT,
+    PRIMARY KEY (full_name, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS branches_watermarks (
+    full_name TEXT PRIMARY KEY,
+    pushed_at TEXT
+);
+CREATE TABLE IF NOT EXISTS parents (
+    full_name TEXT PRIMARY KEY,
+    parent_full_name TEXT NOT NULL
+);
+'''
+
+_LINK_NEXT_REGEX = re.compile(r'<(?P<url>[^>]+)>;\s*rel="next"')
+
+RefreshStats = namedtuple('RefreshStats', ('requests', 'not_modified', 'repos', 'branches_refreshed', ))
+
+
+class UnknownRepositoriesError(LookupError):
+    ''' Repositories that are not in the snapshot of their owner '''
+
+    def __init__(self, owner: str, names: typing.Sequence[str]):
+        super().__init__('Unknown repos of {} in the snapshot: {}'.format(owner, ', '.join(names)))
+        self.owner = owner
+        self.names = names
+
+
+class MetadataStore(object):
+    ''' Local snapshot of the metadata of repositories, backed by a sqlite database
+
+    It holds the repos of owners (as returned by the REST api: default branch, archived, topics, pushed_at, ...),
+    their branches with head commit, the parents of forks
+    and the ETag of every response, so a refresh can use conditional requests.
+    '''
+
+    def __init__(self, path: typing.Union[Path, str]):
+        if str(path) != ':memory:':
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> 'MetadataStore':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get_response(self, url: str) -> typing.Optional[typing.Tuple[str, typing.Optional[str], typing.Any]]:
+        ''' (etag, url of next page, decoded body) of a cached response '''
+        with self._lock:
+            row = self._db.execute('SELECT etag, next_url, body FROM responses WHERE url = ?', (url, )).fetchone()
+        if row is None:
+            return None
+        etag, next_url, body = row
+        return etag, next_url, json.loads(body)
+
+    def put_response(self, url: str, etag: str, next_url: typing.Optional[str], body: typing.Any) -> None:
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO responses (url, etag, next_url, body) VALUES (?, ?, ?, ?)',
+                             (url, etag, next_url, json.dumps(body), ))
+
+    def forget_responses(self) -> None:
+        ''' Drop the ETags and watermarks, so the next refresh fetches everything '''
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM responses')
+            self._db.execute('DELETE FROM branches_watermarks')
+
+    def put_owner_repos(self, owner: str, repos: typing.Iterable[typing.Mapping[str, typing.Any]]) -> None:
+        ''' Replace all repos of owner '''
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM repos WHERE owner = ?', (owner.lower(), ))
+            self._db.executemany(
+                'INSERT OR REPLACE INTO repos (full_name, owner, name, pushed_at, data) VALUES (?, ?, ?, ?, ?)',
+                ((repo['full_name'], owner.lower(), repo['name'], repo.get('pushed_at'), json.dumps(repo), )
+                 for repo in repos))
+
+    def repos(self, owner: str) -> typing.List[typing.Dict[str, typing.Any]]:
+        with self._lock:
+            rows = self._db.execute('SELECT data FROM repos WHERE owner = ? ORDER BY name', (owner.lower(), ))
+            return list(json.loads(row[0]) for row in rows)
+
+    def repo(self, full_name: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        with self._lock:
+            row = self._db.execute('SELECT data FROM repos WHERE full_name = ?', (full_name, )).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put_branches(self, full_name: str, branches: typing.Mapping[str, typing.Optional[str]],
+                     pushed_at: typing.Optional[str]) -> None:
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM branches WHERE full_name = ?', (full_name, ))
+            self._db.executemany('INSERT INTO branches (full_name, position, name, sha) VALUES (?, ?, ?, ?)',
+                                 ((full_name, position, name, sha, )
+                                  for position, (name, sha) in enumerate(branches.items())))
+            self._db.execute('INSERT OR REPLACE INTO branches_watermarks (full_name, pushed_at) VALUES (?, ?)',
+                             (full_name, pushed_at, ))
+
+    def branches(self, full_name: str) -> typing.Dict[str, typing.Optional[str]]:
+        ''' Mapping of branch name -> head commit '''
+        with self._lock:
+            rows = self._db.execute('SELECT name, sha FROM branches WHERE full_name = ? ORDER BY position',
+                                    (full_name, ))
+            return OrderedDict(rows.fetchall())
+
+    def branches_watermark(self, full_name: str) -> typing.Optional[str]:
+        ''' pushed_at of the repo when its branches were stored, or None if they never were '''
+        with self._lock:
+            row = self._db.execute('SELECT pushed_at FROM branches_watermarks WHERE full_name = ?',
+                                   (full_name, )).fetchone()
+        return None if row is None else row[0]
+
+    def has_branches(self, full_name: str) -> bool:
+        with self._lock:
+            return self._db.execute('SELECT 1 FROM branches_watermarks WHERE full_name = ?',
+                                    (full_name, )).fetchone() is not None
+
+    def put_parent(self, full_name: str, parent_full_name: str) -> None:
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO parents (full_name, parent_full_name) VALUES (?, ?)',
+                             (full_name, parent_full_name, ))
+
+    def parent(self, full_name: str) -> typing.Optional[str]:
+        with self._lock:
+            row = self._db.execute('SELECT parent_full_name FROM parents WHERE full_name = ?',
+                                   (full_name, )).fetchone()
+        return None if row is None else row[0]
+
+
+class MetadataRefresher(object):
+    ''' Refresh a MetadataStore from the github REST api
+
+    Every request is conditional (If-None-Match with the stored ETag): unchanged data costs a 304,
+    which does not count against the rate limit.
+    The branches of a repo are only requested again when its pushed_at differs from the one of the stored branches.
+    '''
+
+    def __init__(self, store: MetadataStore, token: typing.Optional[str], base_url: str=github.Consts.DEFAULT_BASE_URL,
+                 session: typing.Optional[requests.Session]=None,
+                 scheduler: typing.Optional[RateLimitScheduler]=None, jobs: int=1):
+        self._store = store
+        self._base_url = base_url.rstrip('/')
+        self._session = session or requests.Session()
+        self._session.headers['Accept'] = 'application/vnd.github.mercy-preview+json'
+        if token:
+            self._session.headers['Authorization'] = 'token {}'.format(token)
+        self._scheduler = scheduler
+        self._jobs = jobs
+        self._lock = threading.Lock()
+        self._nb_requests = 0
+        self._nb_not_modified = 0
+
+    def refresh_owner(self, owner: str, branches: bool=True, parents: bool=False, full: bool=False) -> RefreshStats:
+        '''
+        :param owner: login of the owner of the repos
+        :param branches: also refresh the branches of the repos
+        :param parents: also resolve the parent of the forks
+        :param full: ignore the stored ETags and watermarks
+        '''
+        if full:
+            self._store.forget_responses()
+        nb_requests, nb_not_modified = self._nb_requests, self._nb_not_modified
+
+        repos, modified = self._paginate('/users/{}/repos'.format(owner))
+        if modified:
+            self._store.put_owner_repos(owner, repos)
+
+        outdated = []
+        if branches:
+            outdated = list(repo for repo in repos if not self._store.has_branches(repo['full_name']) or
+                            self._store.branches_watermark(repo['full_name']) != repo.get('pushed_at'))
+            results = map_concurrent(lambda repo: self._paginate('/repos/{}/branches'.format(repo['full_name']))[0],
+                                     outdated, jobs=self._jobs)
+            for repo, repo_branches in zip(outdated, results):
+                self._store.put_branches(repo['full_name'],
+                                         OrderedDict((b['name'], b['commit']['sha'], ) for b in repo_branches),
+                                         repo.get('pushed_at'))
+
+        if parents:
+            self.refresh_parents(repo for repo in repos if repo.get('fork'))
+
+        return RefreshStats(requests=self._nb_requests - nb_requests,
+                            not_modified=self._nb_not_modified - nb_not_modified,
+                            repos=len(repos), branches_refreshed=len(outdated))
+
+    def refresh_parents(self, forks: typing.Iterable[typing.Mapping[str, typing.Any]]) -> None:
+        ''' Resolve the parents of forks that are not known yet. The parent of a fork never changes. '''
+        unknown = list(fork for fork in forks if self._store.parent(fork['full_name']) is None)
+        results = map_concurrent(lambda fork: self._get('/repos/{}'.format(fork['full_name']))[0], unknown,
+                                 jobs=self._jobs)
+        for fork, data in zip(unknown, results):
+            parent = data.get('parent')
+            if parent is not None:
+                self._store.put_parent(fork['full_name'], parent['full_name'])
+
+    def _paginate(self, path: str) -> typing.Tuple[typing.List[typing.Any], bool]:
+        ''' All items of a paginated resource, and whether any page was modified '''
+        result = []
+        modified = False
+        url = '{}{}?per_page=100'.format(self._base_url, path)
+        while url is not None:
+            (data, next_url), page_modified = self._get_page(url)
+            result.extend(data)
+            modified = modified or page_modified
+            url = next_url
+        return result, modified
+
+    def _get(self, path: str) -> typing.Tuple[typing.Any, bool]:
+        (data, _), modified = self._get_page(self._base_url + path)
+        return data, modified
+
+    def _get_page(self, url: str) -> typing.Tuple[typing.Tuple[typing.Any, typing.Optional[str]], bool]:
+        cached = self._store.get_response(url)
+        headers = {}
+        if cached is not None:
+            headers['If-None-Match'] = cached[0]
+
+        def get():
+            response = self._session.get(url, headers=headers)
+            return response.status_code, response.headers, response
+
+        if self._scheduler is None:
+            _, _, response = get()
+        else:
+            _, _, response = self._scheduler.call(get)
+        with self._lock:
+            self._nb_requests += 1
+            if response.status_code == 304:
+                self._nb_not_modified += 1
+        if response.status_code == 304 and cached is not None:
+            etag, next_url, body = cached
+            return (body, next_url), False
+        response.raise_for_status()
+        body = response.json()
+        match = _LINK_NEXT_REGEX.search(response.headers.get('Link', ''))
+        next_url = match['url'] if match else None
+        etag = response.headers.get('ETag')
+        if etag:
+            self._store.put_response(url, etag, next_url, body)
+        return (body, next_url), True
+
+
+def snapshot_repositories(g: github.Github, store: MetadataStore, owner: str,
+                          names: typing.Optional[typing.Iterable[str]]=None) -> \
+        typing.List[github.Repository.Repository]:
+    ''' PyGithub repositories of owner, created from the snapshot without any request
+
+    :param names: only these repos, in this order. Unknown names raise an UnknownRepositoriesError
+    '''
+    repos = store.repos(owner)
+    if names is not None:
+        names = list(names)
+        repos_by_name = dict((repo['name'].lower(), repo, ) for repo in repos)
+        unknown = list(name for name in names if name.lower() not in repos_by_name)
+        if unknown:
+            raise UnknownRepositoriesError(owner, unknown)
+        repos = list(repos_by_name[name.lower()] for name in names)
+    return list(g.create_from_raw_data(github.Repository.Repository, repo) for repo in repos)
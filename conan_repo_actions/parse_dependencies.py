@@ -4,30 +4,68 @@
 import argparse
 from pathlib import Path
 import yaml
-from .fetch_dependencies import ConanReference
+from .dependency_graph import DependencyGraph
+from .dependency_store import DependencyStore
 
 
 def main():
     parser = argparse.ArgumentParser(description='Fetch dependencies of repo')
-    parser.add_argument('inputs', type=Path, nargs=argparse.ONE_OR_MORE,
+    parser.add_argument('inputs', type=Path, nargs=argparse.ZERO_OR_MORE,
                         help='directories where the dependency information is stored')
+    parser.add_argument('--store', type=Path, default=None,
+                        help='sqlite database with the dependency information (inputs are imported into it)')
+    parser.add_argument('--export', type=Path, default=None,
+                        help='export the dependency information of the store to a directory')
+    query_group = parser.add_mutually_exclusive_group()
+    query_group.add_argument('--dependents', type=str, default=None,
+                             help='print the repos requiring a reference. Format: NAME[/VERSION[@USER[/CHANNEL]]] '
+                                  '(every part can be a glob)')
+    query_group.add_argument('--versions', type=str, default=None,
+                             help='print the referenced versions of a package')
+    query_group.add_argument('--bump', type=str, default=None,
+                             help='print the waves of packages to rebuild after a bump of a package')
+    query_group.add_argument('--levels', action='store_true',
+                             help='print the build levels of all packages')
+    query_group.add_argument('--cycles', action='store_true',
+                             help='print the dependency cycles')
 
     args = parser.parse_args()
 
-    all_packages = {}
+    if args.store is None and not args.inputs:
+        parser.error('need inputs or a store')
 
-    for input in args.inputs:
-        indir: Path = input
-        for f in indir.iterdir():
-            if f.suffix != '.yaml':
-                continue
-            data = yaml.safe_load(f.open())
-            for dependency in data['dependencies']:
-                ref = ConanReference.from_refstr(dependency)
-                all_packages.setdefault(ref.name, dict()).setdefault(ref.version, []).append(f.stem)
+    store = DependencyStore(args.store if args.store is not None else ':memory:')
+    with store:
+        for input in args.inputs:
+            store.import_yaml(input)
 
-    s = yaml.safe_dump(all_packages)
-    print(s)
+        if args.export is not None:
+            store.export_yaml(args.export)
+
+        if args.dependents is not None:
+            for name in store.dependents(args.dependents):
+                print(name)
+        elif args.versions is not None:
+            for version in store.versions(args.versions):
+                print(version)
+        elif args.bump is not None or args.levels or args.cycles:
+            graph = DependencyGraph.from_records(store.records())
+            if args.bump is not None:
+                if args.bump not in graph:
+                    parser.error('unknown package: {}'.format(args.bump))
+                waves = graph.bump_waves(args.bump)
+                print(yaml.safe_dump({
+                    'waves': waves,
+                    'critical_path_length': len(waves) - 1,
+                    'dependents': graph.transitive_dependents(args.bump),
+                }))
+            elif args.levels:
+                print(yaml.safe_dump(graph.levels()))
+            else:
+                print(yaml.safe_dump(graph.cycles()))
+        else:
+            s = yaml.safe_dump(store.packages())
+            print(s)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple
+import github.Repository
+import threading
+import typing
+
+RepoPermissions = namedtuple('RepoPermissions', ('admin', 'push', 'pull', ))
+
+NO_PERMISSIONS = RepoPermissions(admin=False, push=False, pull=False)
+
+
+def permissions_from_data(data: typing.Optional[typing.Mapping[str, bool]]) -> RepoPermissions:
+    ''' Permissions from the "permissions" field of a repository of the REST api '''
+    data = data or {}
+    return RepoPermissions(admin=bool(data.get('admin')), push=bool(data.get('push')), pull=bool(data.get('pull')))
+
+
+class PermissionCache(object):
+    ''' Permissions of the authenticated user on repositories, keyed by full name
+
+    The repository listings of the REST api already contain the permissions of the authenticated user,
+    so registering the listed repos avoids one collaborator request per repo.
+    '''
+
+    def __init__(self):
+        self._permissions = dict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, full_name: str) -> bool:
+        with self._lock:
+            return full_name.lower() in self._permissions
+
+    def put(self, full_name: str, permissions: RepoPermissions) -> None:
+        with self._lock:
+            self._permissions[full_name.lower()] = permissions
+
+    def add_repos(self, repos: typing.Iterable['github.Repository.Repository']) -> None:
+        for repo in repos:
+            self.get(repo)
+
+    def add_repos_data(self, repos: typing.Iterable[typing.Mapping[str, typing.Any]]) -> None:
+        ''' Register repos of the REST api as json data (e.g. of the async client) '''
+        for repo in repos:
+            self.put(repo['full_name'], permissions_from_data(repo.get('permissions')))
+
+    def get(self, repo: 'github.Repository.Repository') -> RepoPermissions:
+        key = repo.full_name.lower()
+        with self._lock:
+            permissions = self._permissions.get(key)
+        if permissions is None:
+            data = repo.permissions
+            permissions = NO_PERMISSIONS if data is None else \
+                RepoPermissions(admin=bool(data.admin), push=bool(data.push), pull=bool(data.pull))
+            with self._lock:
+                self._permissions[key] = permissions
+        return permissions
+
+    def get_by_name(self, full_name: str) -> typing.Optional[RepoPermissions]:
+        with self._lock:
+            return self._permissions.get(full_name.lower())
+
+    def is_admin(self, repo: 'github.Repository.Repository') -> bool:
+        return self.get(repo).admin
+
+    def can_push(self, repo: 'github.Repository.Repository') -> bool:
+        return self.get(repo).push
+
+
+_shared_permission_cache = PermissionCache()
+
+
+def shared_permission_cache() -> PermissionCache:
+    ''' Permission cache shared by all actions of this process '''
+    return _shared_permission_cache
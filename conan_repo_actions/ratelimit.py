@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import github
+import sys
+import threading
+import time
+import typing
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_MAX_RETRIES = 5
+MAX_BACKOFF = 60.
+
+RATE_LIMIT_STATUSES = (403, 429, )
+
+Response = typing.Tuple[int, typing.Mapping[str, str], typing.Any]
+
+
+def _header(headers: typing.Mapping[str, str], name: str) -> typing.Optional[str]:
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _header_float(headers: typing.Mapping[str, str], name: str) -> typing.Optional[float]:
+    value = _header(headers, name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _body_text(body: typing.Any) -> str:
+    # The body is decoded data, text, or a response object of requests (which has the text as attribute)
+    text = getattr(body, 'text', body)
+    return text if isinstance(text, str) else str(text)
+
+
+class RateLimitScheduler(object):
+    ''' Schedule requests to the github api within its rate limit
+
+    Requests are paced by a token bucket whose fill rate is the remaining quota spread over the time until its reset,
+    as reported by the X-RateLimit-Remaining and X-RateLimit-Reset headers.
+    The number of concurrent requests grows additively on success and is halved when rate limited.
+    Rate limited requests are retried after Retry-After, after the reset of an exhausted quota,
+    or else with exponential backoff.
+
+    One scheduler can be shared by threads (call) and by asyncio tasks (call_async).
+    Requests waiting for a free slot are woken when a request finishes, instead of polling.
+    '''
+
+    def __init__(self, max_concurrency: int=DEFAULT_MAX_CONCURRENCY, max_retries: int=DEFAULT_MAX_RETRIES,
+                 clock: typing.Callable[[], float]=time.time, verbose: bool=True):
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._async_waiters = []
+        self._clock = clock
+        self._max_concurrency = max_concurrency
+        self._max_retries = max_retries
+        self._verbose = verbose
+
+        self._concurrency = float(min(4, max_concurrency))
+        self._in_flight = 0
+        self._tokens = float(max_concurrency)
+        self._rate = None
+        self._reset = None
+        self._last_refill = clock()
+        self._blocked_until = 0.
+        self._failures = 0
+
+    @property
+    def concurrency(self) -> int:
+        return int(self._concurrency)
+
+    @property
+    def rate(self) -> typing.Optional[float]:
+        ''' Allowed requests per second, or None when no rate limit headers have been seen yet '''
+        return self._rate
+
+    def call(self, fn: typing.Callable[[], Response]) -> Response:
+        ''' Call fn, which does one request and returns (status, headers, body), within the rate limit '''
+        attempt = 0
+        while True:
+            self._acquire()
+            try:
+                response = fn()
+            except BaseException:
+                self.cancel()
+                raise
+            retry_delay = self.release(*response)
+            if retry_delay is None or attempt >= self._max_retries:
+                return response
+            attempt += 1
+            self._report_retry(retry_delay, attempt)
+
+    async def call_async(self, fn: typing.Callable[[], typing.Awaitable[Response]]) -> Response:
+        ''' Asynchronous variant of call: fn returns an awaitable of (status, headers, body) '''
+        attempt = 0
+        while True:
+            await self._acquire_async()
+            try:
+                response = await fn()
+            except BaseException:
+                self.cancel()
+                raise
+            retry_delay = self.release(*response)
+            if retry_delay is None or attempt >= self._max_retries:
+                return response
+            attempt += 1
+            self._report_retry(retry_delay, attempt)
+
+    def try_acquire(self) -> float:
+        ''' Start a request. Returns 0 when it may start now, else the number of seconds to wait before retrying
+
+        When all slots are in use, the wait is cut short by the end of a request (see call and call_async).
+        '''
+        with self._lock:
+            return self._try_acquire_locked()
+
+    def _try_acquire_locked(self) -> float:
+        now = self._clock()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        self._refill(now)
+        if self._tokens < 1:
+            if not self._rate:
+                return self._reset - now
+            return (1 - self._tokens) / self._rate
+        if self._in_flight >= int(self._concurrency):
+            # Only the end of a request frees a slot: the waiters are notified by _finish_locked
+            return MAX_BACKOFF
+        self._tokens -= 1
+        self._in_flight += 1
+        return 0.
+
+    def _acquire(self) -> None:
+        with self._finished:
+            while True:
+                delay = self._try_acquire_locked()
+                if delay <= 0:
+                    return
+                self._finished.wait(delay)
+
+    async def _acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                delay = self._try_acquire_locked()
+                if delay <= 0:
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter, ))
+            try:
+                await asyncio.wait((waiter, ), timeout=delay)
+            finally:
+                with self._lock:
+                    if (loop, waiter, ) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter, ))
+
+    def _finish_locked(self) -> None:
+        self._in_flight -= 1
+        self._finished.notify_all()
+        for loop, waiter in self._async_waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+        self._async_waiters = []
+
+    def cancel(self) -> None:
+        ''' Finish a request that did not get a response '''
+        with self._lock:
+            self._finish_locked()
+
+    def release(self, status: int, headers: typing.Mapping[str, str], body: typing.Any=None) -> \
+            typing.Optional[float]:
+        ''' Finish a request. Returns the number of seconds to wait before retrying it, or None if it succeeded '''
+        with self._lock:
+            now = self._clock()
+            self._finish_locked()
+
+            remaining = _header_float(headers, 'x-ratelimit-remaining')
+            reset = _header_float(headers, 'x-ratelimit-reset')
+            retry_after = _header_float(headers, 'retry-after')
+
+            if remaining is not None and reset is not None:
+                self._refill(now)
+                self._rate = max(remaining, 0.) / max(reset - now, 1.)
+                self._reset = reset
+                self._tokens = min(self._tokens, max(remaining, 0.))
+                if remaining <= 0:
+                    self._blocked_until = max(self._blocked_until, reset + 1)
+
+            rate_limited = status == 429 or (status in RATE_LIMIT_STATUSES and (
+                retry_after is not None or remaining == 0 or 'rate limit' in _body_text(body).lower()))
+            if not rate_limited:
+                self._concurrency = min(float(self._max_concurrency), self._concurrency + 1 / self._concurrency)
+                self._failures = 0
+                return None
+
+            self._concurrency = max(1., self._concurrency / 2)
+            self._failures += 1
+            if retry_after is not None:
+                delay = retry_after
+            elif remaining == 0 and reset is not None:
+                delay = reset + 1 - now
+            else:
+                delay = min(MAX_BACKOFF, 2. ** self._failures)
+            delay = max(delay, 0.)
+            self._blocked_until = max(self._blocked_until, now + delay)
+            return delay
+
+    def _refill(self, now: float) -> None:
+        if self._reset is not None and now >= self._reset:
+            # The quota has been reset: its new state is only known after the next response
+            self._rate = None
+            self._reset = None
+        if self._rate is None:
+            self._tokens = float(self._max_concurrency)
+        else:
+            self._tokens = min(float(self._max_concurrency), self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+
+    def _report_retry(self, delay: float, attempt: int) -> None:
+        if self._verbose:
+            print('Rate limited by github: retry {}/{} in {:.0f}s'.format(attempt, self._max_retries, delay),
+                  file=sys.stderr)
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+_shared_schedulers = dict()
+_shared_schedulers_lock = threading.Lock()
+
+
+def shared_scheduler(resource: str='core') -> RateLimitScheduler:
+    ''' Scheduler shared by all clients of this process that use the quota of resource (core or graphql) '''
+    with _shared_schedulers_lock:
+        try:
+            return _shared_schedulers[resource]
+        except KeyError:
+            scheduler = RateLimitScheduler()
+            _shared_schedulers[resource] = scheduler
+            return scheduler
+
+
+def install_scheduler(g: 'github.Github', scheduler: RateLimitScheduler) -> 'github.Github':
+    ''' Route all requests of a PyGithub object through scheduler '''
+    # The requests are intercepted at a private method of PyGithub: refuse to run unscheduled if it changed
+    requester = getattr(g, '_Github__requester', None)
+    request_raw = getattr(requester, '_Requester__requestRaw', None)
+    if request_raw is None:
+        raise RuntimeError('Cannot schedule the requests of this version of PyGithub: '
+                           'Requester.__requestRaw not found')
+    local = threading.local()
+
+    def scheduled_request_raw(*args, **kwargs):
+        # PyGithub calls itself recursively (e.g. after a 202): do not acquire a second slot
+        if getattr(local, 'active', False):
+            return request_raw(*args, **kwargs)
+        local.active = True
+        try:
+            return scheduler.call(lambda: request_raw(*args, **kwargs))
+        finally:
+            local.active = False
+
+    requester._Requester__requestRaw = scheduled_request_raw
+    return g
@@ -1,20 +1,33 @@
 # -*- coding: utf-8 -*-
 
 from . import __name__
+from .cache import BlobCache, DEFAULT_CACHE_MAX_SIZE
+from .git_mirror import GitMirrorCache
+from .github_graphql import GithubGraphQL
+from .metadata import MetadataRefresher, MetadataStore
+from .ratelimit import install_scheduler, shared_scheduler
+import argparse
 import contextlib
 import github
 import itertools
 import os
 from pathlib import Path
+import requests
 import shutil
 import sys
 import subprocess
 import tempfile
+import time
 import typing
 import yaml
 
+if typing.TYPE_CHECKING:
+    from .github_async import AsyncGithub
+
 GithubUser = typing.Union['github.AuthenticatedUser.AuthenticatedUser', 'github.NamedUser.NamedUser', ]
 
+R = typing.TypeVar('R')
+
 
 def input_ask_question_yn(question: str, default: typing.Optional[bool]=None) -> typing.Optional[bool]:
     y = 'y'
@@ -127,6 +140,42 @@ def chargv(new_argv: typing.List[str]):
         sys.argv = old_argv
 
 
+def argparse_add_jobs_option(parser: argparse.ArgumentParser):
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='number of concurrent requests to github (default=1)')
+
+
+def argparse_add_snapshot_options(parser: argparse.ArgumentParser):
+    parser.add_argument('--snapshot', action='store_true',
+                        help='read the repos and branches from the local metadata snapshot (refreshed incrementally)')
+    parser.add_argument('--refresh', action='store_true',
+                        help='refresh the local metadata snapshot completely (implies --snapshot)')
+
+
+def github_error_is_transient(e: Exception) -> bool:
+    ''' Server errors and network failures are worth a retry.
+    Client errors (e.g. 404, 422) and programming errors are not. '''
+    if isinstance(e, github.GithubException):
+        return e.status >= 500
+    return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, ))
+
+
+def retry_call(fn: typing.Callable[[], R], attempts: int=3, delay: float=1.,
+               retry_on: typing.Callable[[Exception], bool]=github_error_is_transient) -> R:
+    ''' Call fn, retrying with exponential backoff when it raises an exception accepted by retry_on
+
+    :param attempts: maximum number of calls
+    :param delay: seconds to wait before the first retry, doubled at every retry
+    '''
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt + 1 >= attempts or not retry_on(e):
+                raise
+        time.sleep(delay * 2 ** attempt)
+
+
 class Configuration(object):
     __CWD = Path()
 
@@ -134,11 +183,13 @@ class Configuration(object):
                  github_token: typing.Optional[str]=None,
                  travisci_com_token: typing.Optional[str]=None,
                  git_wd: typing.Optional[Path]=None,
+                 cache_max_size: typing.Optional[int]=None,
                  ):
         c = self.load_config()
         self._github_token = github_token or self._get_github_login_data(c)
         self._travisci_com_token = travisci_com_token or self._get_travisci_login_data(c)
         self._git_wd = git_wd or self._get_git_working_directories(c)
+        self._cache_max_size = cache_max_size or self._get_cache_max_size(c)
 
     @classmethod
     def default_config_folder(cls) -> Path:
@@ -175,7 +226,17 @@ class Configuration(object):
 
     def get_github(self) -> github.Github:
         t = self.github_token
-        return github.Github(t)
+        return install_scheduler(github.Github(t), shared_scheduler('core'))
+
+    def get_github_graphql(self) -> GithubGraphQL:
+        return GithubGraphQL(self.github_token, scheduler=shared_scheduler('graphql'))
+
+    def get_github_async(self, limit: typing.Optional[int]=None) -> 'AsyncGithub':
+        # aiohttp is only loaded by the commands that use the asyncio client
+        from .github_async import AsyncGithub, DEFAULT_CONNECTION_LIMIT
+        if limit is None:
+            limit = DEFAULT_CONNECTION_LIMIT
+        return AsyncGithub(self.github_token, limit=limit, scheduler=shared_scheduler('core'))
 
     @classmethod
     def _get_github_login_data(cls, c) -> typing.Tuple[typing.Optional[str], typing.Optional[str]]:
@@ -254,3 +315,46 @@ class Configuration(object):
     @property
     def git_wd(self) -> typing.Optional[Path]:
         return self._git_wd
+
+    @classmethod
+    def _get_cache_max_size(cls, c) -> int:
+        def _from_env() -> typing.Optional[int]:
+            size = os.environ.get('CONAN_REPO_ACTIONS_CACHE_MAX_SIZE', '').strip()
+            if not size:
+                return None
+            return int(size)
+
+        def _from_config() -> typing.Optional[int]:
+            try:
+                return int(c['cache']['max_size'])
+            except KeyError:
+                return None
+        return _from_env() or _from_config() or DEFAULT_CACHE_MAX_SIZE
+
+    @property
+    def cache_max_size(self) -> int:
+        return self._cache_max_size
+
+    @property
+    def cache_folder(self) -> Path:
+        return self.default_config_folder() / 'cache'
+
+    def get_blob_cache(self) -> BlobCache:
+        return BlobCache(path=self.cache_folder, max_size=self.cache_max_size)
+
+    @property
+    def git_mirrors_folder(self) -> Path:
+        return self.git_wd / '.mirrors'
+
+    def get_git_mirror_cache(self) -> GitMirrorCache:
+        return GitMirrorCache(path=self.git_mirrors_folder)
+
+    @property
+    def metadata_path(self) -> Path:
+        return self.default_config_folder() / 'metadata.sqlite'
+
+    def get_metadata_store(self) -> MetadataStore:
+        return MetadataStore(self.metadata_path)
+
+    def get_metadata_refresher(self, store: MetadataStore, jobs: int=1) -> MetadataRefresher:
+        return MetadataRefresher(store, self.github_token, scheduler=shared_scheduler('core'), jobs=jobs)
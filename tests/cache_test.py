@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import os
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+
+from conan_repo_actions.cache import BlobCache
+
+
+class BlobCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmpdir.name)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_blob_roundtrip(self):
+        cache = BlobCache(self.path)
+        self.assertIsNone(cache.get_blob('abcdef'))
+        cache.put_blob('abcdef', b'class Conan(ConanFile): pass')
+        self.assertEqual(cache.get_blob('abcdef'), b'class Conan(ConanFile): pass')
+        self.assertEqual(BlobCache(self.path).get_blob('abcdef'), b'class Conan(ConanFile): pass')
+
+    def test_commit_files_negative(self):
+        cache = BlobCache(self.path)
+        self.assertIsNone(cache.get_commit_files('1234'))
+        cache.put_commit_files('1234', {'conanfile.py': 'abcdef', 'conanfile_base.py': None})
+        files = BlobCache(self.path).get_commit_files('1234')
+        self.assertEqual(files, {'conanfile.py': 'abcdef', 'conanfile_base.py': None})
+
+    def test_lru_eviction(self):
+        cache = BlobCache(self.path, max_size=25)
+        cache.put_blob('aa01', b'0123456789')
+        cache.put_blob('aa02', b'0123456789')
+        os.utime(str(self.path / 'blobs' / 'aa' / 'aa01'), (1, 1))
+        os.utime(str(self.path / 'blobs' / 'aa' / 'aa02'), (2, 2))
+        self.assertIsNotNone(cache.get_blob('aa01'))
+        cache.put_blob('aa03', b'0123456789')
+        self.assertIsNotNone(cache.get_blob('aa01'))
+        self.assertIsNone(cache.get_blob('aa02'))
+        self.assertIsNotNone(cache.get_blob('aa03'))
+        self.assertLessEqual(cache.size(), 25)
+
+    def test_eviction_to_low_watermark(self):
+        cache = BlobCache(self.path, max_size=100)
+        for i in range(10):
+            cache.put_blob('aa{:02d}'.format(i), b'0123456789')
+            os.utime(str(self.path / 'blobs' / 'aa' / 'aa{:02d}'.format(i)), (i, i))
+        cache.put_blob('aa10', b'0123456789')
+        self.assertLessEqual(cache.size(), 90)
+        # The next writes fit below max_size again: no scan of the cache directory
+        with mock.patch.object(cache, '_entries', side_effect=AssertionError('scanned')):
+            cache.put_blob('aa11', b'0123456789')
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+import copy
+import pickle
+import unittest
+
+from conan_repo_actions.conan_reference import ConanReference
+
+
+class ConanReferenceTests(unittest.TestCase):
+    def test_reference(self):
+        ref = ConanReference.from_refstr('boost/1.70.0@bincrafters/stable')
+        self.assertEqual(ref.name, 'boost')
+        self.assertEqual(ref.version, '1.70.0')
+        self.assertEqual(ref.user, 'bincrafters')
+        self.assertEqual(ref.channel, 'stable')
+        self.assertEqual(ref.reference, 'boost/1.70.0@bincrafters/stable')
+        self.assertIs(ref.reference, ref.reference)
+
+    def test_hashable(self):
+        a = ConanReference('zlib', '1.2.11', 'conan', 'stable')
+        b = ConanReference.from_refstr('"zlib/1.2.11@conan/stable"')
+        c = ConanReference('zlib', '1.2.11', 'conan', 'testing')
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+        self.assertEqual(len({a, b, c}), 2)
+        self.assertLess(a, c)
+        self.assertNotEqual(a, 'zlib/1.2.11@conan/stable')
+
+    def test_immutable(self):
+        ref = ConanReference('zlib', '1.2.11', 'conan', 'stable')
+        with self.assertRaises(AttributeError):
+            ref.version = '1.2.12'
+        with self.assertRaises(AttributeError):
+            ref.extra = 1
+        self.assertEqual(copy.copy(ref), ref)
+        self.assertEqual(pickle.loads(pickle.dumps(ref)), ref)
+
+    def test_interned(self):
+        a = ConanReference(''.join(['zl', 'ib']), '1.2.11', ''.join(['con', 'an']), 'stable')
+        b = ConanReference(''.join(['z', 'lib']), '1.2.8', ''.join(['co', 'nan']), 'stable')
+        self.assertIs(a.name, b.name)
+        self.assertIs(a.user, b.user)
+
+    def test_from_conanfile(self):
+        text = 'requires = ("zlib/1.2.11@conan/stable", "bzip2/1.0.6@conan/stable")\n' \
+               'build_requires = "cmake_installer/3.14.5@conan/stable"\n'
+        refs = ConanReference.iter_from_conanfile(text)
+        self.assertEqual(next(refs).reference, 'zlib/1.2.11@conan/stable')
+        self.assertEqual([r.name for r in refs], ['bzip2', 'cmake_installer'])
+        self.assertEqual([r.name for r in ConanReference.from_conanfile(text)], ['zlib', 'bzip2', 'cmake_installer'])
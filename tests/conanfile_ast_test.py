@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+
+from conan_repo_actions.cache import BlobCache
+from conan_repo_actions.conanfile_ast import ConanfileAstExtractor, conanfile_ast_info
+
+CONANFILE = '''
+from conans import ConanFile
+
+ZLIB_VERSION = "1.2.11"
+
+
+class LibpngConan(ConanFile):
+    name = "libpng"
+    version = "1.6.37"
+    # Formerly required "bzip2/1.0.6@conan/stable"
+    requires = ("zlib/%s@conan/stable" % ZLIB_VERSION, ("gtest/1.8.1@bincrafters/stable", "private"), )
+    build_requires = "cmake_installer/3.14.5@conan/stable"
+    _openssl_version = "1.1.1b"
+
+    def requirements(self):
+        if self.options.with_ssl:
+            self.requires("openssl/{}@conan/stable".format(self._openssl_version))
+        channel = "stable"
+        self.requires.add(f"libiconv/1.15@bincrafters/{channel}")
+        self.requires(self.unknown_attribute)
+
+    def build_requirements(self):
+        self.build_requires("nasm/2.13.01@conan/stable")
+
+    def package_info(self):
+        self.cpp_info.libs = ["png"]
+        self.output.info("version = '0.0.1'")
+'''
+
+CONANFILE_BASE = '''
+from conans import ConanFile
+
+
+class ConanFileBase(ConanFile):
+    _base_name = "freetype"
+    name = _base_name
+    version = "2.10.0"
+    requires = "libpng/1.6.37@bincrafters/stable"
+
+
+class ConanFileDefault(ConanFileBase):
+    requires = ConanFileBase.requires
+
+    def requirements(self):
+        self.requires("bzip2/1.0.6@conan/{}".format("stable"))
+'''
+
+
+class ConanfileAstTests(unittest.TestCase):
+    def test_info(self):
+        info = conanfile_ast_info(CONANFILE)
+        self.assertEqual(info.name, 'libpng')
+        self.assertEqual(info.version, '1.6.37')
+        self.assertEqual(info.requires, ['zlib/1.2.11@conan/stable', 'gtest/1.8.1@bincrafters/stable',
+                                         'openssl/1.1.1b@conan/stable', 'libiconv/1.15@bincrafters/stable'])
+        self.assertEqual(info.build_requires, ['cmake_installer/3.14.5@conan/stable', 'nasm/2.13.01@conan/stable'])
+
+    def test_inheritance(self):
+        info = conanfile_ast_info(CONANFILE_BASE)
+        self.assertEqual(info.name, 'freetype')
+        self.assertEqual(info.version, '2.10.0')
+        self.assertEqual(info.requires, ['libpng/1.6.37@bincrafters/stable', 'bzip2/1.0.6@conan/stable'])
+
+    def test_invalid(self):
+        info = conanfile_ast_info('class A(:\n')
+        self.assertEqual(info.requires, [])
+        self.assertIsNone(info.version)
+
+    def test_dependencies(self):
+        extractor = ConanfileAstExtractor()
+        deps, version = extractor.dependencies([('a', CONANFILE), (None, 'version = "9.9"\n')])
+        self.assertEqual(version, '1.6.37')
+        self.assertEqual(len(deps), 6)
+        self.assertNotIn('bzip2', [d.name for d in deps])
+
+    def test_memoized(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = BlobCache(Path(tmpdir))
+            with mock.patch('conan_repo_actions.conanfile_ast.conanfile_ast_info', wraps=conanfile_ast_info) as info_fn:
+                extractor = ConanfileAstExtractor(cache=cache)
+                first = extractor.info(CONANFILE, blob_sha='abc123')
+                self.assertEqual(extractor.info(CONANFILE, blob_sha='abc123'), first)
+                self.assertEqual(info_fn.call_count, 1)
+
+                self.assertEqual(ConanfileAstExtractor(cache=cache).info(CONANFILE, blob_sha='abc123'), first)
+                self.assertEqual(info_fn.call_count, 1)
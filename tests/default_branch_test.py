@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+
+import contextlib
+import datetime
+import github
+import io
+from pathlib import Path
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from packaging.version import Version
+
+from conan_repo_actions.cache import BlobCache
+from conan_repo_actions.default_branch import DefaultBranchAction, DefaultBranchAuditCache, check_default_branch, \
+    default_branch_fingerprint, ConanRepo, WhichBranch, policy_default_branch
+from conan_repo_actions.github_graphql import RepoRefs
+
+
+class FakeBranch(object):
+    def __init__(self, name: str):
+        self.name = name
+
+
+class FakeRepo(object):
+    def __init__(self, full_name: str, default_branch: str, branches, barrier: threading.Barrier=None,
+                 pushed_at: datetime.datetime=None):
+        self.full_name = full_name
+        self.name = full_name.split('/')[1]
+        self.default_branch = default_branch
+        self.archived = False
+        self.pushed_at = pushed_at
+        self._branches = branches
+        self._barrier = barrier
+        self.edits = []
+        self.failures = 0
+        self.nb_get_branches = 0
+
+    def get_branches(self):
+        self.nb_get_branches += 1
+        if self._barrier is not None:
+            self._barrier.wait(timeout=5)
+        return list(FakeBranch(b) for b in self._branches)
+
+    @property
+    def permissions(self):
+        return mock.Mock(admin=True, push=True, pull=True)
+
+    def edit(self, **kwargs):
+        self.edits.append(kwargs)
+        if self.failures:
+            self.failures -= 1
+            raise github.GithubException(502, {'message': 'Bad Gateway'}, None)
+
+
+class DefaultBranchTests(unittest.TestCase):
+    def test_check(self):
+        repo = ConanRepo.from_branch_names(['stable/1.2.11', 'testing/1.2.11', 'testing/1.2.12', 'stable/1.2.12'],
+                                           'stable/1.2.11')
+        check = check_default_branch('bincrafters/conan-zlib', archived=False, repo=repo)
+        self.assertIn('default channel is not testing', check.messages)
+        self.assertEqual('testing/1.2.12', check.suggestions[0].name)
+
+        repo = ConanRepo.from_branch_names(['stable/1.2.12', 'testing/1.2.12'], 'testing/1.2.12')
+        self.assertEqual([], check_default_branch('bincrafters/conan-zlib', archived=False, repo=repo).messages)
+
+    def test_suggested_branches(self):
+        repo = ConanRepo.from_branch_names(['stable/1.2', 'feature/2.0', 'testing/1.2', 'stable/r2019a', 'release/1.2',
+                                            'stable/2.0', 'master', 'testing/2.0rc1'], 'stable/1.2')
+        self.assertEqual(['stable/r2019a', 'stable/2.0', 'feature/2.0', 'testing/2.0rc1', 'testing/1.2', 'stable/1.2',
+                          'release/1.2', ], list(b.name for b in repo.suggested_branches))
+        self.assertEqual('2019.1', str(repo.most_recent_version()))
+        other_repo = ConanRepo.from_branch_names(['stable/1.2'], 'stable/1.2')
+        self.assertIs(repo.default_branch.version, other_repo.default_branch.version)
+
+    def test_policy(self):
+        def policy(branches, default):
+            repo = ConanRepo.from_branch_names(branches, default)
+            return policy_default_branch(check_default_branch('bincrafters/conan-zlib', archived=False, repo=repo))
+
+        self.assertEqual('testing/1.3', policy(['stable/1.2', 'testing/1.2', 'stable/1.3', 'testing/1.3',
+                                                'testing/2.0rc1'], 'stable/1.2'))
+        self.assertEqual('stable/1.3', policy(['stable/1.2', 'testing/1.2', 'stable/1.3'], 'testing/1.2'))
+        self.assertIsNone(policy(['stable/1.3', 'testing/1.3'], 'testing/1.3'))
+        self.assertIsNone(policy(['master', 'develop'], 'master'))
+        self.assertEqual('testing/1.0', policy(['master', 'stable/1.0', 'testing/1.0'], 'master'))
+
+    def test_policy_concurrent_with_retries(self):
+        repos = list(FakeRepo('bincrafters/conan-{}'.format(name), 'stable/1.0', ['stable/1.0', 'testing/1.0'])
+                     for name in ('a', 'b', 'c'))
+        repos.append(FakeRepo('bincrafters/conan-d', 'testing/1.0', ['stable/1.0', 'testing/1.0']))
+        repos[0].failures = 1
+        repos[1].failures = 5
+        action = DefaultBranchAction(user=mock.Mock(login='me'), repos=repos, policy=True, jobs=4, retries=3)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(io.StringIO()), \
+                mock.patch('conan_repo_actions.util.time.sleep') as sleep, \
+                mock.patch('conan_repo_actions.default_branch.input_ask_question_yn') as yn:
+            action.action()
+        yn.assert_not_called()
+        self.assertEqual(3, sleep.call_count)
+        self.assertEqual(2, len(repos[0].edits))
+        self.assertEqual(3, len(repos[1].edits))
+        self.assertEqual([{'default_branch': 'testing/1.0'}], repos[2].edits)
+        self.assertEqual([], repos[3].edits)
+        self.assertIn('2 default branches changed, 1 failed', output.getvalue())
+
+    def test_policy_dry_run(self):
+        repo = FakeRepo('bincrafters/conan-a', 'stable/1.0', ['stable/1.0', 'testing/1.0'])
+        action = DefaultBranchAction(user=mock.Mock(login='me'), repos=[repo], policy=True, dry_run=True)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            action.action()
+        self.assertEqual([], repo.edits)
+        self.assertIn('- bincrafters/conan-a: "stable/1.0" -> "testing/1.0"', output.getvalue())
+
+    def test_audit_cache_replays_unchanged_repos(self):
+        self.assertEqual(default_branch_fingerprint(['stable/1.0', 'testing/1.0'], 'stable/1.0'),
+                         default_branch_fingerprint(['testing/1.0', 'stable/1.0'], 'stable/1.0'))
+        self.assertNotEqual(default_branch_fingerprint(['stable/1.0', 'testing/1.0'], 'stable/1.0'),
+                            default_branch_fingerprint(['stable/1.0', 'testing/1.0'], 'testing/1.0'))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            def run(repos):
+                audit_cache = DefaultBranchAuditCache(BlobCache(Path(tmpdir)))
+                action = DefaultBranchAction(user=mock.Mock(login='me'), repos=repos, policy=True, dry_run=True,
+                                             audit_cache=audit_cache)
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    action.action()
+                return audit_cache, output.getvalue()
+
+            repos = [FakeRepo('bincrafters/conan-a', 'stable/1.0', ['stable/1.0', 'testing/1.0']),
+                     FakeRepo('bincrafters/conan-b', 'testing/1.0', ['stable/1.0', 'testing/1.0', 'master'])]
+            audit_cache, first_output = run(repos)
+            self.assertEqual((2, 0), (audit_cache.evaluated, audit_cache.replayed))
+
+            audit_cache, second_output = run(repos)
+            self.assertEqual((0, 2), (audit_cache.evaluated, audit_cache.replayed))
+            self.assertEqual(first_output.splitlines()[1:], second_output.splitlines()[1:])
+            self.assertIn('- bincrafters/conan-a: "stable/1.0" -> "testing/1.0"', second_output)
+
+            repos[1] = FakeRepo('bincrafters/conan-b', 'testing/1.0', ['stable/1.0', 'testing/1.0', 'testing/1.1'])
+            audit_cache, third_output = run(repos)
+            self.assertEqual((1, 1), (audit_cache.evaluated, audit_cache.replayed))
+            self.assertIn('- bincrafters/conan-b: "testing/1.0" -> "testing/1.1"', third_output)
+
+    def test_audit_cache_replays_listing_without_branches(self):
+        pushed_at = datetime.datetime(2019, 8, 1, 12, 0, tzinfo=datetime.timezone.utc)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            def run(repo, trust_pushed_at=True):
+                audit_cache = DefaultBranchAuditCache(BlobCache(Path(tmpdir)), trust_pushed_at=trust_pushed_at)
+                action = DefaultBranchAction(user=mock.Mock(login='me'), repos=[repo], policy=True, dry_run=True,
+                                             audit_cache=audit_cache)
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    action.action()
+                return audit_cache, output.getvalue()
+
+            repo = FakeRepo('bincrafters/conan-a', 'stable/1.0', ['stable/1.0', 'testing/1.0'], pushed_at=pushed_at)
+            run(repo)
+            audit_cache, output = run(repo)
+            self.assertEqual((0, 1), (audit_cache.evaluated, audit_cache.replayed))
+            self.assertEqual(1, repo.nb_get_branches)
+            self.assertIn('- bincrafters/conan-a: "stable/1.0" -> "testing/1.0"', output)
+
+            # The async client lists the same time as text: the stored checks are shared
+            self.assertIsNotNone(audit_cache.replay_listing('bincrafters/conan-a', '2019-08-01T12:00:00Z',
+                                                            'stable/1.0'))
+
+            # By default, the branches are always listed: a branch deleted without push is noticed
+            repo = FakeRepo('bincrafters/conan-a', 'stable/1.0', ['stable/1.0'], pushed_at=pushed_at)
+            audit_cache, output = run(repo, trust_pushed_at=False)
+            self.assertEqual((1, 0), (audit_cache.evaluated, audit_cache.replayed))
+            self.assertEqual(1, repo.nb_get_branches)
+            self.assertIsNone(audit_cache.replay_listing('bincrafters/conan-a', '2019-08-01T12:00:00Z', 'stable/1.0'))
+
+            repo = FakeRepo('bincrafters/conan-a', 'stable/1.0', ['stable/1.0', 'testing/1.0', 'testing/1.1'],
+                            pushed_at=pushed_at + datetime.timedelta(hours=1))
+            audit_cache, output = run(repo)
+            self.assertEqual((1, 0), (audit_cache.evaluated, audit_cache.replayed))
+            self.assertEqual(1, repo.nb_get_branches)
+            self.assertIn('- bincrafters/conan-a: "stable/1.0" -> "testing/1.1"', output)
+
+    def test_select_branch(self):
+        repo = ConanRepo.from_branch_names(['stable/1.2', 'testing/1.2', 'release/1.3', 'stable/1.3', 'testing/1.1',
+                                            'testing/2.0rc1', 'master'], 'stable/1.2')
+        self.assertEqual('stable/1.2', repo.select_branch(WhichBranch.DEFAULT).name)
+        self.assertEqual('testing/2.0rc1', repo.select_branch(WhichBranch.LATEST).name)
+        self.assertEqual('stable/1.3', repo.select_branch(WhichBranch.LATEST_STABLE).name)
+        self.assertEqual('testing/2.0rc1', repo.select_branch(WhichBranch.LATEST_TESTING).name)
+        self.assertEqual('1.3', str(repo.most_recent_release_version()))
+        self.assertEqual(['testing/2.0rc1', 'testing/1.2', 'testing/1.1'],
+                         list(b.name for b in repo.get_branches_by_channel('testing')))
+        self.assertEqual('release/1.3', repo.get_branch_by_version_channel(Version('1.3'), 'release').name)
+        self.assertIsNone(repo.get_branch_by_version_channel(Version('1.3'), 'testing'))
+
+        repo = ConanRepo.from_branch_names(['release/1.3', 'stable/1.2'], 'stable/1.2')
+        self.assertEqual('release/1.3', repo.select_branch(WhichBranch.LATEST).name)
+        self.assertIsNone(repo.select_branch(WhichBranch.LATEST_TESTING))
+
+        repo = ConanRepo.from_branch_names(['master'], 'master')
+        self.assertIsNone(repo.select_branch(WhichBranch.LATEST))
+        self.assertIsNone(repo.most_recent_version())
+
+    def test_from_repo_refs(self):
+        repo = ConanRepo.from_repo_refs(RepoRefs(name='conan-zlib', default_branch='testing/1.2.11', archived=False,
+                                                 branches={'stable/1.2.11': 'beef', 'testing/1.2.11': 'c0ffee',
+                                                           'master': 'f00d'}))
+        self.assertEqual('testing/1.2.11', repo.default_branch.name)
+        self.assertEqual(['master'], list(b.name for b in repo.unknown_branches))
+        self.assertEqual('1.2.11', str(repo.most_recent_version()))
+
+    def test_concurrent_analysis_in_order(self):
+        # Every repo waits for all others in get_branches: this only finishes when analyzed concurrently
+        barrier = threading.Barrier(3)
+        repos = list(FakeRepo('bincrafters/conan-{}'.format(name), 'stable/1.0', ['stable/1.0', 'testing/1.0'],
+                              barrier=barrier) for name in ('c', 'a', 'b'))
+        action = DefaultBranchAction(user=mock.Mock(login='me'), repos=repos, fix=True, jobs=3)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), \
+                mock.patch('conan_repo_actions.default_branch.input_ask_question_options', return_value=1), \
+                mock.patch('conan_repo_actions.default_branch.input_ask_question_yn', return_value=True) as yn:
+            action.action()
+        self.assertEqual(3, yn.call_count)
+        lines = list(line for line in output.getvalue().splitlines() if line.startswith('bincrafters/'))
+        self.assertEqual(['bincrafters/conan-c', 'bincrafters/conan-a', 'bincrafters/conan-b'],
+                         list(line.split(' ')[0] for line in lines))
+        for repo in repos:
+            self.assertEqual([{'default_branch': 'testing/1.0'}], repo.edits)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from conan_repo_actions.conan_reference import ConanReference
+from conan_repo_actions.dependency_graph import DependencyGraph, recipe_package_name
+from conan_repo_actions.dependency_store import DependencyRecord
+
+
+class DependencyGraphTests(unittest.TestCase):
+    def setUp(self):
+        self.graph = DependencyGraph(edges=[
+            ('libpng', 'zlib'),
+            ('freetype', 'libpng'),
+            ('freetype', 'zlib'),
+            ('freetype', 'bzip2'),
+            ('libcurl', 'zlib'),
+            ('libcurl', 'openssl'),
+            ('cairo', 'freetype'),
+            ('cairo', 'libpng'),
+            ('a', 'b'),
+            ('b', 'a'),
+            ('c', 'a'),
+        ], names=['gtest'])
+
+    def test_direct(self):
+        self.assertEqual(self.graph.dependencies('freetype'), ['bzip2', 'libpng', 'zlib'])
+        self.assertEqual(self.graph.dependents('zlib'), ['freetype', 'libcurl', 'libpng'])
+        self.assertEqual(self.graph.dependents('gtest'), [])
+        self.assertIn('gtest', self.graph)
+        self.assertNotIn('boost', self.graph)
+
+    def test_transitive(self):
+        self.assertEqual(self.graph.transitive_dependents('zlib'), ['cairo', 'freetype', 'libcurl', 'libpng'])
+        self.assertEqual(self.graph.transitive_dependencies('cairo'), ['bzip2', 'freetype', 'libpng', 'zlib'])
+        self.assertEqual(self.graph.transitive_dependents('a'), ['b', 'c'])
+
+    def test_bump_waves(self):
+        self.assertEqual(self.graph.bump_waves('zlib'), [['zlib'], ['libcurl', 'libpng'], ['freetype'], ['cairo']])
+        self.assertEqual(self.graph.critical_path_length('zlib'), 3)
+        self.assertEqual(self.graph.bump_waves('bzip2'), [['bzip2'], ['freetype'], ['cairo']])
+        self.assertEqual(self.graph.bump_waves('cairo'), [['cairo']])
+        self.assertEqual(self.graph.critical_path_length('gtest'), 0)
+        self.assertEqual(self.graph.bump_waves('b'), [['a', 'b'], ['c']])
+
+    def test_levels(self):
+        self.assertEqual(self.graph.level('zlib'), 0)
+        self.assertEqual(self.graph.level('cairo'), 3)
+        self.assertEqual(self.graph.levels(), [['a', 'b', 'bzip2', 'gtest', 'openssl', 'zlib'],
+                                               ['c', 'libcurl', 'libpng'],
+                                               ['freetype'],
+                                               ['cairo']])
+
+    def test_cycles(self):
+        self.assertEqual(self.graph.cycles(), [['a', 'b']])
+        self.assertEqual(DependencyGraph(edges=[('x', 'x')]).cycles(), [['x']])
+
+    def test_from_records(self):
+        records = [
+            DependencyRecord(name='conan-libpng', version='1.6.37', branch=None, commit=None,
+                             dependencies=[ConanReference.from_refstr('zlib/1.2.11@conan/stable')]),
+            DependencyRecord(name='conan-zlib', version='1.2.11', branch=None, commit=None, dependencies=[]),
+        ]
+        graph = DependencyGraph.from_records(records)
+        self.assertEqual(sorted(graph.names), ['libpng', 'zlib'])
+        self.assertEqual(graph.bump_waves('zlib'), [['zlib'], ['libpng']])
+        self.assertEqual(recipe_package_name('conan-zlib'), 'zlib')
+        self.assertEqual(recipe_package_name('zlib'), 'zlib')
+
+    def test_large_chain(self):
+        nb = 5000
+        graph = DependencyGraph(edges=(('p{}'.format(i + 1), 'p{}'.format(i)) for i in range(nb)))
+        self.assertEqual(graph.critical_path_length('p0'), nb)
+        self.assertEqual(graph.level('p{}'.format(nb)), nb)
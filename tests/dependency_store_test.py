@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import tempfile
+import unittest
+import yaml
+
+from conan_repo_actions.conan_reference import ConanReference
+from conan_repo_actions.dependency_store import DependencyDirectory, DependencyRecord, DependencyStore
+
+
+def record(name, version, *deps, commit=None):
+    return DependencyRecord(name=name, version=version, branch='testing/{}'.format(version), commit=commit,
+                            dependencies=list(ConanReference.from_refstr(d) for d in deps))
+
+
+class DependencyStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.store = DependencyStore(':memory:')
+        self.store.put(record('conan-libpng', '1.6.37', 'zlib/1.2.11@conan/stable'))
+        self.store.put(record('conan-freetype', '2.10.0', 'libpng/1.6.37@bincrafters/stable',
+                              'zlib/1.2.11@conan/stable', 'bzip2/1.0.6@conan/stable'))
+        self.store.put(record('conan-libcurl', '7.64.1', 'zlib/1.2.8@conan/stable', 'openssl/1.0.2r@conan/stable'))
+        self.store.put(record('conan-poco', '1.9.0', 'openssl/1.1.1b@conan/stable', 'openssl/1.0.2r@bincrafters/testing'))
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_get(self):
+        r = self.store.get('conan-freetype')
+        self.assertEqual(r.version, '2.10.0')
+        self.assertEqual(r.branch, 'testing/2.10.0')
+        self.assertEqual([d.reference for d in r.dependencies], ['libpng/1.6.37@bincrafters/stable',
+                                                                 'zlib/1.2.11@conan/stable',
+                                                                 'bzip2/1.0.6@conan/stable'])
+        self.assertIsNone(self.store.get('conan-unknown'))
+        self.assertIn('conan-poco', self.store)
+        self.assertNotIn('conan-unknown', self.store)
+
+    def test_put_replaces(self):
+        self.store.put(record('conan-libpng', '1.6.38', 'zlib/1.2.12@conan/stable', commit='abc'))
+        r = self.store.get('conan-libpng')
+        self.assertEqual(r.commit, 'abc')
+        self.assertEqual([d.reference for d in r.dependencies], ['zlib/1.2.12@conan/stable'])
+        self.assertEqual(self.store.dependents('zlib/1.2.11@*/*'), ['conan-freetype'])
+
+    def test_dependents(self):
+        self.assertEqual(self.store.dependents('zlib/1.2.11@*/*'), ['conan-freetype', 'conan-libpng'])
+        self.assertEqual(self.store.dependents('zlib'), ['conan-freetype', 'conan-libcurl', 'conan-libpng'])
+        self.assertEqual(self.store.dependents('openssl/1.0.*@*/stable'), ['conan-libcurl'])
+        self.assertEqual(self.store.dependents('openssl/*@bincrafters'), ['conan-poco'])
+        self.assertEqual(self.store.dependents('boost'), [])
+
+    def test_versions(self):
+        self.assertEqual(self.store.versions('openssl'), ['1.0.2r', '1.1.1b'])
+        self.assertEqual(self.store.versions('zlib'), ['1.2.8', '1.2.11'])
+        self.assertEqual(self.store.versions('boost'), [])
+
+    def test_packages(self):
+        packages = self.store.packages()
+        self.assertEqual(packages['zlib'], {'1.2.11': ['conan-freetype', 'conan-libpng'], '1.2.8': ['conan-libcurl']})
+        self.assertEqual(packages['openssl'], {'1.0.2r': ['conan-libcurl', 'conan-poco'], '1.1.1b': ['conan-poco']})
+
+    def test_missing_directory(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            directory = DependencyDirectory(Path(tmpdir) / 'missing')
+            self.assertEqual([], list(directory.records()))
+            with DependencyStore(':memory:') as store:
+                self.assertEqual(0, store.import_yaml(Path(tmpdir) / 'missing'))
+
+    def test_yaml_roundtrip(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir)
+            self.assertEqual(self.store.export_yaml(path), 4)
+            data = yaml.safe_load((path / 'conan-libpng.yaml').open())
+            self.assertEqual(data['dependencies'], ['zlib/1.2.11@conan/stable'])
+            self.assertEqual(data['version'], '1.6.37')
+
+            (path / 'conan-legacy.yaml').write_text(yaml.safe_dump({
+                'name': 'conan-legacy', 'version': '1.0', 'dependencies': ['zlib/1.2.11@conan/stable'],
+            }))
+            self.assertIsNone(DependencyDirectory(path).get('conan-legacy').commit)
+
+            with DependencyStore(':memory:') as store:
+                self.assertEqual(store.import_yaml(path), 5)
+                self.assertEqual(store.packages()['zlib']['1.2.11'], ['conan-freetype', 'conan-legacy', 'conan-libpng'])
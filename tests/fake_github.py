@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+import http.server
+import json
+import threading
+import typing
+import urllib.parse
+
+Handler = typing.Callable[['FakeRequest'], typing.Tuple[int, typing.Dict[str, str], typing.Any]]
+
+
+class FakeRequest(object):
+    def __init__(self, method: str, path: str, query: typing.Dict[str, str], headers: typing.Mapping[str, str],
+                 body: bytes):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> typing.Any:
+        return json.loads(self.body.decode())
+
+
+class FakeGithubServer(object):
+    ''' Local stand-in for the github api, answering with registered handlers '''
+
+    def __init__(self):
+        self._routes = dict()
+        self.requests = []
+        server = self
+
+        class RequestHandler(http.server.BaseHTTPRequestHandler):
+            def _handle(self):
+                url = urllib.parse.urlsplit(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                request = FakeRequest(method=self.command, path=url.path,
+                                      query=dict(urllib.parse.parse_qsl(url.query)),
+                                      headers=self.headers, body=self.rfile.read(length))
+                server.requests.append(request)
+                handler = server._routes.get((request.method, request.path))
+                if handler is None:
+                    status, headers, body = 404, {}, {'message': 'Not Found'}
+                else:
+                    status, headers, body = handler(request)
+                data = b'' if body is None else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = _handle
+            do_POST = _handle
+            do_PATCH = _handle
+            do_PUT = _handle
+            do_DELETE = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), RequestHandler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return 'http://{}:{}'.format(*self._httpd.server_address)
+
+    def route(self, method: str, path: str, handler: Handler) -> None:
+        self._routes[(method, path)] = handler
+
+    def __enter__(self) -> 'FakeGithubServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._httpd.shutdown()
+        self._httpd.server_close()
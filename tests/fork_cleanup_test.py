@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+import contextlib
+import github
+import io
+import requests
+import unittest
+from unittest import mock
+
+from conan_repo_actions.fork_cleanup import ForkCleanupAction
+from conan_repo_actions.github_graphql import ForkInfo
+
+
+class FakeRepo(object):
+    def __init__(self, full_name: str, fork: bool=False, parent: 'FakeRepo'=None, topics=()):
+        self.full_name = full_name
+        self.html_url = 'https://github.com/{}'.format(full_name)
+        self.fork = fork
+        self._parent = parent
+        self.topics = list(topics)
+        self.parent_requests = 0
+        self.deleted = False
+        self.delete_errors = []
+
+    @property
+    def parent(self):
+        self.parent_requests += 1
+        return self._parent
+
+    def get_topics(self):
+        raise AssertionError('topics must not be requested per repo')
+
+    def delete(self):
+        if self.delete_errors:
+            error = self.delete_errors.pop(0)
+            if isinstance(error, Exception):
+                raise error
+            raise github.GithubException(error, {'message': 'error'}, None)
+        self.deleted = True
+
+
+class FakeUser(object):
+    def __init__(self, login: str, id: int, repos=()):
+        self.login = login
+        self.id = id
+        self._repos = list(repos)
+
+    def get_repos(self, type: str=None):
+        return list(self._repos)
+
+
+class ForkCleanupTests(unittest.TestCase):
+    def setUp(self):
+        zlib = FakeRepo('bincrafters/conan-zlib')
+        bzip2 = FakeRepo('bincrafters/conan-bzip2')
+        other = FakeRepo('conan-community/conan-zlib')
+        self.forks = [
+            FakeRepo('me/conan-zlib', fork=True, parent=zlib, topics=['conan-repo-actions']),
+            FakeRepo('me/conan-bzip2', fork=True, parent=bzip2),
+            FakeRepo('me/community-zlib', fork=True, parent=other, topics=['conan-repo-actions']),
+        ]
+        self.user = FakeUser('me', 1, repos=[FakeRepo('me/dotfiles')] + self.forks)
+        self.user_from = FakeUser('Bincrafters', 2)
+        self.user_from.get_repos = mock.Mock(side_effect=AssertionError('repos of user_from must not be listed'))
+
+    def run_cleanup(self, output: io.StringIO=None, **kwargs):
+        action = ForkCleanupAction(user=self.user, user_from=self.user_from, progress=False, **kwargs)
+        with contextlib.redirect_stdout(output or io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            action.action()
+        return action._forks
+
+    def test_only_my_forks_of_owner(self):
+        forks = self.run_cleanup(fork_tag=None, jobs=2)
+        self.assertEqual([('bincrafters/conan-zlib', 'me/conan-zlib'), ('bincrafters/conan-bzip2', 'me/conan-bzip2')],
+                         list((parent, fork.full_name) for parent, fork in forks))
+
+    def test_tag_from_listing(self):
+        forks = self.run_cleanup(fork_tag='conan-repo-actions')
+        self.assertEqual(['me/conan-zlib'], list(fork.full_name for _, fork in forks))
+
+    def test_tag_and_known_forks(self):
+        fork_infos = dict((fork.full_name, ForkInfo(full_name=fork.full_name, parent=fork._parent.full_name,
+                                                    topics=['conan-repo-actions'])) for fork in self.forks)
+        forks = self.run_cleanup(fork_tag='conan-repo-actions', forks=fork_infos, delete=True)
+        self.assertEqual(['me/conan-zlib', 'me/conan-bzip2'], list(fork.full_name for _, fork in forks))
+        self.assertEqual([0, 0, 0], list(fork.parent_requests for fork in self.forks))
+        self.assertEqual([True, True, False], list(fork.deleted for fork in self.forks))
+
+    def test_concurrent_delete_with_retries(self):
+        self.forks[0].delete_errors = [502]
+        self.forks[1].delete_errors = [404]
+        output = io.StringIO()
+        with mock.patch('conan_repo_actions.util.time.sleep') as sleep:
+            self.run_cleanup(output=output, fork_tag=None, delete=True, jobs=2)
+        self.assertEqual(1, sleep.call_count)
+        self.assertEqual([True, False, False], list(fork.deleted for fork in self.forks))
+        self.assertIn('1 forks deleted, 1 failed', output.getvalue())
+
+    def test_delete_network_error_is_counted(self):
+        self.forks[0].delete_errors = [requests.exceptions.ConnectionError('connection reset')] * 3
+        output = io.StringIO()
+        with mock.patch('conan_repo_actions.util.time.sleep') as sleep:
+            self.run_cleanup(output=output, fork_tag=None, delete=True, jobs=2, retries=3)
+        self.assertEqual(2, sleep.call_count)
+        self.assertEqual([False, True, False], list(fork.deleted for fork in self.forks))
+        self.assertIn('1 forks deleted, 1 failed', output.getvalue())
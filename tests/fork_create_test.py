@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+import contextlib
+import github
+import io
+import unittest
+from unittest import mock
+
+from conan_repo_actions.base import ActionInterrupted
+from conan_repo_actions.fork_create import create_forks, ForkCreateAction
+
+
+class FakeRepo(object):
+    def __init__(self, full_name: str, fork: bool=False, parent: 'FakeRepo'=None):
+        self.full_name = full_name
+        self.name = full_name.split('/')[1]
+        self.fork = fork
+        self.parent = parent
+        self.permissions = mock.Mock(admin=True, push=True, pull=True)
+
+    def get_forks(self):
+        raise AssertionError('the forks must not be listed')
+
+    def get_topics(self):
+        return ['conan', 'zlib']
+
+
+class FakeNewFork(FakeRepo):
+    ''' Fork that github needs polls_until_ready polls to create '''
+    def __init__(self, full_name: str, parent: FakeRepo, polls_until_ready: int, events: list):
+        super().__init__(full_name, fork=True, parent=parent)
+        self.default_branch = 'master'
+        self._polls_until_ready = polls_until_ready
+        self._events = events
+        self.topics = None
+
+    def get_branch(self, branch: str):
+        self._events.append(('poll', self.name))
+        if self._polls_until_ready:
+            self._polls_until_ready -= 1
+            raise github.GithubException(409, {'message': 'Git Repository is empty.'}, None)
+        return mock.Mock(name=branch)
+
+    def edit(self, name: str):
+        self._events.append(('edit', self.name))
+        self.full_name = 'me/{}'.format(name)
+        self.name = name
+
+    def replace_topics(self, topics):
+        self.topics = topics
+
+
+class FakeUser(object):
+    def __init__(self, login: str, repos=()):
+        self.login = login
+        self.id = 1
+        self._repos = dict((repo.name.lower(), repo) for repo in repos)
+        self.probes = []
+        self.events = []
+        self.polls_until_ready = {}
+
+    def create_fork(self, repo_from: FakeRepo):
+        self.events.append(('create', repo_from.name))
+        return FakeNewFork('me/{}'.format(repo_from.name), parent=repo_from, events=self.events,
+                           polls_until_ready=self.polls_until_ready.get(repo_from.name, 0))
+
+    def get_repo(self, name: str):
+        self.probes.append(name)
+        try:
+            return self._repos[name.lower()]
+        except KeyError:
+            raise github.UnknownObjectException(404, {'message': 'Not Found'}, None)
+
+
+class ForkCreateTests(unittest.TestCase):
+    def check(self, repo_from, user_to):
+        action = ForkCreateAction(repo_from=repo_from, user_to=user_to, fork_prefix='conan-repo-actions')
+        with contextlib.redirect_stderr(io.StringIO()):
+            action.check()
+        return action
+
+    def test_find_renamed_fork(self):
+        repo_from = FakeRepo('bincrafters/conan-zlib')
+        fork = FakeRepo('me/conan-repo-actions-conan-zlib', fork=True, parent=repo_from)
+        user_to = FakeUser('me', repos=[fork])
+        action = self.check(repo_from, user_to)
+        self.assertIs(fork, action.repo_to)
+        self.assertEqual(['conan-repo-actions-conan-zlib'], user_to.probes)
+
+    def test_find_fork_with_name_of_parent(self):
+        repo_from = FakeRepo('bincrafters/conan-zlib')
+        fork = FakeRepo('me/conan-zlib', fork=True, parent=repo_from)
+        user_to = FakeUser('me', repos=[fork])
+        self.assertIs(fork, self.check(repo_from, user_to).repo_to)
+
+    def test_no_fork(self):
+        repo_from = FakeRepo('bincrafters/conan-zlib')
+        other_fork = FakeRepo('me/conan-zlib', fork=True, parent=FakeRepo('conan-community/conan-zlib'))
+        user_to = FakeUser('me', repos=[other_fork])
+        action = self.check(repo_from, user_to)
+        self.assertIsNone(action.repo_to)
+        self.assertEqual(2, len(user_to.probes))
+
+    def test_create_forks_polls_readiness(self):
+        user_to = FakeUser('me')
+        user_to.polls_until_ready = {'conan-zlib': 0, 'conan-bzip2': 2, 'conan-lzma': 1}
+        actions = list(self.check(FakeRepo('bincrafters/{}'.format(name)), user_to)
+                       for name in ('conan-zlib', 'conan-bzip2', 'conan-lzma'))
+        with mock.patch('conan_repo_actions.fork_create.time.sleep') as sleep:
+            create_forks(actions, jobs=1)
+        self.assertEqual(2, sleep.call_count)
+        self.assertEqual([('create', 'conan-zlib'), ('create', 'conan-bzip2'), ('create', 'conan-lzma')],
+                         user_to.events[:3])
+        edits = list(name for event, name in user_to.events if event == 'edit')
+        self.assertEqual(['conan-zlib', 'conan-lzma', 'conan-bzip2'], edits)
+        for action in actions:
+            self.assertTrue(action.repo_to.full_name.startswith('me/conan-repo-actions-'))
+            self.assertEqual(['conan-repo-actions-tag', 'conan', 'zlib'], action.repo_to.topics)
+
+    def test_create_forks_timeout(self):
+        user_to = FakeUser('me')
+        user_to.polls_until_ready = {'conan-zlib': 100}
+        actions = [self.check(FakeRepo('bincrafters/conan-zlib'), user_to)]
+        with mock.patch('conan_repo_actions.fork_create.time.sleep'), \
+                mock.patch('conan_repo_actions.fork_create.time.monotonic', side_effect=[0., 0., 20.]):
+            with self.assertRaises(ActionInterrupted):
+                create_forks(actions, timeout=10.)
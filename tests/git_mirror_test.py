@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+import git
+from pathlib import Path
+import tempfile
+import unittest
+
+from conan_repo_actions.git_mirror import clone_repository, CloneOptions, fetch_remote, GitMirrorCache
+
+ACTOR = git.Actor('tester', 'tester@example.com')
+
+
+class GitMirrorCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmpdir.name)
+        # A work tree to create commits, and a bare repo standing in for github
+        self.work = git.Repo.init(self.path / 'work')
+        self.remote_path = self.path / 'remote' / 'conan-zlib.git'
+        remote = git.Repo.init(self.remote_path, bare=True)
+        with remote.config_writer() as config:
+            config.set_value('uploadpack', 'allowFilter', 'true')
+        self.work.create_remote('origin', str(self.remote_path))
+        self.commit('conanfile.py', 'version = "1.2.11"')
+        self.mirrors = GitMirrorCache(self.path / 'mirrors')
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def commit(self, filename: str, text: str, branch: str='testing/1.2.11') -> str:
+        (Path(self.work.working_tree_dir) / filename).parent.mkdir(parents=True, exist_ok=True)
+        (Path(self.work.working_tree_dir) / filename).write_text(text)
+        self.work.index.add([filename])
+        commit = self.work.index.commit('update {}'.format(filename), author=ACTOR, committer=ACTOR)
+        self.work.git.push('origin', 'HEAD:refs/heads/{}'.format(branch))
+        return commit.hexsha
+
+    def test_mirror_path(self):
+        self.assertEqual(self.path / 'mirrors' / 'github.com' / 'bincrafters' / 'conan-zlib.git',
+                         self.mirrors.mirror_path('https://github.com/bincrafters/conan-zlib.git'))
+        self.assertEqual(self.path / 'mirrors' / 'github.com' / 'bincrafters' / 'conan-zlib.git',
+                         self.mirrors.mirror_path('git@github.com:bincrafters/conan-zlib'))
+
+    def test_clone_borrows_objects_and_fetches_deltas(self):
+        url = str(self.remote_path)
+        r = self.mirrors.clone(url, self.path / 'clone1')
+        mirror_path = self.mirrors.mirror_path(url)
+        self.assertTrue(mirror_path.is_dir())
+        self.assertEqual(url, r.remote('origin').url)
+        alternates = Path(r.git_dir) / 'objects' / 'info' / 'alternates'
+        self.assertEqual(str(mirror_path / 'objects'), alternates.read_text().strip())
+        self.assertEqual([], list((Path(r.git_dir) / 'objects' / 'pack').glob('*.pack')))
+        r.git.checkout('origin/testing/1.2.11', B='testing/1.2.11')
+        self.assertEqual('version = "1.2.11"', (Path(r.working_tree_dir) / 'conanfile.py').read_text())
+
+        new_commit = self.commit('conanfile.py', 'version = "1.2.12"')
+        r2 = self.mirrors.clone(url, self.path / 'clone2')
+        self.assertEqual(new_commit, git.Repo(mirror_path).commit('testing/1.2.11').hexsha)
+        self.assertEqual(new_commit, r2.commit('origin/testing/1.2.11').hexsha)
+
+    def test_mirror_fetches_branches_and_tags(self):
+        url = str(self.remote_path)
+        mirror = git.Repo(self.mirrors.update(url))
+        # A tag of a commit that is on no branch is not fetched along with the branches
+        self.work.index.commit('release', author=ACTOR, committer=ACTOR)
+        self.work.create_tag('1.2.11')
+        self.work.git.push('origin', 'refs/tags/1.2.11')
+        self.work.git.push('origin', 'HEAD:refs/pull/1/head')
+        self.mirrors.update(url)
+        self.assertEqual(['1.2.11'], list(tag.name for tag in mirror.tags))
+        self.assertEqual(['testing/1.2.11'], list(head.name for head in mirror.heads))
+        self.assertNotIn('refs/pull/1/head', mirror.git.for_each_ref(format='%(refname)').splitlines())
+
+    def test_push_from_clone(self):
+        fork_path = self.path / 'fork.git'
+        git.Repo.init(fork_path, bare=True)
+        r = self.mirrors.clone(str(self.remote_path), self.path / 'clone')
+        r.git.checkout('origin/testing/1.2.11', B='testing/1.2.11')
+        r.git.remote(['add', 'user', str(fork_path)])
+        r.git.push('user', 'testing/1.2.11')
+        self.assertEqual(r.head.commit.hexsha, git.Repo(fork_path).commit('testing/1.2.11').hexsha)
+
+    def test_shallow_single_branch_blobless_sparse_clone(self):
+        self.commit('test_package/conanfile.py', 'test')
+        self.commit('recipes/zlib/conanfile.py', 'recipe')
+        self.commit('docs/big.txt', 'x' * 1000)
+        self.commit('conanfile.py', 'version = "1.3.0"', branch='testing/1.3.0')
+        url = self.remote_path.as_uri()
+        options = CloneOptions(depth=1, single_branch=True, blobless=True, sparse=True)
+        r = clone_repository(url, self.path / 'clone', branch='testing/1.2.11', options=options)
+
+        self.assertEqual(['origin/testing/1.2.11'], list(ref.name for ref in r.remote('origin').refs))
+        self.assertEqual(1, len(list(r.iter_commits())))
+        self.assertEqual('true', r.git.config('remote.origin.promisor'))
+        work_tree = Path(r.working_tree_dir)
+        self.assertTrue((work_tree / 'conanfile.py').is_file())
+        self.assertTrue((work_tree / 'test_package' / 'conanfile.py').is_file())
+        self.assertTrue((work_tree / 'recipes' / 'zlib' / 'conanfile.py').is_file())
+        self.assertFalse((work_tree / 'docs').exists())
+
+        # The fork is fetched with the same limits, and commits of a partial clone can be pushed to it
+        fork_path = self.path / 'fork.git'
+        git.Repo.clone_from(str(self.remote_path), str(fork_path), bare=True)
+        r.git.remote(['add', 'user', fork_path.as_uri()])
+        fetch_remote(r, 'user', branch='testing/1.2.11', options=options)
+        self.assertEqual(['user/testing/1.2.11'], list(ref.name for ref in r.remote('user').refs))
+        (work_tree / 'conanfile.py').write_text('version = "1.2.11" # fixed')
+        r.git.add(all=True, sparse=True)
+        r.index.commit('fix', author=ACTOR, committer=ACTOR)
+        r.git.push('user', 'HEAD:refs/heads/testing_fix/1.2.11')
+        self.assertEqual(r.head.commit.hexsha, git.Repo(fork_path).commit('testing_fix/1.2.11').hexsha)
+        # A branch that the fork lacks is not fetched, and is no error
+        fetch_remote(r, 'user', branch='testing/9.9', options=options)
+
+    def test_mirror_clone_cannot_be_shallow(self):
+        with self.assertRaises(ValueError):
+            clone_repository(str(self.remote_path), self.path / 'clone', options=CloneOptions(
+                depth=1, single_branch=False, blobless=False, sparse=False), mirrors=self.mirrors)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import base64
+import unittest
+
+from conan_repo_actions.github_async import AsyncGithub, AsyncGithubException
+from tests.fake_github import FakeGithubServer
+
+
+def fake_branches(server: FakeGithubServer):
+    def handler(request):
+        if request.query.get('page') == '2':
+            return 200, {}, [{'name': 'testing/1.2.11'}]
+        link = '<{}/repos/bincrafters/conan-zlib/branches?per_page=100&page=2>; rel="next"'.format(server.url)
+        return 200, {'Link': link}, [{'name': 'stable/1.2.11'}]
+    return handler
+
+
+class AsyncGithubTests(unittest.TestCase):
+    def test_paginate(self):
+        async def run(url):
+            async with AsyncGithub('token', base_url=url) as g:
+                return await g.list_branches('bincrafters/conan-zlib')
+
+        with FakeGithubServer() as server:
+            server.route('GET', '/repos/bincrafters/conan-zlib/branches', fake_branches(server))
+            branches = asyncio.run(run(server.url))
+            self.assertEqual(['stable/1.2.11', 'testing/1.2.11'], list(b['name'] for b in branches))
+            self.assertEqual(2, len(server.requests))
+            self.assertEqual('100', server.requests[0].query['per_page'])
+            self.assertEqual('token token', server.requests[0].headers['Authorization'])
+
+    def test_contents(self):
+        async def run(url):
+            async with AsyncGithub('token', base_url=url) as g:
+                return await asyncio.gather(g.get_contents('bincrafters/conan-zlib', 'conanfile.py', ref='c0ffee'),
+                                            g.get_contents('bincrafters/conan-zlib', 'conanfile_base.py'))
+
+        with FakeGithubServer() as server:
+            content = base64.b64encode(b'version = "1.2.11"').decode()
+            server.route('GET', '/repos/bincrafters/conan-zlib/contents/conanfile.py',
+                         lambda request: (200, {}, {'sha': 'beef', 'content': content}))
+            found, missing = asyncio.run(run(server.url))
+            self.assertEqual(('beef', b'version = "1.2.11"'), found)
+            self.assertIsNone(missing)
+            self.assertEqual('c0ffee', next(r for r in server.requests
+                                            if r.path.endswith('conanfile.py')).query['ref'])
+
+    def test_topics_edit_delete(self):
+        async def run(url):
+            async with AsyncGithub('token', base_url=url) as g:
+                topics = await g.get_topics('me/conan-zlib')
+                await g.edit_repo('me/conan-zlib', default_branch='testing/1.2.11')
+                await g.delete_repo('me/conan-zlib')
+                with self.assertRaises(AsyncGithubException) as cm:
+                    await g.delete_repo('me/conan-bzip2')
+                self.assertEqual(404, cm.exception.status)
+                return topics
+
+        with FakeGithubServer() as server:
+            server.route('GET', '/repos/me/conan-zlib/topics',
+                         lambda request: (200, {}, {'names': ['conan', 'fork']}))
+            server.route('PATCH', '/repos/me/conan-zlib', lambda request: (200, {}, request.json()))
+            server.route('DELETE', '/repos/me/conan-zlib', lambda request: (204, {}, None))
+            topics = asyncio.run(run(server.url))
+            self.assertEqual(['conan', 'fork'], topics)
+            patch = next(r for r in server.requests if r.method == 'PATCH')
+            self.assertEqual({'name': 'conan-zlib', 'default_branch': 'testing/1.2.11'}, patch.json())
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from conan_repo_actions.github_graphql import GithubGraphQL, GraphQLError
+from tests.fake_github import FakeGithubServer
+
+REPOS = {
+    'conan-zlib': {
+        'default': 'testing/1.2.11',
+        'branches': {
+            'testing/1.2.11': ('c0ffee', {'conanfile.py': 'version = "1.2.11"'}),
+            'stable/1.2.11': ('beef', {'conanfile.py': 'version = "1.2.11"', 'conanfile_base.py': 'base'}),
+        },
+    },
+    'conan-bzip2': {
+        'default': 'stable/1.0.6',
+        'branches': {
+            'stable/1.0.6': ('f00d', {}),
+        },
+    },
+}
+
+
+def fake_graphql(request):
+    variables = request.json()['variables']
+    paths = []
+    while 'p{}'.format(len(paths)) in variables:
+        paths.append(variables['p{}'.format(len(paths))])
+    data = {}
+    repo_i = 0
+    while 'n{}'.format(repo_i) in variables:
+        repo = REPOS.get(variables['n{}'.format(repo_i)])
+        if repo is None:
+            data['r{}'.format(repo_i)] = None
+        else:
+            qualified_name = variables.get('b{}'.format(repo_i), 'refs/heads/' + repo['default'])
+            branch = qualified_name[len('refs/heads/'):]
+            if branch not in repo['branches']:
+                data['r{}'.format(repo_i)] = {'ref': None}
+            else:
+                oid, files = repo['branches'][branch]
+                target = {'oid': oid}
+                for path_i, path in enumerate(paths):
+                    text = files.get(path)
+                    target['f{}'.format(path_i)] = None if text is None else {'object': {'text': text}}
+                data['r{}'.format(repo_i)] = {'ref': {'name': branch, 'target': target}}
+        repo_i += 1
+    return 200, {}, {'data': data}
+
+
+def fake_refs_page(repo, cursor):
+    # One branch per page, to exercise the pagination
+    names = sorted(repo['branches'])
+    i = int(cursor or 0)
+    return {
+        'pageInfo': {'hasNextPage': i + 1 < len(names), 'endCursor': str(i + 1)},
+        'nodes': [{'name': names[i], 'target': {'oid': repo['branches'][names[i]][0]}}],
+    }
+
+
+def fake_repo_refs(name):
+    repo = REPOS.get(name)
+    if repo is None:
+        return None
+    return {'name': name, 'isArchived': False, 'defaultBranchRef': {'name': repo['default']},
+            'refs': fake_refs_page(repo, None)}
+
+
+def fake_graphql_refs(request):
+    body = request.json()
+    query = body['query']
+    variables = body['variables']
+    if 'repositoryOwner' in query:
+        names = sorted(REPOS)
+        i = int(variables['cursor'] or 0)
+        return 200, {}, {'data': {'repositoryOwner': {'repositories': {
+            'pageInfo': {'hasNextPage': i + 1 < len(names), 'endCursor': str(i + 1)},
+            'nodes': [fake_repo_refs(names[i])],
+        }}}}
+    if '$cursor' in query:
+        repo = REPOS[variables['name']]
+        return 200, {}, {'data': {'repository': {'refs': fake_refs_page(repo, variables['cursor'])}}}
+    data = {}
+    repo_i = 0
+    while 'n{}'.format(repo_i) in variables:
+        data['r{}'.format(repo_i)] = fake_repo_refs(variables['n{}'.format(repo_i)])
+        repo_i += 1
+    return 200, {}, {'data': data}
+
+
+def fake_graphql_forks(request):
+    cursor = request.json()['variables']['cursor']
+    if cursor is None:
+        nodes = [{'nameWithOwner': 'me/conan-zlib', 'parent': {'nameWithOwner': 'bincrafters/conan-zlib'},
+                  'repositoryTopics': {'nodes': [{'topic': {'name': 'conan-repo-actions'}}]}}]
+        page_info = {'hasNextPage': True, 'endCursor': 'c1'}
+    else:
+        nodes = [{'nameWithOwner': 'me/deleted-parent', 'parent': None, 'repositoryTopics': {'nodes': []}}]
+        page_info = {'hasNextPage': False, 'endCursor': None}
+    return 200, {}, {'data': {'viewer': {'repositories': {'pageInfo': page_info, 'nodes': nodes}}}}
+
+
+class GithubGraphQLTests(unittest.TestCase):
+    def test_repositories_files(self):
+        with FakeGithubServer() as server:
+            server.route('POST', '/graphql', fake_graphql)
+            gql = GithubGraphQL('token', url=server.url + '/graphql')
+            result = gql.repositories_files('bincrafters', [
+                ('conan-zlib', None),
+                ('conan-zlib', 'stable/1.2.11'),
+                ('conan-bzip2', None),
+                ('conan-unknown', None),
+                ('conan-bzip2', 'unknown/1.0'),
+            ], paths=('conanfile.py', 'conanfile_base.py', ), batch_size=2)
+
+            self.assertEqual(len(server.requests), 3)
+            self.assertEqual(server.requests[0].headers['Authorization'], 'bearer token')
+
+        self.assertEqual([r.name for r in result],
+                         ['conan-zlib', 'conan-zlib', 'conan-bzip2', 'conan-unknown', 'conan-bzip2'])
+        self.assertEqual(result[0].branch, 'testing/1.2.11')
+        self.assertEqual(result[0].commit, 'c0ffee')
+        self.assertEqual(result[0].files, {'conanfile.py': 'version = "1.2.11"', 'conanfile_base.py': None})
+        self.assertEqual(result[1].commit, 'beef')
+        self.assertEqual(result[1].files['conanfile_base.py'], 'base')
+        self.assertEqual(result[2].files, {'conanfile.py': None, 'conanfile_base.py': None})
+        self.assertIsNone(result[3].commit)
+        self.assertIsNone(result[4].commit)
+
+    def test_repositories_heads(self):
+        with FakeGithubServer() as server:
+            server.route('POST', '/graphql', fake_graphql)
+            gql = GithubGraphQL('token', url=server.url + '/graphql')
+            heads = gql.repositories_heads('bincrafters', [('conan-zlib', 'stable/1.2.11'), ('conan-bzip2', None)])
+            self.assertEqual(len(server.requests), 1)
+        self.assertEqual([h.commit for h in heads], ['beef', 'f00d'])
+        self.assertEqual(heads[1].branch, 'stable/1.0.6')
+        self.assertEqual(heads[0].files, {})
+
+    def test_repositories_refs(self):
+        with FakeGithubServer() as server:
+            server.route('POST', '/graphql', fake_graphql_refs)
+            gql = GithubGraphQL('token', url=server.url + '/graphql')
+            all_refs = gql.repositories_refs('bincrafters')
+            # 2 pages of repos + 1 extra page of branches of conan-zlib
+            self.assertEqual(len(server.requests), 3)
+            named_refs = gql.repositories_refs('bincrafters', ['conan-zlib', 'conan-unknown'])
+
+        self.assertEqual([r.name for r in all_refs], ['conan-bzip2', 'conan-zlib'])
+        self.assertEqual(all_refs[1].default_branch, 'testing/1.2.11')
+        self.assertEqual(dict(all_refs[1].branches), {'stable/1.2.11': 'beef', 'testing/1.2.11': 'c0ffee'})
+        self.assertEqual(dict(all_refs[0].branches), {'stable/1.0.6': 'f00d'})
+        self.assertEqual(named_refs, all_refs[1:])
+
+    def test_error(self):
+        with FakeGithubServer() as server:
+            server.route('POST', '/graphql', lambda r: (200, {}, {'errors': [{'message': 'bad query'}]}))
+            gql = GithubGraphQL('token', url=server.url + '/graphql')
+            with self.assertRaises(GraphQLError):
+                gql.query('query { viewer { login } }')
+
+    def test_viewer_forks(self):
+        with FakeGithubServer() as server:
+            server.route('POST', '/graphql', fake_graphql_forks)
+            gql = GithubGraphQL('token', url=server.url + '/graphql')
+            forks = gql.viewer_forks()
+            self.assertEqual(len(server.requests), 2)
+        self.assertEqual([('me/conan-zlib', 'bincrafters/conan-zlib', ['conan-repo-actions']),
+                          ('me/deleted-parent', None, [])], list(forks))
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import github
+import hashlib
+import json
+import unittest
+
+from conan_repo_actions.metadata import MetadataRefresher, MetadataStore, snapshot_repositories, \
+    UnknownRepositoriesError
+from tests.fake_github import FakeGithubServer
+
+
+class FakeOwner(object):
+    def __init__(self, server: FakeGithubServer):
+        self.server = server
+        self.repos = [
+            {'name': 'conan-bzip2', 'full_name': 'bincrafters/conan-bzip2', 'default_branch': 'testing/1.0.6',
+             'pushed_at': '2019-06-01T00:00:00Z', 'archived': False, 'fork': False, 'topics': ['conan']},
+            {'name': 'conan-zlib', 'full_name': 'bincrafters/conan-zlib', 'default_branch': 'testing/1.2.11',
+             'pushed_at': '2019-06-01T00:00:00Z', 'archived': False, 'fork': True, 'topics': []},
+        ]
+        self.branches = {
+            'bincrafters/conan-bzip2': [{'name': 'testing/1.0.6', 'commit': {'sha': 'f00d'}}],
+            'bincrafters/conan-zlib': [{'name': 'stable/1.2.11', 'commit': {'sha': 'beef'}},
+                                       {'name': 'testing/1.2.11', 'commit': {'sha': 'c0ffee'}}],
+        }
+        server.route('GET', '/users/bincrafters/repos', self.list_repos)
+        for full_name in self.branches:
+            server.route('GET', '/repos/{}/branches'.format(full_name), self.list_branches)
+        server.route('GET', '/repos/bincrafters/conan-zlib', lambda request: self.conditional(request, dict(
+            self.repos[1], parent={'full_name': 'madler/zlib'})))
+
+    @staticmethod
+    def conditional(request, body, headers=None):
+        etag = '"{}"'.format(hashlib.sha1(json.dumps(body).encode()).hexdigest())
+        headers = dict(headers or {}, ETag=etag)
+        if request.headers.get('If-None-Match') == etag:
+            return 304, headers, None
+        return 200, headers, body
+
+    def list_repos(self, request):
+        # One repo per page, to exercise the pagination
+        page = int(request.query.get('page', 1))
+        headers = {}
+        if page < len(self.repos):
+            headers['Link'] = '<{}/users/bincrafters/repos?per_page=100&page={}>; rel="next"'.format(
+                self.server.url, page + 1)
+        return self.conditional(request, [self.repos[page - 1]], headers)
+
+    def list_branches(self, request):
+        full_name = request.path[len('/repos/'):-len('/branches')]
+        return self.conditional(request, self.branches[full_name])
+
+
+class MetadataTests(unittest.TestCase):
+    def test_refresh_incremental(self):
+        with FakeGithubServer() as server, MetadataStore(':memory:') as store:
+            owner = FakeOwner(server)
+            refresher = MetadataRefresher(store, 'token', base_url=server.url)
+
+            stats = refresher.refresh_owner('bincrafters')
+            self.assertEqual((4, 0, 2, 2), stats)
+            self.assertEqual(['conan-bzip2', 'conan-zlib'], list(r['name'] for r in store.repos('Bincrafters')))
+            self.assertEqual({'stable/1.2.11': 'beef', 'testing/1.2.11': 'c0ffee'},
+                             dict(store.branches('bincrafters/conan-zlib')))
+
+            stats = refresher.refresh_owner('bincrafters')
+            self.assertEqual((2, 2, 2, 0), stats)
+
+            owner.repos[1] = dict(owner.repos[1], pushed_at='2019-07-01T00:00:00Z', default_branch='testing/1.2.12')
+            owner.branches['bincrafters/conan-zlib'].append({'name': 'testing/1.2.12', 'commit': {'sha': 'cafe'}})
+            stats = refresher.refresh_owner('bincrafters')
+            self.assertEqual((3, 1, 2, 1), stats)
+            self.assertEqual('testing/1.2.12', store.repo('bincrafters/conan-zlib')['default_branch'])
+            self.assertEqual('cafe', store.branches('bincrafters/conan-zlib')['testing/1.2.12'])
+
+            stats = refresher.refresh_owner('bincrafters', full=True)
+            self.assertEqual((4, 0, 2, 2), stats)
+
+    def test_parents(self):
+        with FakeGithubServer() as server, MetadataStore(':memory:') as store:
+            FakeOwner(server)
+            refresher = MetadataRefresher(store, 'token', base_url=server.url)
+            refresher.refresh_owner('bincrafters', branches=False, parents=True)
+            self.assertEqual('madler/zlib', store.parent('bincrafters/conan-zlib'))
+            self.assertIsNone(store.parent('bincrafters/conan-bzip2'))
+            nb_requests = len(server.requests)
+            refresher.refresh_owner('bincrafters', branches=False, parents=True)
+            self.assertEqual(nb_requests + 2, len(server.requests))
+
+    def test_snapshot_repositories(self):
+        with FakeGithubServer() as server, MetadataStore(':memory:') as store:
+            FakeOwner(server)
+            MetadataRefresher(store, 'token', base_url=server.url).refresh_owner('bincrafters', branches=False)
+            nb_requests = len(server.requests)
+            g = github.Github(base_url=server.url)
+            repos = snapshot_repositories(g, store, 'bincrafters', ['conan-zlib'])
+            self.assertEqual(['testing/1.2.11'], list(r.default_branch for r in repos))
+            self.assertEqual(2, len(snapshot_repositories(g, store, 'bincrafters')))
+            with self.assertRaisesRegex(UnknownRepositoriesError, 'conan-foo, conan-bar'):
+                snapshot_repositories(g, store, 'bincrafters', ['conan-foo', 'conan-zlib', 'conan-bar'])
+            self.assertEqual(nb_requests, len(server.requests))
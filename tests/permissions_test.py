@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from unittest import mock
+
+from conan_repo_actions.permissions import PermissionCache, RepoPermissions
+
+
+class FakeRepo(object):
+    def __init__(self, full_name: str, permissions):
+        self.full_name = full_name
+        self._permissions = permissions
+        self.nb_permissions = 0
+
+    @property
+    def permissions(self):
+        self.nb_permissions += 1
+        return self._permissions
+
+
+class PermissionCacheTests(unittest.TestCase):
+    def test_repos(self):
+        repo = FakeRepo('bincrafters/conan-zlib', mock.Mock(admin=False, push=True, pull=True))
+        cache = PermissionCache()
+        self.assertTrue(cache.can_push(repo))
+        self.assertFalse(cache.is_admin(repo))
+        self.assertEqual(1, repo.nb_permissions)
+        self.assertIn('Bincrafters/Conan-Zlib', cache)
+
+    def test_repos_data(self):
+        cache = PermissionCache()
+        cache.add_repos_data([{'full_name': 'me/conan-zlib', 'permissions': {'admin': True, 'push': True}},
+                              {'full_name': 'bincrafters/conan-zlib'}])
+        self.assertEqual(RepoPermissions(admin=True, push=True, pull=False), cache.get_by_name('me/conan-zlib'))
+        self.assertFalse(cache.get_by_name('bincrafters/conan-zlib').pull)
+        self.assertIsNone(cache.get_by_name('bincrafters/conan-bzip2'))
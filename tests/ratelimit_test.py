@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import github
+import threading
+import time
+import unittest
+from unittest import mock
+
+from conan_repo_actions.github_async import AsyncGithub
+from conan_repo_actions.ratelimit import RateLimitScheduler, install_scheduler
+from tests.fake_github import FakeGithubServer
+
+
+class FakeClock(object):
+    def __init__(self, now: float=1000.):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def flaky(responses):
+    responses = list(responses)
+
+    def handler(request):
+        return responses.pop(0) if len(responses) > 1 else responses[0]
+    return handler
+
+
+class RateLimitSchedulerTests(unittest.TestCase):
+    def test_token_bucket_follows_quota(self):
+        clock = FakeClock()
+        scheduler = RateLimitScheduler(max_concurrency=2, clock=clock)
+        self.assertEqual(0, scheduler.try_acquire())
+        self.assertIsNone(scheduler.release(200, {'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': '1100'}))
+        self.assertAlmostEqual(.1, scheduler.rate)
+
+        self.assertEqual(0, scheduler.try_acquire())
+        scheduler.release(200, {})
+        self.assertEqual(0, scheduler.try_acquire())
+        scheduler.release(200, {})
+        self.assertAlmostEqual(10., scheduler.try_acquire())
+        clock.now += 10
+        self.assertEqual(0, scheduler.try_acquire())
+
+    def test_exhausted_quota_waits_for_reset(self):
+        clock = FakeClock()
+        scheduler = RateLimitScheduler(clock=clock)
+        scheduler.try_acquire()
+        delay = scheduler.release(403, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '1060'})
+        self.assertAlmostEqual(61., delay)
+        self.assertAlmostEqual(61., scheduler.try_acquire())
+        clock.now = 1061
+        self.assertEqual(0, scheduler.try_acquire())
+
+    def test_adaptive_concurrency(self):
+        scheduler = RateLimitScheduler(max_concurrency=8, clock=FakeClock())
+        self.assertEqual(4, scheduler.concurrency)
+        for _ in range(4):
+            scheduler.try_acquire()
+        self.assertGreater(scheduler.try_acquire(), 0)
+        for _ in range(4):
+            scheduler.release(200, {})
+        self.assertEqual(4, scheduler.concurrency)
+        scheduler.try_acquire()
+        scheduler.release(200, {})
+        self.assertEqual(5, scheduler.concurrency)
+        scheduler.try_acquire()
+        self.assertEqual(0., scheduler.release(429, {'Retry-After': '0'}))
+        self.assertEqual(2, scheduler.concurrency)
+
+    def test_forbidden_is_not_retried(self):
+        scheduler = RateLimitScheduler(clock=FakeClock())
+        scheduler.try_acquire()
+        self.assertIsNone(scheduler.release(403, {}, 'Must have admin rights to Repository.'))
+
+    def test_rate_limit_message_of_response(self):
+        # GithubGraphQL and MetadataRefresher give the response object of requests as body
+        scheduler = RateLimitScheduler(clock=FakeClock(), verbose=False)
+        scheduler.try_acquire()
+        response = mock.Mock(text='{"message": "You have exceeded a secondary rate limit"}')
+        self.assertEqual(2., scheduler.release(403, {}, response))
+
+    def test_full_slots_wake_on_release(self):
+        scheduler = RateLimitScheduler(max_concurrency=1, verbose=False)
+        scheduler.try_acquire()
+        started = time.time()
+        timer = threading.Timer(.1, scheduler.release, (200, {}, ))
+        timer.start()
+        self.assertEqual(200, scheduler.call(lambda: (200, {}, None))[0])
+        self.assertLess(time.time() - started, 5.)
+        timer.join()
+
+    def test_full_slots_wake_on_release_async(self):
+        async def run(scheduler):
+            async def request():
+                return 200, {}, None
+            asyncio.get_running_loop().call_later(.1, scheduler.release, 200, {})
+            return await scheduler.call_async(request)
+
+        scheduler = RateLimitScheduler(max_concurrency=1, verbose=False)
+        scheduler.try_acquire()
+        started = time.time()
+        self.assertEqual(200, asyncio.run(run(scheduler))[0])
+        self.assertLess(time.time() - started, 5.)
+
+    def test_install_requires_pygithub_internals(self):
+        with self.assertRaises(RuntimeError):
+            install_scheduler(mock.Mock(spec=[]), RateLimitScheduler())
+
+    def test_pygithub_retry(self):
+        with FakeGithubServer() as server:
+            server.route('GET', '/repos/bincrafters/conan-zlib', flaky([
+                (429, {'Retry-After': '0'}, {'message': 'secondary rate limit'}),
+                (200, {}, {'full_name': 'bincrafters/conan-zlib', 'name': 'conan-zlib'}),
+            ]))
+            g = install_scheduler(github.Github(base_url=server.url, retry=None), RateLimitScheduler(verbose=False))
+            repo = g.get_repo('bincrafters/conan-zlib')
+            self.assertEqual('conan-zlib', repo.name)
+            self.assertEqual(2, len(server.requests))
+
+    def test_async_retry(self):
+        async def run(url):
+            async with AsyncGithub('token', base_url=url, scheduler=RateLimitScheduler(verbose=False)) as g:
+                return await g.get_topics('bincrafters/conan-zlib')
+
+        with FakeGithubServer() as server:
+            server.route('GET', '/repos/bincrafters/conan-zlib/topics', flaky([
+                (403, {'Retry-After': '0'}, {'message': 'You have exceeded a secondary rate limit'}),
+                (200, {}, {'names': ['conan']}),
+            ]))
+            self.assertEqual(['conan'], asyncio.run(run(server.url)))
+            self.assertEqual(2, len(server.requests))
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+from unittest import mock
+
+import github
+import requests
+
+from conan_repo_actions.concurrency import map_concurrent
+from conan_repo_actions.util import github_error_is_transient, retry_call
+
+
+class MapConcurrentTests(unittest.TestCase):
+    def test_order_preserved(self):
+        def slow_square(i):
+            time.sleep(0.001 * (10 - i))
+            return i * i
+        self.assertEqual(map_concurrent(slow_square, range(10), jobs=4), [i * i for i in range(10)])
+
+    def test_serial(self):
+        threads = set()
+
+        def record_thread(i):
+            threads.add(threading.get_ident())
+            return i
+        self.assertEqual(map_concurrent(record_thread, range(5), jobs=1), list(range(5)))
+        self.assertEqual(threads, {threading.get_ident()})
+
+    def test_bounded(self):
+        lock = threading.Lock()
+        running = 0
+        max_running = 0
+
+        def count_running(i):
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            time.sleep(0.005)
+            with lock:
+                running -= 1
+            return i
+        map_concurrent(count_running, range(20), jobs=3)
+        self.assertLessEqual(max_running, 3)
+
+
+class RetryCallTests(unittest.TestCase):
+    def test_retry_transient(self):
+        calls = []
+
+        def flaky():
+            calls.append(None)
+            if len(calls) < 3:
+                raise github.GithubException(503, {}, None)
+            return 'ok'
+        with mock.patch('conan_repo_actions.util.time.sleep') as sleep:
+            self.assertEqual('ok', retry_call(flaky, attempts=3, delay=1., retry_on=github_error_is_transient))
+        self.assertEqual([mock.call(1.), mock.call(2.)], sleep.call_args_list)
+
+    def test_no_retry_client_error(self):
+        calls = []
+
+        def missing():
+            calls.append(None)
+            raise github.GithubException(422, {}, None)
+        with mock.patch('conan_repo_actions.util.time.sleep'):
+            with self.assertRaises(github.GithubException):
+                retry_call(missing, attempts=3, retry_on=github_error_is_transient)
+        self.assertEqual(1, len(calls))
+
+
+    def test_retry_network_error_only(self):
+        calls = []
+
+        def broken():
+            calls.append(None)
+            if len(calls) < 2:
+                raise requests.exceptions.Timeout('read timed out')
+            raise TypeError('bug')
+        with mock.patch('conan_repo_actions.util.time.sleep') as sleep:
+            with self.assertRaises(TypeError):
+                retry_call(broken, attempts=5)
+        self.assertEqual(2, len(calls))
+        self.assertEqual(1, sleep.call_count)
+
+
+class LazyImportTests(unittest.TestCase):
+    def test_sync_commands_do_not_load_aiohttp(self):
+        code = 'import sys\n' \
+               'import conan_repo_actions.util, conan_repo_actions.default_branch, conan_repo_actions.fork_cleanup\n' \
+               'sys.exit(int("aiohttp" in sys.modules))'
+        self.assertEqual(0, subprocess.call([sys.executable, '-c', code]))